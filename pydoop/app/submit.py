@@ -34,6 +34,9 @@ import pydoop.hadut as hadut
 import pydoop.utils as utils
 import pydoop.utils.conversion_tables as conv_tables
 from pydoop.mapreduce.pipes import PSTATS_DIR, PSTATS_FMT
+from pydoop.config import (
+    AVRO_KEY_INPUT_PROJECTION, AVRO_VALUE_INPUT_PROJECTION
+)
 
 from .argparse_types import a_file_that_can_be_read, UpdateMap
 from .argparse_types import a_comma_separated_list, a_hdfs_file
@@ -157,6 +160,13 @@ class PydoopSubmitter(object):
         self.properties[JOB_REDUCES] = args.num_reducers
         if args.job_name:
             self.properties[JOB_NAME] = args.job_name
+        for prop, fn in (
+            (AVRO_KEY_INPUT_PROJECTION, args.avro_key_input_projection),
+            (AVRO_VALUE_INPUT_PROJECTION, args.avro_value_input_projection),
+        ):
+            if fn:
+                with open(fn) as f:
+                    self.properties[prop] = f.read()
         self.properties.update(args.job_conf or {})
         self.__set_files_to_cache(args)
         self.__set_archives_to_cache(args)
@@ -274,9 +284,10 @@ class PydoopSubmitter(object):
         return os.linesep.join(lines) + os.linesep
 
     def __validate(self):
-        if not hdfs.path.exists(self.args.input):
+        # the input path can be a glob pattern, expanded by Hadoop itself
+        if not any(True for _ in hdfs.iglob(self.args.input)):
             raise RuntimeError(
-                "Input path %r does not exist" % (self.args.input,)
+                "Input path %r does not match any file" % (self.args.input,)
             )
         if hdfs.path.exists(self.args.output):
             raise RuntimeError(
@@ -489,7 +500,8 @@ def add_parser_arguments(parser):
         help=("The module containing the Python MapReduce program")
     )
     parser.add_argument(
-        'input', metavar='INPUT', help='input path to the maps',
+        'input', metavar='INPUT',
+        help='input path to the maps (can be a glob pattern)',
     )
     parser.add_argument(
         'output', metavar='OUTPUT', help='output path from the reduces',
@@ -539,6 +551,18 @@ def add_parser_arguments(parser):
         '--avro-output', metavar='k|v|kv', choices=AVRO_IO_CHOICES,
         help="Avro output mode (key, value or both)",
     )
+    parser.add_argument(
+        '--avro-key-input-projection', metavar='SCHEMA_FILE',
+        type=a_file_that_can_be_read,
+        help=("Read Avro input keys with this reader schema "
+              "(e.g., a projection)"),
+    )
+    parser.add_argument(
+        '--avro-value-input-projection', metavar='SCHEMA_FILE',
+        type=a_file_that_can_be_read,
+        help=("Read Avro input values with this reader schema "
+              "(e.g., a projection)"),
+    )
     parser.add_argument(
         '--pstats-dir', metavar="HDFS_DIR", type=str,
         help="Profile each task and store stats in this dir"
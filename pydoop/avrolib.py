@@ -23,29 +23,48 @@ Avro tools.
 # module anywhere in the main code (importing it in the Avro examples
 # is OK, ofc).
 
+import copy
+import hashlib
+import json
+import os
+import struct
 import sys
+import zlib
+from abc import abstractmethod
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+import avro.io
 import avro.schema
-from avro.datafile import DataFileReader, DataFileWriter
+from avro.datafile import DataFileReader
 from avro.io import DatumReader, DatumWriter, BinaryDecoder, BinaryEncoder
 
 import pydoop.mapreduce.pipes as pp
-from pydoop.mapreduce.api import RecordWriter, RecordReader
+from pydoop.mapreduce.api import Mapper, RecordWriter, RecordReader
 import pydoop.hdfs as hdfs
 from pydoop.app.submit import AVRO_IO_CHOICES
-from pydoop.utils.py3compat import StringIO, iteritems
+from pydoop.utils.py3compat import StringIO, iteritems, clong, unicode
 
 from pydoop.config import (
     AVRO_INPUT, AVRO_KEY_INPUT_SCHEMA, AVRO_VALUE_INPUT_SCHEMA,
     AVRO_OUTPUT, AVRO_KEY_OUTPUT_SCHEMA, AVRO_VALUE_OUTPUT_SCHEMA,
+    AVRO_BATCH_SIZE, AVRO_KEY_INPUT_PROJECTION, AVRO_VALUE_INPUT_PROJECTION,
 )
 
 parse = avro.schema.Parse if sys.version_info[0] == 3 else avro.schema.parse
 
 
 class Deserializer(object):
-    def __init__(self, schema_str):
+    def __init__(self, schema_str, reader_schema_str=None):
         schema = parse(schema_str)
-        self.reader = DatumReader(schema)
+        reader_schema = None
+        if reader_schema_str is not None:
+            reader_schema = parse(reader_schema_str)
+        self.reader = DatumReader(schema, reader_schema)
 
     def deserialize(self, rec_bytes):
         return self.reader.read(BinaryDecoder(StringIO(rec_bytes)))
@@ -64,18 +83,1239 @@ class Serializer(object):
         return f.getvalue()
 
 
+# -- schema compiler --
+#
+# DatumReader and DatumWriter walk the schema for every datum, with a
+# method call per node and a dictionary lookup per type. For a given
+# schema, however, the sequence of operations is always the same, so
+# we generate (and cache) Python code that performs it directly.
+
+_FLOAT = struct.Struct("<f")
+_DOUBLE = struct.Struct("<d")
+_INT_TYPES = (int, clong)
+_NUM_TYPES = (int, clong, float)
+_STR_TYPES = (unicode, str)
+_INT_RANGE = (-(1 << 31), (1 << 31) - 1)
+_LONG_RANGE = (-(1 << 63), (1 << 63) - 1)
+_validate = getattr(avro.io, "Validate", None) or avro.io.validate
+_PY2 = sys.version_info[0] == 2
+_PROMOTIONS = {
+    "int": ("long", "float", "double"),
+    "long": ("float", "double"),
+    "float": ("double",),
+    "string": ("bytes",),
+    "bytes": ("string",),
+}
+
+
+def _is_utf8(s):
+    # Python 2: byte strings are valid Avro strings only if UTF-8 encoded
+    if isinstance(s, unicode):
+        return True
+    if not isinstance(s, str):
+        return False
+    try:
+        s.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _read_long(b, p):
+    n = b[p]
+    p += 1
+    v, shift = n & 0x7F, 7
+    while n & 0x80:
+        n = b[p]
+        p += 1
+        v |= (n & 0x7F) << shift
+        shift += 7
+    return (v >> 1) ^ -(v & 1), p
+
+
+def _write_long(o, n):
+    n = (n << 1) ^ (n >> 63)
+    while n & ~0x7F:
+        o.append((n & 0x7F) | 0x80)
+        n >>= 7
+    o.append(n)
+
+
+def _long_bytes(n):
+    o = bytearray()
+    _write_long(o, n)
+    return bytes(o)
+
+
+def _names_match(w, r):
+    # unqualified names, as in the Avro spec, or reader aliases
+    if w.name == r.name:
+        return True
+    aliases = r.props.get("aliases") or ()
+    return w.fullname in aliases or w.name in (
+        _.rsplit(".", 1)[-1] for _ in aliases
+    )
+
+
+def _schemas_match(w, r, exact=False):
+    # can data written with w be read with r?
+    wt, rt = w.type, r.type
+    if wt != rt:
+        return not exact and rt in _PROMOTIONS.get(wt, ())
+    if wt in ("record", "error", "enum"):
+        return _names_match(w, r)
+    if wt == "fixed":
+        return w.size == r.size and _names_match(w, r)
+    return True
+
+
+def _default_datum(s, value):
+    # convert the JSON default value of a field with schema s
+    t = s.type
+    if t == "union":
+        return _default_datum(s.schemas[0], value)
+    if t == "bytes" or t == "fixed":
+        return value.encode("latin-1") if isinstance(value, unicode) else value
+    if t == "float" or t == "double":
+        return float(value)
+    if t == "array":
+        return [_default_datum(s.items, _) for _ in value]
+    if t == "map":
+        return dict(
+            (k, _default_datum(s.values, v)) for k, v in iteritems(value)
+        )
+    if t in ("record", "error"):
+        return dict((f.name, _default_datum(
+            f.type, value[f.name] if f.name in value else f.default
+        )) for f in s.fields)
+    return value
+
+
+class _SchemaCompiler(object):
+    """
+    Generate the source code of ``decode(b, p)``, which reads a datum
+    from the bytearray ``b`` starting at position ``p`` and returns it
+    together with the position that follows it, of ``encode(o, d)``,
+    which appends the encoding of datum ``d`` to the bytearray ``o``,
+    and of ``skip(b, p)``, which returns the position that follows the
+    datum at ``p`` without decoding it. Records get their own
+    functions, so that recursive schemas are supported.
+
+    If ``reader_schema`` is not :obj:`None`, the decoder resolves data
+    against it, following the Avro schema resolution rules: writer
+    fields that are not in the reader schema are skipped, reader fields
+    that are not in the writer schema get their default value, and
+    numeric and string/bytes values are promoted as needed.
+
+    For record schemas, the source also includes ``decode_columns(b, p,
+    n)``, which decodes ``n`` records into a tuple of per-field lists
+    (one for each name in ``column_names``), leaving string values
+    UTF-8 encoded.
+    """
+    def __init__(self, schema, reader_schema=None):
+        self.ns = {
+            "_read_long": _read_long, "_write_long": _write_long,
+            "_FLOAT": _FLOAT, "_DOUBLE": _DOUBLE,
+            "_INT_TYPES": _INT_TYPES, "_NUM_TYPES": _NUM_TYPES,
+            "_STR_TYPES": _STR_TYPES, "_validate": _validate,
+            "_is_utf8": _is_utf8, "unicode": unicode,
+            "AvroTypeException": avro.io.AvroTypeException,
+            "AvroException": avro.schema.AvroException,
+            "_deepcopy": copy.deepcopy,
+        }
+        self.n = 0
+        self.functions = {}
+        self.pending = []
+        self.lines = []
+        body = []
+        self.read(schema, "v", body, "    ", reader_schema)
+        body.append("    return v, p")
+        self.__add_function("decode", "b, p", body)
+        body = []
+        self.write(schema, "d", body, "    ")
+        self.__add_function("encode", "o, d", body)
+        body = []
+        self.skip(schema, body, "    ")
+        body.append("    return p")
+        self.__add_function("skip", "b, p", body)
+        self.column_names = self.column_schemas = None
+        if schema.type == "record":
+            body = []
+            self.column_names, self.column_schemas = self.read_columns(
+                schema, body, "    ", reader_schema
+            )
+            self.__add_function("decode_columns", "b, p, n", body)
+        while self.pending:
+            kind, name, s, proj = self.pending.pop()
+            body = []
+            if kind == "read":
+                self.read_record(s, body, "    ", proj)
+            elif kind == "skip":
+                self.skip_record(s, body, "    ")
+            else:
+                self.write_record(s, "d", body, "    ")
+            args = "o, d" if kind == "write" else "b, p"
+            self.__add_function(name, args, body)
+        self.source = "\n".join(self.lines) + "\n"
+
+    def __add_function(self, name, args, body):
+        self.lines.append("def %s(%s):" % (name, args))
+        self.lines.extend(body or ["    pass"])
+        self.lines.append("")
+
+    def var(self, prefix):
+        self.n += 1
+        return "%s%d" % (prefix, self.n)
+
+    def const(self, value):
+        name = self.var("_c")
+        self.ns[name] = value
+        return name
+
+    def record_function(self, kind, s, proj=None):
+        key = (kind, s.fullname, None if proj is None else str(proj))
+        try:
+            return self.functions[key]
+        except KeyError:
+            name = self.functions[key] = self.var("_%s_" % kind)
+            self.pending.append((kind, name, s, proj))
+            return name
+
+    # -- decoding --
+
+    def read_long(self, target, out, ind):
+        n = self.var("n")
+        out.extend([
+            "%s%s = b[p]" % (ind, n),
+            "%sif %s < 0x80:" % (ind, n),
+            "%s    p += 1" % ind,
+            "%s    %s = (%s >> 1) ^ -(%s & 1)" % (ind, target, n, n),
+            "%selse:" % ind,
+            "%s    %s, p = _read_long(b, p)" % (ind, target),
+        ])
+
+    def read_bytes(self, target, out, ind):
+        n = self.var("n")
+        self.read_long(n, out, ind)
+        out.extend([
+            "%s%s = bytes(b[p:p + %s])" % (ind, target, n),
+            "%sp += %s" % (ind, n),
+        ])
+
+    def read_string(self, target, out, ind):
+        n = self.var("n")
+        self.read_long(n, out, ind)
+        out.extend([
+            "%s%s = b[p:p + %s].decode('utf-8')" % (ind, target, n),
+            "%sp += %s" % (ind, n),
+        ])
+
+    def read_block_count(self, target, out, ind):
+        self.read_long(target, out, ind)
+        out.extend([
+            "%sif %s < 0:" % (ind, target),
+            "%s    %s = -%s" % (ind, target, target),
+            "%s    _, p = _read_long(b, p)" % ind,
+        ])
+
+    def default(self, value):
+        # expression for a default value (mutable ones are copied)
+        if isinstance(value, (dict, list)):
+            return "_deepcopy(%s)" % self.const(value)
+        return self.const(value)
+
+    def resolve_branch(self, w, r):
+        # reader schema for data written with w, or None if no match
+        if r.type != "union":
+            return r if _schemas_match(w, r) else None
+        for exact in True, False:
+            for branch in r.schemas:
+                if _schemas_match(w, branch, exact):
+                    return branch
+        return None
+
+    def read(self, s, target, out, ind, r=None):
+        t = s.type
+        if r is not None and t != "union":
+            resolved = self.resolve_branch(s, r)
+            if resolved is None:
+                raise avro.io.SchemaResolutionException(
+                    "writer and reader schemas do not match", s, r
+                )
+            r = resolved
+            if r.type != t:
+                self.read_promoted(s, r, target, out, ind)
+                return
+        if t == "null":
+            out.append("%s%s = None" % (ind, target))
+        elif t == "boolean":
+            out.extend([
+                "%s%s = b[p] == 1" % (ind, target),
+                "%sp += 1" % ind,
+            ])
+        elif t == "int" or t == "long":
+            self.read_long(target, out, ind)
+        elif t == "float" or t == "double":
+            st, size = ("_FLOAT", 4) if t == "float" else ("_DOUBLE", 8)
+            out.extend([
+                "%s%s = %s.unpack_from(b, p)[0]" % (ind, target, st),
+                "%sp += %d" % (ind, size),
+            ])
+        elif t == "bytes":
+            self.read_bytes(target, out, ind)
+        elif t == "string":
+            self.read_string(target, out, ind)
+        elif t == "fixed":
+            out.extend([
+                "%s%s = bytes(b[p:p + %d])" % (ind, target, s.size),
+                "%sp += %d" % (ind, s.size),
+            ])
+        elif t == "enum":
+            self.read_enum(s, target, out, ind, r)
+        elif t == "array" or t == "map":
+            n, item = self.var("n"), self.var("v")
+            out.extend([
+                "%s%s = %s" % (ind, target, "[]" if t == "array" else "{}"),
+                "%swhile True:" % ind,
+            ])
+            self.read_block_count(n, out, ind + "    ")
+            out.extend([
+                "%s    if not %s:" % (ind, n),
+                "%s        break" % ind,
+                "%s    for _ in range(%s):" % (ind, n),
+            ])
+            if t == "array":
+                self.read(s.items, item, out, ind + "        ",
+                          None if r is None else r.items)
+                out.append("%s        %s.append(%s)" % (ind, target, item))
+            else:
+                k = self.var("k")
+                self.read_string(k, out, ind + "        ")
+                self.read(s.values, item, out, ind + "        ",
+                          None if r is None else r.values)
+                out.append("%s        %s[%s] = %s" % (ind, target, k, item))
+        elif t == "union":
+            i = self.var("i")
+            self.read_long(i, out, ind)
+            for j, branch in enumerate(s.schemas):
+                out.append("%s%s %s == %d:" % (
+                    ind, "elif" if j else "if", i, j
+                ))
+                resolved = None if r is None else self.resolve_branch(
+                    branch, r
+                )
+                if r is not None and resolved is None:
+                    # only an error if the writer actually used it
+                    out.append(
+                        "%s    raise AvroException(%r)" % (
+                            ind, "union branch %d does not match the "
+                            "reader schema" % j
+                        )
+                    )
+                    continue
+                self.read(branch, target, out, ind + "    ", resolved)
+            self.invalid_union_index(i, out, ind)
+        elif t in ("record", "error", "request"):
+            name = self.record_function("read", s, r)
+            out.append("%s%s, p = %s(b, p)" % (ind, target, name))
+        else:
+            raise avro.schema.AvroException("unknown type: %r" % (t,))
+
+    def read_promoted(self, s, r, target, out, ind):
+        t = s.type
+        if t == "int" or t == "long":
+            self.read_long(target, out, ind)
+            if r.type != "long":
+                out.append("%s%s = float(%s)" % (ind, target, target))
+        elif t == "float":
+            self.read(s, target, out, ind)
+        elif t == "string":
+            self.read_bytes(target, out, ind)
+        else:
+            self.read_string(target, out, ind)
+
+    def read_enum(self, s, target, out, ind, r=None):
+        i = self.var("i")
+        self.read_long(i, out, ind)
+        symbols = tuple(s.symbols)
+        if r is not None and tuple(r.symbols) != symbols:
+            known, default = set(r.symbols), r.props.get("default")
+            symbols = tuple(_ if _ in known else default for _ in symbols)
+        out.append("%s%s = %s[%s]" % (ind, target, self.const(symbols), i))
+        if None in symbols:
+            out.extend([
+                "%sif %s is None:" % (ind, target),
+                "%s    raise AvroException('enum symbol not in the "
+                "reader schema')" % ind,
+            ])
+
+    def resolved_fields(self, s, r):
+        # writer field name -> (output position, output name, reader
+        # type), plus (output position, output name, default) for
+        # reader fields that are not in the writer schema
+        if r is None:
+            return dict(
+                (f.name, (i, f.name, None)) for i, f in enumerate(s.fields)
+            ), []
+        writer_names = set(f.name for f in s.fields)
+        wanted, defaults = {}, []
+        for i, f in enumerate(r.fields):
+            for name in [f.name] + list(f.props.get("aliases") or ()):
+                if name in writer_names:
+                    wanted[name] = (i, f.name, f.type)
+                    break
+            else:
+                if not f.has_default:
+                    raise avro.io.SchemaResolutionException(
+                        "reader field %r is not in the writer schema and "
+                        "has no default" % (f.name,), s, r
+                    )
+                defaults.append(
+                    (i, f.name, _default_datum(f.type, f.default))
+                )
+        return wanted, defaults
+
+    def read_record(self, s, out, ind, r=None):
+        wanted, defaults = self.resolved_fields(s, r)
+        values = []
+        for f in s.fields:
+            try:
+                i, name, ftype = wanted[f.name]
+            except KeyError:
+                self.skip(f.type, out, ind)
+                continue
+            v = self.var("v")
+            self.read(f.type, v, out, ind, ftype)
+            values.append((i, "%r: %s" % (str(name), v)))
+        for i, name, value in defaults:
+            values.append((i, "%r: %s" % (str(name), self.default(value))))
+        values.sort()
+        out.append("%sreturn {%s}, p" % (
+            ind, ", ".join(_[1] for _ in values)
+        ))
+
+    def read_columns(self, s, out, ind, r=None):
+        wanted, defaults = self.resolved_fields(s, r)
+        n_columns = len(wanted) + len(defaults)
+        names, schemas = [None] * n_columns, [None] * n_columns
+        columns = [self.var("c") for _ in range(n_columns)]
+        for f in s.fields:
+            if f.name in wanted:
+                i, name, ftype = wanted[f.name]
+                names[i], schemas[i] = str(name), ftype or f.type
+        for c in columns:
+            out.extend([
+                "%s%s = []" % (ind, c),
+                "%s%s_append = %s.append" % (ind, c, c),
+            ])
+        out.append("%sfor _ in range(n):" % ind)
+        loop_ind, n = ind + "    ", len(out)
+        for f in s.fields:
+            try:
+                i, name, ftype = wanted[f.name]
+            except KeyError:
+                self.skip(f.type, out, loop_ind)
+                continue
+            v = self.var("v")
+            raw = ("string", "bytes")
+            if f.type.type in raw and (ftype is None or ftype.type in raw):
+                self.read_bytes(v, out, loop_ind)
+            else:
+                self.read(f.type, v, out, loop_ind, ftype)
+            out.append("%s%s_append(%s)" % (loop_ind, columns[i], v))
+        if len(out) == n:
+            out.append("%spass" % loop_ind)
+        for i, name, value in defaults:
+            f = [_ for _ in r.fields if _.name == name][0]
+            names[i], schemas[i] = str(name), f.type
+            if f.type.type == "string":
+                value = value.encode("utf-8")
+            out.append("%s%s = [%s for _ in range(n)]" % (
+                ind, columns[i], self.default(value)
+            ))
+        out.append("%sreturn (%s), p" % (
+            ind, "".join("%s, " % _ for _ in columns)
+        ))
+        return names, schemas
+
+    def invalid_union_index(self, i, out, ind):
+        out.extend([
+            "%selse:" % ind,
+            "%s    raise AvroException('invalid union index: %%d' %% %s)" % (
+                ind, i
+            ),
+        ])
+
+    # -- skipping --
+
+    def skip_long(self, out, ind):
+        out.extend([
+            "%swhile b[p] & 0x80:" % ind,
+            "%s    p += 1" % ind,
+            "%sp += 1" % ind,
+        ])
+
+    def skip_bytes(self, out, ind):
+        n = self.var("n")
+        self.read_long(n, out, ind)
+        out.append("%sp += %s" % (ind, n))
+
+    def skip(self, s, out, ind):
+        t = s.type
+        if t == "null":
+            pass
+        elif t == "boolean":
+            out.append("%sp += 1" % ind)
+        elif t == "int" or t == "long" or t == "enum":
+            self.skip_long(out, ind)
+        elif t == "float":
+            out.append("%sp += 4" % ind)
+        elif t == "double":
+            out.append("%sp += 8" % ind)
+        elif t == "bytes" or t == "string":
+            self.skip_bytes(out, ind)
+        elif t == "fixed":
+            out.append("%sp += %d" % (ind, s.size))
+        elif t == "array" or t == "map":
+            # blocks with a negative count also store their size in bytes
+            n, size = self.var("n"), self.var("n")
+            out.append("%swhile True:" % ind)
+            self.read_long(n, out, ind + "    ")
+            out.extend([
+                "%s    if not %s:" % (ind, n),
+                "%s        break" % ind,
+                "%s    if %s < 0:" % (ind, n),
+            ])
+            self.read_long(size, out, ind + "        ")
+            out.extend([
+                "%s        p += %s" % (ind, size),
+                "%s        continue" % ind,
+                "%s    for _ in range(%s):" % (ind, n),
+            ])
+            if t == "map":
+                self.skip_bytes(out, ind + "        ")
+            self.skip_block(s.items if t == "array" else s.values, out,
+                            ind + "        ")
+        elif t == "union":
+            i = self.var("i")
+            self.read_long(i, out, ind)
+            for j, branch in enumerate(s.schemas):
+                out.append("%s%s %s == %d:" % (
+                    ind, "elif" if j else "if", i, j
+                ))
+                self.skip_block(branch, out, ind + "    ")
+            self.invalid_union_index(i, out, ind)
+        elif t in ("record", "error", "request"):
+            name = self.record_function("skip", s)
+            out.append("%sp = %s(b, p)" % (ind, name))
+        else:
+            raise avro.schema.AvroException("unknown type: %r" % (t,))
+
+    def skip_block(self, s, out, ind):
+        # skip, as the body of a compound statement
+        n = len(out)
+        self.skip(s, out, ind)
+        if len(out) == n:
+            out.append("%spass" % ind)
+
+    def skip_record(self, s, out, ind):
+        for f in s.fields:
+            self.skip(f.type, out, ind)
+        out.append("%sreturn p" % ind)
+
+    # -- encoding --
+
+    def write_long(self, expr, out, ind):
+        out.extend([
+            "%sif -64 <= %s < 64:" % (ind, expr),
+            "%s    o.append((%s << 1) ^ (%s >> 63))" % (ind, expr, expr),
+            "%selse:" % ind,
+            "%s    _write_long(o, %s)" % (ind, expr),
+        ])
+
+    def write_bytes(self, expr, out, ind):
+        n = self.var("n")
+        out.append("%s%s = len(%s)" % (ind, n, expr))
+        self.write_long(n, out, ind)
+        out.append("%so += %s" % (ind, expr))
+
+    def write_string(self, expr, out, ind):
+        v = self.var("s")
+        if _PY2:  # byte strings are already UTF-8 encoded (see predicate)
+            out.append("%s%s = %s.encode('utf-8') if isinstance(%s, "
+                       "unicode) else %s" % (ind, v, expr, expr, expr))
+        else:
+            out.append("%s%s = %s.encode('utf-8')" % (ind, v, expr))
+        self.write_bytes(v, out, ind)
+
+    def check(self, s, expr, out, ind):
+        # reject values of the wrong type with the same exception (rather
+        # than whatever the encoding code happens to raise, if anything)
+        out.extend([
+            "%sif not (%s):" % (ind, self.predicate(s, expr, False)),
+            "%s    raise AvroTypeException(%s, %s)" % (
+                ind, self.const(s), expr
+            ),
+        ])
+
+    def write(self, s, expr, out, ind, checked=False):
+        t = s.type
+        if not checked and t != "union":
+            self.check(s, expr, out, ind)
+        if t == "null":
+            pass
+        elif t == "boolean":
+            out.append("%so.append(1 if %s else 0)" % (ind, expr))
+        elif t == "int" or t == "long":
+            self.write_long(expr, out, ind)
+        elif t == "float" or t == "double":
+            st = "_FLOAT" if t == "float" else "_DOUBLE"
+            out.append("%so += %s.pack(%s)" % (ind, st, expr))
+        elif t == "bytes":
+            self.write_bytes(expr, out, ind)
+        elif t == "string":
+            self.write_string(expr, out, ind)
+        elif t == "fixed":
+            out.append("%so += %s" % (ind, expr))
+        elif t == "enum":
+            i = self.var("i")
+            index = dict((_, j) for j, _ in enumerate(s.symbols))
+            out.append("%s%s = %s[%s]" % (ind, i, self.const(index), expr))
+            self.write_long(i, out, ind)
+        elif t == "array" or t == "map":
+            n, item = self.var("n"), self.var("v")
+            out.extend([
+                "%s%s = len(%s)" % (ind, n, expr),
+                "%sif %s:" % (ind, n),
+            ])
+            self.write_long(n, out, ind + "    ")
+            if t == "array":
+                out.append("%s    for %s in %s:" % (ind, item, expr))
+            else:
+                k = self.var("k")
+                out.extend([
+                    "%s    for %s, %s in %s.items():" % (ind, k, item, expr),
+                    "%s        if not %s:" % (ind, self.string_predicate(k)),
+                    "%s            raise AvroTypeException(%s, %s)" % (
+                        ind, self.const(s), expr
+                    ),
+                ])
+                self.write_string(k, out, ind + "        ")
+            self.write_block(s.items if t == "array" else s.values, item,
+                             out, ind + "        ")
+            out.append("%so.append(0)" % ind)
+        elif t == "union":
+            kinds = [self.kind(_) for _ in s.schemas]
+            for j, branch in enumerate(s.schemas):
+                deep = kinds.count(kinds[j]) > 1
+                out.append("%s%s %s:" % (
+                    ind, "elif" if j else "if",
+                    self.predicate(branch, expr, deep)
+                ))
+                out.append("%s    o += %s" % (
+                    ind, self.const(_long_bytes(j))
+                ))
+                # the predicate has already checked the datum
+                self.write(branch, expr, out, ind + "    ", checked=True)
+            out.extend([
+                "%selse:" % ind,
+                "%s    raise AvroTypeException(%s, %s)" % (
+                    ind, self.const(s), expr
+                ),
+            ])
+        elif t in ("record", "error", "request"):
+            name = self.record_function("write", s)
+            out.append("%s%s(o, %s)" % (ind, name, expr))
+        else:
+            raise avro.schema.AvroException("unknown type: %r" % (t,))
+
+    def write_block(self, s, expr, out, ind):
+        # write, as the body of a compound statement
+        n = len(out)
+        self.write(s, expr, out, ind)
+        if len(out) == n:
+            out.append("%spass" % ind)
+
+    def write_record(self, s, expr, out, ind):
+        for f in s.fields:
+            v = self.var("v")
+            out.append("%s%s = %s.get(%r)" % (ind, v, expr, str(f.name)))
+            self.write(f.type, v, out, ind)
+
+    @staticmethod
+    def kind(s):
+        if s.type in ("record", "error", "request", "map"):
+            return "dict"
+        if s.type == "array":
+            return "list"
+        return s.type
+
+    @staticmethod
+    def string_predicate(expr):
+        if _PY2:
+            return "_is_utf8(%s)" % expr
+        return "isinstance(%s, _STR_TYPES)" % expr
+
+    def predicate(self, s, expr, deep):
+        # Python types that match s, as in avro.io.Validate
+        t = s.type
+        if deep:
+            return "_validate(%s, %s)" % (self.const(s), expr)
+        if t == "null":
+            return "%s is None" % expr
+        if t == "boolean":
+            return "isinstance(%s, bool)" % expr
+        if t == "int" or t == "long":
+            lo, hi = _INT_RANGE if t == "int" else _LONG_RANGE
+            return "isinstance(%s, _INT_TYPES) and %d <= %s <= %d" % (
+                expr, lo, expr, hi
+            )
+        if t == "float" or t == "double":
+            return "isinstance(%s, _NUM_TYPES)" % expr
+        if t == "string":
+            return self.string_predicate(expr)
+        if t == "bytes":
+            return "isinstance(%s, bytes)" % expr
+        if t == "fixed":
+            return "isinstance(%s, bytes) and len(%s) == %d" % (
+                expr, expr, s.size
+            )
+        if t == "enum":
+            return "isinstance(%s, _STR_TYPES) and %s in %s" % (
+                expr, expr, self.const(frozenset(s.symbols))
+            )
+        if t == "array":
+            return "isinstance(%s, list)" % expr
+        return "isinstance(%s, dict)" % expr
+
+
+def schema_fingerprint(schema):
+    """
+    Get the fingerprint of ``schema`` (a JSON string or a parsed
+    schema), i.e., the hex MD5 digest of its JSON representation with
+    sorted keys and no whitespace.
+
+    :rtype: str
+    """
+    if not isinstance(schema, avro.schema.Schema):
+        schema = parse(schema)
+    normalized = json.dumps(
+        json.loads(str(schema)), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.md5(normalized.encode("utf-8")).hexdigest()
+
+
+class SchemaCodec(object):
+    """
+    Encode and decode Avro binary datums with functions that are
+    generated from (and specialized for) ``schema``, a JSON string or a
+    parsed schema. The generated code is available as the ``source``
+    attribute.
+
+    Unlike :class:`~avro.io.DatumWriter`, the encoder does not validate
+    the whole datum beforehand: it checks the type of each value (and
+    map key) as it encodes it, using the first matching branch for
+    unions, and raises :exc:`~avro.io.AvroTypeException` on mismatches,
+    including missing record fields that are not nullable.
+
+    If ``reader_schema`` (a JSON string or a parsed schema) is given,
+    datums are decoded according to the Avro schema resolution rules,
+    with ``schema`` as the writer schema: in particular, decoded records
+    only contain the fields that appear in the reader schema (which can
+    thus be used as a *projection*), while the other ones are skipped
+    without being decoded; fields that are missing from ``schema`` get
+    the reader's default value; ints, longs and floats are promoted to
+    wider numeric types and strings and bytes are interchangeable. The
+    reader schema does not affect encoding.
+
+    :raises: :exc:`~avro.io.SchemaResolutionException` if data written
+      with ``schema`` cannot be read with ``reader_schema``
+
+    Use :func:`get_codec` to get instances that are cached by schema
+    fingerprint.
+    """
+    def __init__(self, schema, reader_schema=None):
+        if not isinstance(schema, avro.schema.Schema):
+            schema = parse(schema)
+        if reader_schema is not None:
+            if not isinstance(reader_schema, avro.schema.Schema):
+                reader_schema = parse(reader_schema)
+        self.schema = schema
+        self.reader_schema = reader_schema
+        self.fingerprint = schema_fingerprint(schema)
+        compiler = _SchemaCompiler(schema, reader_schema)
+        self.source = compiler.source
+        ns = compiler.ns
+        code = compile(self.source, "<avro codec %s>" % self.fingerprint,
+                       "exec")
+        exec(code, ns)
+        self.__decode = ns["decode"]
+        self.__encode = ns["encode"]
+        self.__skip = ns["skip"]
+        self.__decode_columns = ns.get("decode_columns")
+        self.column_names = compiler.column_names
+        self.column_schemas = compiler.column_schemas
+
+    def encode(self, datum):
+        """
+        Encode ``datum``, returning its binary representation.
+        """
+        out = bytearray()
+        self.__encode(out, datum)
+        return bytes(out)
+
+    def encode_into(self, out, datum):
+        """
+        Append the encoding of ``datum`` to the bytearray ``out``.
+        """
+        self.__encode(out, datum)
+
+    def encode_many(self, datums):
+        """
+        Encode all ``datums`` into a single buffer, returning the list
+        of their binary representations.
+        """
+        out, ends, encode = bytearray(), [], self.__encode
+        for datum in datums:
+            encode(out, datum)
+            ends.append(len(out))
+        data, start, encoded = bytes(out), 0, []
+        for end in ends:
+            encoded.append(data[start:end])
+            start = end
+        return encoded
+
+    def decode(self, data):
+        """
+        Decode a single datum from ``data`` (bytes).
+        """
+        return self.__decode(bytearray(data), 0)[0]
+
+    def decode_at(self, buf, pos):
+        """
+        Decode the datum that starts at ``pos`` in the bytearray
+        ``buf``, returning it together with the position that follows
+        it.
+        """
+        return self.__decode(buf, pos)
+
+    def decode_many(self, data, n=None):
+        """
+        Decode ``n`` (by default, all) datums from ``data``, the
+        concatenation of their binary representations. Return a list
+        of datums.
+        """
+        buf, pos, decode = bytearray(data), 0, self.__decode
+        if n is None:
+            datums, end = [], len(buf)
+            while pos < end:
+                datum, pos = decode(buf, pos)
+                datums.append(datum)
+            return datums
+        datums = [None] * n
+        for i in range(n):
+            datums[i], pos = decode(buf, pos)
+        return datums
+
+    def skip_at(self, buf, pos):
+        """
+        Get the position that follows the datum that starts at ``pos``
+        in the bytearray ``buf``, without decoding the datum.
+        """
+        return self.__skip(buf, pos)
+
+    def split(self, data, n=None):
+        """
+        Split ``data``, the concatenation of the binary representations
+        of ``n`` (by default, all) datums, into a list of the individual
+        binary representations. Datums are skipped over, not decoded.
+        """
+        buf, pos, skip = bytearray(data), 0, self.__skip
+        data, datums = bytes(data), []
+        if n is None:
+            end = len(buf)
+            while pos < end:
+                start, pos = pos, skip(buf, pos)
+                datums.append(data[start:pos])
+            return datums
+        for _ in range(n):
+            start, pos = pos, skip(buf, pos)
+            datums.append(data[start:pos])
+        return datums
+
+    def decode_columns(self, data, n):
+        """
+        Decode ``n`` records from ``data``, the concatenation of their
+        binary representations, without building the records
+        themselves. Return a dictionary that maps each field name in
+        ``column_names`` (reader schema fields, if there is a reader
+        schema) to the list of the corresponding values. Strings
+        are **not** decoded, i.e., string values are UTF-8 encoded
+        bytes.
+
+        :raises: :exc:`ValueError` if the schema is not a record
+        """
+        if self.__decode_columns is None:
+            raise ValueError("columnar decoding requires records")
+        columns, _ = self.__decode_columns(bytearray(data), 0, n)
+        return dict(zip(self.column_names, columns))
+
+
+_CODECS = {}
+_FINGERPRINTS = {}
+
+
+def _fingerprint(schema):
+    # (fingerprint, parsed schema), the former memoized by JSON string
+    if schema is None:
+        return None, None
+    if isinstance(schema, avro.schema.Schema):
+        key = str(schema)
+    else:
+        key = schema
+    try:
+        return _FINGERPRINTS[key], schema
+    except KeyError:
+        pass
+    if not isinstance(schema, avro.schema.Schema):
+        schema = parse(schema)
+    fp = _FINGERPRINTS[key] = schema_fingerprint(schema)
+    return fp, schema
+
+
+def get_codec(schema, reader_schema=None):
+    """
+    Get a :class:`SchemaCodec` for writer schema ``schema`` and
+    ``reader_schema`` (JSON strings or parsed schemas). Code generation,
+    which includes schema resolution, happens only the first time a
+    given (writer, reader) pair of schema fingerprints (see
+    :func:`schema_fingerprint`) is seen.
+    """
+    fp, schema = _fingerprint(schema)
+    reader_fp, reader_schema = _fingerprint(reader_schema)
+    if reader_fp == fp:
+        reader_fp = reader_schema = None
+    try:
+        return _CODECS[(fp, reader_fp)]
+    except KeyError:
+        codec = _CODECS[(fp, reader_fp)] = SchemaCodec(schema, reader_schema)
+        return codec
+
+
+class CompiledDeserializer(object):
+
+    def __init__(self, schema_str, reader_schema_str=None):
+        self.codec = get_codec(schema_str, reader_schema_str)
+
+    def deserialize(self, rec_bytes):
+        return self.codec.decode(rec_bytes)
+
+
+class CompiledSerializer(object):
+
+    def __init__(self, schema_str):
+        self.codec = get_codec(schema_str)
+
+    def serialize(self, record):
+        return self.codec.encode(record)
+
+    def serialize_many(self, records):
+        return self.codec.encode_many(records)
+
+
+def _serialize_many(serializer):
+    try:
+        return serializer.serialize_many
+    except AttributeError:  # e.g., pyavroc
+        serialize = serializer.serialize
+        return lambda records: [serialize(_) for _ in records]
+
+
+def _get_schemas(datum_io):
+    # writer and reader schema, with Python 2 and 3 attribute names
+    writer_schema = getattr(datum_io, "writer_schema", None)
+    if writer_schema is None:
+        writer_schema = getattr(datum_io, "writers_schema", None)
+    reader_schema = getattr(datum_io, "reader_schema", None)
+    if reader_schema is None:
+        reader_schema = getattr(datum_io, "readers_schema", None)
+    return writer_schema, reader_schema
+
+
+class CompiledDatumReader(DatumReader):
+    """
+    A :class:`~avro.io.DatumReader` that decodes with the
+    :class:`SchemaCodec` for the writer schema.
+
+    Datums are decoded from an in-memory copy of the decoder's stream
+    (for file streams, a window of at least ``WINDOW_SIZE`` bytes that
+    starts at the current position), which is assumed not to change;
+    the stream is then positioned right after the datum. If the reader
+    schema is set, data is resolved against it (see
+    :class:`SchemaCodec`), with one codec per (writer, reader) schema
+    pair, so that files written with different schema versions can be
+    read with the same datum reader. If code generation fails, this
+    falls back to the :class:`~avro.io.DatumReader` implementation.
+    """
+    WINDOW_SIZE = 1 << 16
+
+    def __init__(self, *args, **kwargs):
+        super(CompiledDatumReader, self).__init__(*args, **kwargs)
+        self.__schemas = (None, None)
+        self.__codec = None
+        self.__stream = None
+        self.__start = 0
+        self.__buf = bytearray()
+
+    def __get_codec(self):
+        writer_schema, reader_schema = schemas = _get_schemas(self)
+        if any(a is not b for a, b in zip(schemas, self.__schemas)):
+            self.__schemas = schemas
+            self.__codec = None
+            if writer_schema is not None:
+                if reader_schema is writer_schema:
+                    reader_schema = None
+                try:
+                    self.__codec = get_codec(writer_schema, reader_schema)
+                except avro.schema.AvroException:
+                    pass
+        return self.__codec
+
+    def __decode(self, codec, pos):
+        # None if the datum does not fit in the buffer
+        buf = self.__buf
+        offset = pos - self.__start
+        if offset < 0 or offset >= len(buf):
+            return None
+        try:
+            datum, end = codec.decode_at(buf, offset)
+        except (IndexError, ValueError, struct.error):
+            return None
+        if end > len(buf):
+            return None
+        return datum, self.__start + end
+
+    def read(self, decoder):
+        codec = self.__get_codec()
+        if codec is None:
+            return super(CompiledDatumReader, self).read(decoder)
+        f = decoder.reader
+        pos = f.tell()
+        if f is self.__stream:
+            res = self.__decode(codec, pos)
+        else:
+            res = None
+        size = self.WINDOW_SIZE
+        while res is None:
+            self.__stream = f
+            if hasattr(f, "getvalue"):
+                self.__start, self.__buf = 0, bytearray(f.getvalue())
+                eof = True
+            else:
+                self.__start, self.__buf = pos, bytearray(f.read(size))
+                eof = len(self.__buf) < size
+                f.seek(pos)
+            res = self.__decode(codec, pos)
+            if res is None and eof:
+                return super(CompiledDatumReader, self).read(decoder)
+            size *= 2
+        datum, end = res
+        f.seek(end)
+        return datum
+
+
+class CompiledDatumWriter(DatumWriter):
+    """
+    A :class:`~avro.io.DatumWriter` that encodes with the
+    :class:`SchemaCodec` for the writer schema.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CompiledDatumWriter, self).__init__(*args, **kwargs)
+        self.__schema = None
+        self.__codec = None
+
+    def write(self, datum, encoder):
+        schema = _get_schemas(self)[0]
+        if schema is not self.__schema:
+            self.__schema, self.__codec = schema, get_codec(schema)
+        encoder.write(self.__codec.encode(datum))
+
+
 try:
     from pyavroc import AvroDeserializer
 except ImportError as e:
-    AvroDeserializer = Deserializer
+    AvroDeserializer = CompiledDeserializer
 
 try:
     from pyavroc import AvroSerializer
 except ImportError as e:
-    AvroSerializer = Serializer
+    AvroSerializer = CompiledSerializer
 
 
 AVRO_IO_CHOICES = set(AVRO_IO_CHOICES)
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_DECOMPRESS_WORKERS = 4
+DEFAULT_SYNC_INTERVAL = 64000  # as in the Avro package
+CODECS = ("null", "deflate", "snappy", "zstandard")
+
+# job conf keys used by Avro's own MapReduce output formats
+OUTPUT_CODEC_KEY = "avro.output.codec"
+OUTPUT_LEVEL_KEYS = {
+    "deflate": "avro.mapred.deflate.level",
+    "zstandard": "avro.mapred.zstd.level",
+}
+OUTPUT_SYNC_INTERVAL_KEY = "avro.mapred.sync.interval"
+
+_MAGIC = b"Obj\x01"
+_META_SCHEMA = '{"type": "map", "values": "bytes"}'
+
+
+def _compress(codec, data, level=None):
+    if codec == "null":
+        return data
+    if codec == "deflate":
+        if level is None:
+            level = zlib.Z_DEFAULT_COMPRESSION
+        c = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return c.compress(data) + c.flush()
+    if codec == "snappy":
+        import snappy
+        # followed by the big-endian CRC32 of the uncompressed data
+        crc = zlib.crc32(data) & 0xffffffff
+        return snappy.compress(bytes(data)) + struct.pack(">I", crc)
+    if codec == "zstandard":
+        import zstandard
+        return zstandard.ZstdCompressor(
+            level=3 if level is None else level
+        ).compress(bytes(data))
+    raise avro.schema.AvroException("unknown codec: %r" % (codec,))
+
+
+def _decompress(codec, data):
+    if codec == "null":
+        return data
+    if codec == "deflate":
+        return zlib.decompress(data, -15)
+    if codec == "snappy":
+        import snappy
+        return snappy.decompress(data[:-4])  # strip the CRC32
+    if codec == "zstandard":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise avro.schema.AvroException("unknown codec: %r" % (codec,))
+
+
+class BatchDeserializer(object):
+    """
+    Deserialize lists of Avro datums that share the same schema.
+
+    Avro binary datums are self-delimiting, so, unless the C
+    deserializer from pyavroc is available, a whole batch is decoded
+    from a single buffer with the compiled decoder for the schema (see
+    :class:`SchemaCodec`), instead of decoding records one at a time.
+
+    If ``reader_schema_str`` (a JSON string) is given, records are
+    resolved against it with the corresponding :class:`SchemaCodec`
+    (e.g., the reader schema can be a projection of the writer schema,
+    in which case the fields that do not appear in it are skipped).
+
+    Use :func:`get_batch_deserializer` to get instances that are cached
+    by schema.
+    """
+    def __init__(self, schema_str, reader_schema_str=None):
+        self.schema = parse(schema_str)
+        self.reader_schema = None
+        if reader_schema_str is not None:
+            self.reader_schema = parse(reader_schema_str)
+        try:
+            self.field_names = [
+                _.name for _ in (self.reader_schema or self.schema).fields
+            ]
+        except AttributeError:  # not a record
+            self.field_names = None
+        if reader_schema_str is None:
+            self.__deserializer = AvroDeserializer(schema_str)
+        else:
+            self.__deserializer = CompiledDeserializer(
+                schema_str, reader_schema_str
+            )
+        self.__codec = getattr(self.__deserializer, "codec", None)
+        self.__column_codecs = {}
+
+    def deserialize(self, rec_bytes):
+        return self.__deserializer.deserialize(rec_bytes)
+
+    def deserialize_many(self, datums):
+        """
+        Deserialize a list of datums, returning a list of records.
+        """
+        if self.__codec is None:
+            deserialize = self.__deserializer.deserialize
+            return [deserialize(_) for _ in datums]
+        if not isinstance(datums, list):
+            datums = list(datums)
+        return self.__codec.decode_many(b"".join(datums), len(datums))
+
+    def __get_column_codec(self, fields):
+        # a codec whose reader schema only has the requested fields, so
+        # that the other ones are skipped without being decoded
+        try:
+            return self.__column_codecs[fields]
+        except KeyError:
+            pass
+        reader = self.reader_schema or self.schema
+        if set(fields) != set(self.field_names):
+            projection = json.loads(str(reader))
+            projection["fields"] = [
+                _ for _ in projection["fields"] if _["name"] in fields
+            ]
+            try:
+                reader = parse(json.dumps(projection))
+            except avro.schema.SchemaParseException:
+                pass  # a named type defined by a dropped field is used
+        codec = self.__column_codecs[fields] = get_codec(self.schema, reader)
+        return codec
+
+    def deserialize_columns(self, datums, fields=None):
+        """
+        Deserialize a list of datums whose schema is a record, returning
+        a dictionary that maps each field name in ``fields`` (default:
+        all fields) to the list of the corresponding values.
+
+        Values are appended directly to the per-field lists by the
+        compiled column decoder (see :meth:`SchemaCodec.decode_columns`),
+        without building the records, and fields that are not in
+        ``fields`` are skipped without being decoded.
+        """
+        if self.field_names is None:
+            raise ValueError("columnar deserialization requires records")
+        fields = tuple(fields or self.field_names)
+        codec = self.__get_column_codec(fields)
+        if not isinstance(datums, list):
+            datums = list(datums)
+        columns = codec.decode_columns(b"".join(datums), len(datums))
+        for name, schema in zip(codec.column_names, codec.column_schemas):
+            if schema.type == "string":
+                columns[name] = [_.decode("utf-8") for _ in columns[name]]
+        return dict((_, columns[_]) for _ in fields)
+
+
+_BATCH_DESERIALIZERS = {}
+
+
+def get_batch_deserializer(schema_str, reader_schema_str=None):
+    """
+    Get a :class:`BatchDeserializer` for ``schema_str`` and
+    ``reader_schema_str``, creating it (i.e., parsing the schemas and
+    setting up the datum reader) only the first time a given
+    combination is seen.
+    """
+    key = schema_str, reader_schema_str
+    try:
+        return _BATCH_DESERIALIZERS[key]
+    except KeyError:
+        d = _BATCH_DESERIALIZERS[key] = BatchDeserializer(*key)
+        return d
 
 
 class AvroContext(pp.TaskContext):
@@ -91,6 +1331,11 @@ class AvroContext(pp.TaskContext):
     def __init__(self, *args, **kwargs):
         super(AvroContext, self).__init__(*args, **kwargs)
         self.__serializers = {'K': None, 'V': None}
+        self.__deserializers = {'K': None, 'V': None}
+        # output serialization functions, resolved by setup_serialization
+        self.__serialize_key = self.__serialize_value = None
+        self.__serialize_keys = self.__serialize_values = None
+        self.__map_only = None
 
     def setup_deserialization(self):
         jc = self.get_job_conf()
@@ -99,20 +1344,56 @@ class AvroContext(pp.TaskContext):
             if avro_input not in AVRO_IO_CHOICES:
                 raise RuntimeError('invalid avro input: %s' % avro_input)
             if avro_input == 'K' or avro_input == 'KV':
-                deserializer = AvroDeserializer(
-                    jc.get(AVRO_KEY_INPUT_SCHEMA)
+                deserializer = self.__deserializers['K'] = (
+                    get_batch_deserializer(
+                        jc.get(AVRO_KEY_INPUT_SCHEMA),
+                        jc.get(AVRO_KEY_INPUT_PROJECTION)
+                    )
                 )
                 self.get_input_key = self.deserializing(
                     self.get_input_key, deserializer
                 )
             if avro_input == 'V' or avro_input == 'KV':
-                deserializer = AvroDeserializer(
-                    jc.get(AVRO_VALUE_INPUT_SCHEMA)
+                deserializer = self.__deserializers['V'] = (
+                    get_batch_deserializer(
+                        jc.get(AVRO_VALUE_INPUT_SCHEMA),
+                        jc.get(AVRO_VALUE_INPUT_PROJECTION)
+                    )
                 )
                 self.get_input_value = self.deserializing(
                     self.get_input_value, deserializer
                 )
 
+    def get_raw_input_key(self):
+        """
+        Get the input key as received from the framework, i.e., without
+        Avro deserialization.
+        """
+        return self._key
+
+    def get_raw_input_value(self):
+        """
+        Get the input value as received from the framework, i.e.,
+        without Avro deserialization.
+        """
+        return self._value
+
+    def deserialize_batch(self, datums, mode='V', columnar=False):
+        """
+        Deserialize a list of raw input keys (``mode='K'``) or values
+        (``mode='V'``) with a single call (see
+        :class:`BatchDeserializer`). If ``columnar`` is :obj:`True`,
+        return a dictionary of per-field lists instead of a list of
+        records. If the input is not in Avro format, ``datums`` is
+        returned as is.
+        """
+        deserializer = self.__deserializers[mode]
+        if deserializer is None:
+            return datums
+        if columnar:
+            return deserializer.deserialize_columns(datums)
+        return deserializer.deserialize_many(datums)
+
     def setup_serialization(self):
         jc = self.get_job_conf()
         if AVRO_OUTPUT in jc:
@@ -127,28 +1408,42 @@ class AvroContext(pp.TaskContext):
                 self.__serializers['V'] = AvroSerializer(
                     jc.get(AVRO_VALUE_OUTPUT_SCHEMA)
                 )
+            # We need to perform Avro serialization if we are either in
+            # a reducer or in a map-only app's mapper
+            if self.is_reducer() or self.__is_map_only():
+                key_s = self.__serializers['K']
+                value_s = self.__serializers['V']
+                if key_s is not None:
+                    self.__serialize_key = key_s.serialize
+                    self.__serialize_keys = _serialize_many(key_s)
+                if value_s is not None:
+                    self.__serialize_value = value_s.serialize
+                    self.__serialize_values = _serialize_many(value_s)
 
     def emit(self, key, value):
         """
-        Emit key and value, serializing Avro data as needed.
-
-        We need to perform Avro serialization if:
-
-        #. AVRO_OUTPUT is in the job conf and
-        #. we are either in a reducer or in a map-only app's mapper
+        Emit key and value, serializing Avro data as needed (see
+        :meth:`setup_serialization`).
         """
-        key, value = self.__serialize_as_needed(key, value)
+        if self.__serialize_key is not None:
+            key = self.__serialize_key(key)
+        if self.__serialize_value is not None:
+            value = self.__serialize_value(value)
         super(AvroContext, self).emit(key, value)
 
-    def __serialize_as_needed(self, key, value):
-        out_kv = {'K': key, 'V': value}
-        jc = self.job_conf
-        if AVRO_OUTPUT in jc and (self.is_reducer() or self.__is_map_only()):
-            for mode, record in iteritems(out_kv):
-                serializer = self.__serializers.get(mode)
-                if serializer is not None:
-                    out_kv[mode] = serializer.serialize(record)
-        return out_kv['K'], out_kv['V']
+    def emit_many(self, keys, values):
+        """
+        Emit a batch of keys and values (two sequences of the same
+        length). Avro keys and values are serialized with a single call
+        per batch.
+        """
+        if self.__serialize_keys is not None:
+            keys = self.__serialize_keys(keys)
+        if self.__serialize_values is not None:
+            values = self.__serialize_values(values)
+        emit = super(AvroContext, self).emit
+        for key, value in zip(keys, values):
+            emit(key, value)
 
     # move to super?
     def __is_map_only(self):
@@ -158,15 +1453,64 @@ class AvroContext(pp.TaskContext):
         By default, Hadoop runs a map-reduce job. To run a map-only
         job, users must explicitly set the number of reducers to 0.
         """
-        for k in 'mapreduce.job.reduces', 'mapred.reduce.tasks':
-            if self.job_conf.get_int(k, 1) < 1:
-                return True
-        return False
+        if self.__map_only is None:
+            self.__map_only = any(
+                self.job_conf.get_int(k, 1) < 1
+                for k in ('mapreduce.job.reduces', 'mapred.reduce.tasks')
+            )
+        return self.__map_only
+
+
+class AvroBatchMapper(Mapper):
+    """
+    A mapper that processes Avro input records in batches.
+
+    Rather than ``map``, subclasses implement :meth:`map_batch`, which
+    is called with lists of up to ``batch_size`` (set through the
+    ``AVRO_BATCH_SIZE`` job conf property) keys and values, each batch
+    deserialized with a single call (see
+    :meth:`AvroContext.deserialize_batch`). If the ``columnar`` class
+    attribute is :obj:`True`, Avro records are passed as dictionaries
+    of per-field lists. Must be used with an :class:`AvroContext`.
+    """
+    columnar = False
+
+    def __init__(self, context):
+        super(AvroBatchMapper, self).__init__(context)
+        self.batch_size = context.job_conf.get_int(
+            AVRO_BATCH_SIZE, DEFAULT_BATCH_SIZE
+        )
+        self.__keys, self.__values = [], []
+
+    def map(self, context):
+        self.__keys.append(context.get_raw_input_key())
+        self.__values.append(context.get_raw_input_value())
+        if len(self.__values) >= self.batch_size:
+            self.__flush()
+
+    def __flush(self):
+        ctx = self.context
+        keys = ctx.deserialize_batch(self.__keys, 'K', self.columnar)
+        values = ctx.deserialize_batch(self.__values, 'V', self.columnar)
+        self.__keys, self.__values = [], []
+        self.map_batch(ctx, keys, values)
+
+    @abstractmethod
+    def map_batch(self, context, keys, values):
+        """
+        Process a batch of input records, emitting output through the
+        context.
+        """
+        pass
+
+    def close(self):
+        if self.__values:
+            self.__flush()
 
 
 class SeekableDataFileReader(DataFileReader):
 
-    FORWARD_WINDOW_SIZE = 8192
+    FORWARD_WINDOW_SIZE = 1 << 20
 
     def align_after(self, offset):
         """
@@ -180,16 +1524,99 @@ class SeekableDataFileReader(DataFileReader):
             return
         sm = self.sync_marker
         sml = len(sm)
-        pos = offset
-        while pos < self.file_length - sml:
-            f.seek(pos)
-            data = f.read(self.FORWARD_WINDOW_SIZE)
+        pread = getattr(f, "pread", None)
+        pos, end = offset, self.file_length
+        while pos <= end - sml:
+            size = min(self.FORWARD_WINDOW_SIZE, end - pos)
+            if pread is None:
+                f.seek(pos)
+                data = f.read(size)
+            else:
+                data = pread(pos, size)
             sync_offset = data.find(sm)
             if sync_offset > -1:
                 f.seek(pos + sync_offset)
                 self._block_count = 0
                 return
-            pos += len(data)
+            if len(data) < sml:
+                break
+            # the next window overlaps this one, to catch markers that
+            # straddle the boundary
+            pos += len(data) - sml + 1
+        f.seek(end)
+        self._block_count = 0
+
+    def __read_raw_block(self):
+        # (position, count, compressed data) or None at EOF
+        f = self.reader
+        pos = f.tell()
+        if f.read(len(self.sync_marker)) != self.sync_marker:
+            f.seek(pos)
+        if f.tell() >= self.file_length:
+            return None
+        count = self.raw_decoder.read_long()
+        data = self.raw_decoder.read_bytes()
+        self._block_count = 0
+        return pos, count, data
+
+    def __decompress(self, data):
+        return _decompress(self.codec or "null", data)
+
+    def read_block(self):
+        """
+        Read the next data block as a whole, returning the number of
+        datums it contains and its uncompressed content, or :obj:`None`
+        at the end of the file. Must be called on a block boundary,
+        i.e., after :meth:`align_after` or after reading all datums in
+        the previous block.
+        """
+        block = self.__read_raw_block()
+        if block is None:
+            return None
+        return block[1], self.__decompress(block[2])
+
+    def iter_blocks(self, end=None, max_workers=DEFAULT_DECOMPRESS_WORKERS):
+        """
+        Iterate over data blocks, starting from the current one (as in
+        :meth:`read_block`) and stopping at the first one that starts
+        after ``end`` (by default, at the end of the file). Yield
+        ``(pos, count, data)`` tuples, where ``pos`` is the block's
+        offset, ``count`` the number of datums it contains and ``data``
+        its uncompressed content.
+
+        Compressed blocks are read ahead and decompressed concurrently
+        by up to ``max_workers`` threads, while still being yielded in
+        file order.
+        """
+        if end is None:
+            end = self.file_length
+        if (self.codec or "null") == "null" or max_workers < 2:
+            while self.reader.tell() <= end:
+                block = self.__read_raw_block()
+                if block is None:
+                    return
+                pos, count, data = block
+                yield pos, count, self.__decompress(data)
+            return
+        pool, pending = ThreadPool(max_workers), deque()
+        try:
+            while True:
+                while len(pending) < 2 * max_workers:
+                    if self.reader.tell() > end:
+                        break
+                    block = self.__read_raw_block()
+                    if block is None:
+                        break
+                    pos, count, data = block
+                    pending.append((pos, count, pool.apply_async(
+                        self.__decompress, (data,)
+                    )))
+                if not pending:
+                    return
+                pos, count, result = pending.popleft()
+                yield pos, count, result.get()
+        finally:
+            pool.terminate()
 
 
 # FIXME this is just an example with no error checking
@@ -197,15 +1624,24 @@ class AvroReader(RecordReader):
     """
     Avro data file reader.
 
-    Reads all data blocks that begin within the given input split.
+    Reads all data blocks that begin within the given input split. If
+    the ``reader_schema`` class attribute is set to a (parsed) schema,
+    records are resolved against it (see :class:`SchemaCodec`): this
+    allows to read files written with different versions of a schema,
+    or to read only some of the fields (projection). Resolution code is
+    generated once per (writer schema, reader schema) pair.
     """
+    reader_schema = None
+
     def __init__(self, ctx):
         super(AvroReader, self).__init__(ctx)
         isplit = ctx.input_split
         self.region_start = isplit.offset
         self.region_end = isplit.offset + isplit.length
-        self.reader = SeekableDataFileReader(hdfs.open(isplit.filename),
-                                             DatumReader())
+        self.reader = SeekableDataFileReader(
+            hdfs.open(isplit.filename),
+            CompiledDatumReader(None, self.reader_schema)
+        )
         self.reader.align_after(isplit.offset)
 
     def next(self):
@@ -225,21 +1661,285 @@ class AvroReader(RecordReader):
                    1.0)
 
 
-# FIXME this is just an example with no error checking
+class ParallelAvroReader(AvroReader):
+    """
+    Avro data file reader that decompresses several data blocks of the
+    split concurrently, with up to ``max_workers`` threads (see
+    :meth:`SeekableDataFileReader.iter_blocks`). Records are still
+    yielded in file order, each one together with the offset of the
+    block it belongs to.
+    """
+    max_workers = DEFAULT_DECOMPRESS_WORKERS
+
+    def __init__(self, ctx):
+        super(ParallelAvroReader, self).__init__(ctx)
+        self.writer_schema = _get_schemas(self.reader.datum_reader)[0]
+        self.codec = get_codec(self.writer_schema, self.reader_schema)
+        self.blocks = self.reader.iter_blocks(
+            self.region_end, self.max_workers
+        )
+        self.pos = self.region_start
+        self.__records = iter(())
+
+    def next_block(self):
+        """
+        Get the number of records in the next block and the block's
+        uncompressed content.
+        """
+        self.pos, count, data = next(self.blocks)
+        return count, data
+
+    def next(self):
+        while True:
+            try:
+                return self.pos, next(self.__records)
+            except StopIteration:
+                pass
+            count, data = self.next_block()
+            self.__records = iter(self.codec.decode_many(data, count))
+
+    def get_progress(self):
+        """
+        Give a rough estimate of the progress done.
+        """
+        return min((self.pos - self.region_start) / float(
+            self.region_end - self.region_start
+        ), 1.0)
+
+    def close(self):
+        self.blocks.close()
+
+
+class StringColumn(object):
+    """
+    A column of strings (or bytes) stored as a single buffer, ``data``,
+    together with an array of ``len(self) + 1`` offsets: item ``i`` is
+    ``data[offsets[i]:offsets[i + 1]]``, decoded from UTF-8 if
+    ``utf8`` is :obj:`True`.
+    """
+    def __init__(self, values, utf8=True):
+        self.offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(_) for _ in values), np.int64,
+                              len(values)), out=self.offsets[1:])
+        self.data = b"".join(values)
+        self.utf8 = utf8
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("column index out of range")
+        v = self.data[self.offsets[i]: self.offsets[i + 1]]
+        return v.decode("utf-8") if self.utf8 else v
+
+
+_NUMPY_TYPES = {
+    "boolean": "bool",
+    "int": "int32",
+    "long": "int64",
+    "float": "float32",
+    "double": "float64",
+}
+
+
+class AvroBatchReader(ParallelAvroReader):
+    """
+    Avro data file reader that decodes one data block (i.e., all
+    records between two sync markers) at a time into columns, for
+    mappers that process records with vectorized NumPy operations.
+
+    Each iteration yields a ``(pos, columns)`` pair, where ``pos`` is
+    the block's offset and ``columns`` is a dictionary that maps field
+    names to:
+
+    * NumPy arrays, for boolean, int, long, float and double fields;
+    * :class:`StringColumn` objects, for string and bytes fields;
+    * lists of values, for all other fields.
+
+    The file's schema must be a record. Reader schemas are supported as
+    in :class:`AvroReader`, and blocks are decompressed concurrently as
+    in :class:`ParallelAvroReader`. Requires NumPy.
+    """
+    def __init__(self, ctx):
+        if np is None:
+            raise RuntimeError("AvroBatchReader requires NumPy")
+        super(AvroBatchReader, self).__init__(ctx)
+        if self.codec.column_names is None:
+            raise ValueError("AvroBatchReader requires a record schema")
+        self.column_types = dict(zip(
+            self.codec.column_names,
+            (_.type for _ in self.codec.column_schemas)
+        ))
+
+    def next(self):
+        count, data = self.next_block()
+        columns = self.codec.decode_columns(data, count)
+        for name, values in iteritems(columns):
+            t = self.column_types[name]
+            if t in _NUMPY_TYPES:
+                columns[name] = np.array(values, dtype=_NUMPY_TYPES[t])
+            elif t == "string" or t == "bytes":
+                columns[name] = StringColumn(values, t == "string")
+        return self.pos, columns
+
+
+class CompressingDataFileWriter(object):
+    """
+    Write Avro records to ``stream`` as an Avro container file with the
+    given ``schema`` (a JSON string or a parsed schema).
+
+    Unlike :class:`~avro.datafile.DataFileWriter`, records are encoded
+    with the :class:`SchemaCodec` for ``schema`` and, if ``background``
+    is :obj:`True`, each finished block is compressed by a worker thread
+    while the next one is being filled (with at most one block waiting
+    to be written).
+
+    :type codec: str
+    :param codec: one of :data:`CODECS` (``"snappy"`` and
+      ``"zstandard"`` require the corresponding Python packages)
+    :type level: int
+    :param level: compression level (deflate and zstandard only)
+    :type sync_interval: int
+    :param sync_interval: approximate size, in bytes, of uncompressed
+      blocks
+    """
+    def __init__(self, stream, schema, codec="null", level=None,
+                 sync_interval=DEFAULT_SYNC_INTERVAL, background=True):
+        if codec not in CODECS:
+            raise ValueError("unsupported codec: %r" % (codec,))
+        if not isinstance(schema, avro.schema.Schema):
+            schema = parse(schema)
+        self.stream = stream
+        self.schema = schema
+        self.codec = codec
+        self.level = level
+        self.sync_interval = sync_interval
+        self.sync_marker = os.urandom(16)
+        self.__encode_into = get_codec(schema).encode_into
+        self.__buf = bytearray()
+        self.__count = 0
+        self.__pending = None
+        if background and codec != "null":
+            self.__pool = ThreadPool(1)
+        else:
+            self.__pool = None
+        self.closed = False
+        meta = {
+            "avro.schema": str(schema).encode("utf-8"),
+            "avro.codec": codec.encode("utf-8"),
+        }
+        self.stream.write(
+            _MAGIC + get_codec(_META_SCHEMA).encode(meta) + self.sync_marker
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, datum):
+        """
+        Append a record to the file.
+        """
+        self.__encode_into(self.__buf, datum)
+        self.__count += 1
+        if len(self.__buf) >= self.sync_interval:
+            self.__end_block()
+
+    def __end_block(self):
+        if not self.__count:
+            return
+        data, count = self.__buf, self.__count
+        self.__buf, self.__count = bytearray(), 0
+        if self.__pool is None:
+            self.__write_block(count, _compress(self.codec, data, self.level))
+            return
+        self.__wait()
+        self.__pending = count, self.__pool.apply_async(
+            _compress, (self.codec, data, self.level)
+        )
+
+    def __wait(self):
+        if self.__pending is not None:
+            count, result = self.__pending
+            self.__pending = None
+            self.__write_block(count, result.get())
+
+    def __write_block(self, count, data):
+        header = bytearray()
+        _write_long(header, count)
+        _write_long(header, len(data))
+        self.stream.write(bytes(header))
+        self.stream.write(bytes(data))
+        self.stream.write(self.sync_marker)
+
+    def flush(self):
+        """
+        End the current block, write out all pending blocks and flush
+        the underlying stream.
+        """
+        self.__end_block()
+        self.__wait()
+        self.stream.flush()
+
+    def close(self):
+        """
+        Flush the writer and close the underlying stream.
+        """
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.closed = True
+            if self.__pool is not None:
+                self.__pool.terminate()
+            self.stream.close()
+
+
 class AvroWriter(RecordWriter):
+    """
+    Avro container file writer (see :class:`CompressingDataFileWriter`)
+    that writes to the task's default work file (see
+    :meth:`~.pipes.TaskContext.get_default_work_file`), with an
+    ``.avro`` extension.
 
+    The ``schema`` class attribute must be set to the (parsed) output
+    schema. The ``codec``, ``level`` and ``sync_interval`` class
+    attributes can be overridden through the job conf properties used
+    by Avro's own output formats: ``avro.output.codec``,
+    ``avro.mapred.deflate.level`` (or ``avro.mapred.zstd.level``) and
+    ``avro.mapred.sync.interval``.
+    """
     schema = None
+    codec = "null"
+    level = None
+    sync_interval = DEFAULT_SYNC_INTERVAL
 
     def __init__(self, context):
         super(AvroWriter, self).__init__(context)
-        job_conf = context.job_conf
-        part = int(job_conf['mapreduce.task.partition'])
-        outdir = job_conf["mapreduce.task.output.dir"]
-        outfn = "%s/part-r-%05d.avro" % (outdir, part)
-        wh = hdfs.open(outfn, "w")
-        self.writer = DataFileWriter(wh, DatumWriter(), self.schema)
+        jc = context.job_conf
+        codec = jc.get(OUTPUT_CODEC_KEY, self.codec)
+        level = self.level
+        if codec in OUTPUT_LEVEL_KEYS:
+            level = jc.get_int(OUTPUT_LEVEL_KEYS[codec], level)
+        sync_interval = jc.get_int(
+            OUTPUT_SYNC_INTERVAL_KEY, self.sync_interval
+        )
+        self.file = hdfs.open(
+            context.get_default_work_file(".avro"), "w",
+            user=jc.get("pydoop.hdfs.user"), write_behind=True
+        )
+        self.writer = CompressingDataFileWriter(
+            self.file, self.schema, codec, level, sync_interval
+        )
 
     def close(self):
         self.writer.close()
-        # FIXME do we really need to explicitly close the filesystem?
-        self.writer.writer.fs.close()
+        # only releases the reference acquired by hdfs.open: the
+        # connection itself is pooled and stays open for other users
+        self.file.fs.close()
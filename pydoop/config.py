@@ -0,0 +1,10 @@
+# GENERATED BY setup.py
+AVRO_BATCH_SIZE = 'pydoop.mapreduce.avro.batch.size'
+AVRO_INPUT = 'pydoop.mapreduce.avro.input'
+AVRO_KEY_INPUT_PROJECTION = 'pydoop.mapreduce.avro.key.input.projection'
+AVRO_KEY_INPUT_SCHEMA = 'pydoop.mapreduce.avro.key.input.schema'
+AVRO_KEY_OUTPUT_SCHEMA = 'pydoop.mapreduce.avro.key.output.schema'
+AVRO_OUTPUT = 'pydoop.mapreduce.avro.output'
+AVRO_VALUE_INPUT_PROJECTION = 'pydoop.mapreduce.avro.value.input.projection'
+AVRO_VALUE_INPUT_SCHEMA = 'pydoop.mapreduce.avro.value.input.schema'
+AVRO_VALUE_OUTPUT_SCHEMA = 'pydoop.mapreduce.avro.value.output.schema'
@@ -64,23 +64,38 @@ __all__ = [
     'rmr',
     'lsl',
     'ls',
+    'ilsl',
+    'ils',
     'chmod',
     'move',
     'chown',
     'rename',
     'renames',
+    'delete_many',
+    'chmod_many',
+    'chown_many',
+    'rename_many',
+    'du',
+    'sync',
+    'glob',
+    'iglob',
     'stat',
     'lstat',
     'access',
     'utime',
+    'FSPool',
+    'get_default_pool',
+    'set_default_pool',
 ]
 
 
 import os
+import re
+import threading
 
 import pydoop
 from . import common, path
-from pydoop.utils.py3compat import bintype
+from pydoop.utils.py3compat import bintype, czip
 
 try:
     _ORIG_CLASSPATH
@@ -103,26 +118,50 @@ init()
 
 def reset():
     pydoop.reset()
+    path.clear_cache()
     init()
 # ---------------------
 
 
 from .fs import hdfs, default_is_local
+from .pool import FSPool, get_default_pool, set_default_pool
+from .file import FollowReader
 
 
 def open(hdfs_path, mode="r", buff_size=0, replication=0, blocksize=0,
-         user=None, encoding=None, errors=None):
+         user=None, encoding=None, errors=None, use_mmap=False,
+         write_behind=False, follow=False):
     """
     Open a file, returning an :class:`~.file.hdfs_file` object.
 
     ``hdfs_path`` and ``user`` are passed to :func:`~path.split`,
-    while the other args are passed to the :class:`~.file.hdfs_file`
-    constructor.
+    while the other args are passed to :meth:`~.fs.hdfs.open_file`.
+    In particular, if ``use_mmap`` is :obj:`True`, local files opened
+    for reading are memory-mapped (see :class:`~.file.local_mmap_file`),
+    while if ``write_behind`` is :obj:`True`, HDFS files opened for
+    writing are written to by a background thread.
+
+    If ``follow`` is :obj:`True` (read modes only), return a
+    :class:`~.file.FollowReader` that keeps yielding data as it is
+    appended to the file by another process:
+
+    .. code-block:: python
+
+      >>> with hdfs.open("/user/me/app.log", "rt", follow=True) as f:
+      ...     for line in f:
+      ...         process(line)
     """
     host, port, path_ = path.split(hdfs_path, user)
-    fs = hdfs(host, port, user)
+    if follow:
+        base_mode, is_text = common.parse_mode(mode)
+        if base_mode != "r":
+            raise ValueError("follow is only supported in read mode")
+        fs = get_default_pool().connect(host, port, user)
+        f = fs.open_file(path_, "r", buff_size)
+        return FollowReader(f, is_text, encoding, errors)
+    fs = get_default_pool().connect(host, port, user)
     return fs.open_file(path_, mode, buff_size, replication, blocksize,
-                        encoding, errors)
+                        encoding, errors, use_mmap, write_behind)
 
 
 def dump(data, hdfs_path, **kwargs):
@@ -158,9 +197,13 @@ def load(hdfs_path, **kwargs):
     return data
 
 
-def _cp_file(src_fs, src_path, dest_fs, dest_path, **kwargs):
+def _cp_file(src_fs, src_path, dest_fs, dest_path, digests=None,
+             hash_in_thread=False, **kwargs):
     kwargs.pop("mode", None)
     kwargs["mode"] = "r"
+    digester = None
+    if digests is not None:
+        digester = common.Digester(digests, threaded=hash_in_thread)
     with src_fs.open_file(src_path, **kwargs) as fi:
         kwargs["mode"] = "w"
         with dest_fs.open_file(dest_path, **kwargs) as fo:
@@ -169,24 +212,26 @@ def _cp_file(src_fs, src_path, dest_fs, dest_path, **kwargs):
                 chunk = fi.read(bufsize)
                 if chunk:
                     fo.write(chunk)
+                    if digester is not None:
+                        digester.update(chunk)
                 else:
                     break
+    return None if digester is None else digester.hexdigests()
 
 
-def cp(src_hdfs_path, dest_hdfs_path, **kwargs):
-    """\
-    Copy the contents of ``src_hdfs_path`` to ``dest_hdfs_path``.
-
-    If ``src_hdfs_path`` is a directory, its contents will be copied
-    recursively. Source file(s) are opened for reading and copies are
-    opened for writing. Additional keyword arguments, if any, are
-    handled like in :func:`open`.
-    """
+def _cp(src_hdfs_path, dest_hdfs_path, results, **kwargs):
     src, dest = {}, {}
+
+    def cp_file():
+        d = _cp_file(src["fs"], src["path"], dest["fs"], dest["path"],
+                     **kwargs)
+        if results is not None:
+            results[dest["fs"].get_path_info(dest["path"])["name"]] = d
+
     try:
         for d, p in ((src, src_hdfs_path), (dest, dest_hdfs_path)):
             d["host"], d["port"], d["path"] = path.split(p)
-            d["fs"] = hdfs(d["host"], d["port"])
+            d["fs"] = get_default_pool().connect(d["host"], d["port"])
         # --- does src exist? ---
         try:
             src["info"] = src["fs"].get_path_info(src["path"])
@@ -197,14 +242,13 @@ def cp(src_hdfs_path, dest_hdfs_path, **kwargs):
             dest["info"] = dest["fs"].get_path_info(dest["path"])
         except IOError:
             if src["info"]["kind"] == "file":
-                _cp_file(src["fs"], src["path"], dest["fs"], dest["path"],
-                         **kwargs)
+                cp_file()
                 return
             else:
                 dest["fs"].create_directory(dest["path"])
                 dest_hdfs_path = dest["fs"].get_path_info(dest["path"])["name"]
                 for item in src["fs"].list_directory(src["path"]):
-                    cp(item["name"], dest_hdfs_path, **kwargs)
+                    _cp(item["name"], dest_hdfs_path, results, **kwargs)
                 return
         # --- dest exists. Is it a file? ---
         if dest["info"]["kind"] == "file":
@@ -214,13 +258,12 @@ def cp(src_hdfs_path, dest_hdfs_path, **kwargs):
         if dest["fs"].exists(dest["path"]):
             raise IOError("%r already exists" % (dest["path"]))
         if src["info"]["kind"] == "file":
-            _cp_file(src["fs"], src["path"], dest["fs"], dest["path"],
-                     **kwargs)
+            cp_file()
         else:
             dest["fs"].create_directory(dest["path"])
             dest_hdfs_path = dest["fs"].get_path_info(dest["path"])["name"]
             for item in src["fs"].list_directory(src["path"]):
-                cp(item["name"], dest_hdfs_path, **kwargs)
+                _cp(item["name"], dest_hdfs_path, results, **kwargs)
     finally:
         for d in src, dest:
             try:
@@ -229,6 +272,38 @@ def cp(src_hdfs_path, dest_hdfs_path, **kwargs):
                 pass
 
 
+def cp(src_hdfs_path, dest_hdfs_path, digests=None, hash_in_thread=False,
+       **kwargs):
+    """\
+    Copy the contents of ``src_hdfs_path`` to ``dest_hdfs_path``.
+
+    If ``src_hdfs_path`` is a directory, its contents will be copied
+    recursively. Source file(s) are opened for reading and copies are
+    opened for writing. Additional keyword arguments, if any, are
+    handled like in :func:`open`.
+
+    If ``digests`` is not :obj:`None`, digests of the copied data are
+    computed on the fly, as it is read (see
+    :class:`~.common.Digester`): if ``hash_in_thread`` is
+    :obj:`True`, this is done by a separate thread. ``digests`` can be
+    either a callable, which is called with each chunk of data, or a
+    sequence of algorithm names such as ``["md5", "crc32c"]``; in the
+    latter case, the return value is a dictionary that maps the fully
+    qualified name of each copied file to a dictionary of hex digests:
+
+    .. code-block:: python
+
+      >>> hdfs.cp("foo.txt", "bar.txt", digests=["md5"])
+      {'hdfs://localhost:9000/user/me/bar.txt': {'md5': '5d41402a...'}}
+    """
+    results = None
+    if digests is not None and not callable(digests):
+        results = {}
+    _cp(src_hdfs_path, dest_hdfs_path, results, digests=digests,
+        hash_in_thread=hash_in_thread, **kwargs)
+    return results
+
+
 def put(src_path, dest_hdfs_path, **kwargs):
     """\
     Copy the contents of ``src_path`` to ``dest_hdfs_path``.
@@ -236,9 +311,9 @@ def put(src_path, dest_hdfs_path, **kwargs):
     ``src_path`` is forced to be interpreted as an ordinary local path
     (see :func:`~path.abspath`). The source file is opened for reading
     and the copy is opened for writing. Additional keyword arguments,
-    if any, are handled like in :func:`open`.
+    if any, are handled like in :func:`cp`.
     """
-    cp(path.abspath(src_path, local=True), dest_hdfs_path, **kwargs)
+    return cp(path.abspath(src_path, local=True), dest_hdfs_path, **kwargs)
 
 
 def get(src_hdfs_path, dest_path, **kwargs):
@@ -248,9 +323,255 @@ def get(src_hdfs_path, dest_path, **kwargs):
     ``dest_path`` is forced to be interpreted as an ordinary local
     path (see :func:`~path.abspath`). The source file is opened for
     reading and the copy is opened for writing. Additional keyword
-    arguments, if any, are handled like in :func:`open`.
+    arguments, if any, are handled like in :func:`cp`.
     """
-    cp(src_hdfs_path, path.abspath(dest_path, local=True), **kwargs)
+    return cp(src_hdfs_path, path.abspath(dest_path, local=True), **kwargs)
+
+
+def _path_info(fs, path_):
+    try:
+        return fs.get_path_info(path_)
+    except IOError:
+        return None
+
+
+def _walk_tree(fs, root, max_workers):
+    # map paths relative to root (a path info) to path infos
+    if root is None:
+        return None
+    tree = {"": root}
+    prefix_len = len(root["name"].rstrip("/")) + 1
+    lock = threading.Lock()
+
+    def process(name):
+        subdirs = []
+        for info in fs.list_directory(name):
+            with lock:
+                tree[info["name"][prefix_len:]] = info
+            if info["kind"] == "directory":
+                subdirs.append(info["name"])
+        return subdirs
+
+    if root["kind"] == "directory":
+        common.traverse_concurrently(process, [root["name"]], max_workers)
+    return tree
+
+
+def _is_under(rel, parent):
+    return not parent or rel == parent or rel.startswith(parent + "/")
+
+
+def _file_digest(fs, path_, algorithm, length=None, offset=0):
+    # digest of length (by default, all remaining) bytes from offset
+    digester = common.Digester([algorithm])
+    with fs.open_file(path_) as f:
+        if offset:
+            f.seek(offset)
+        while length is None or length > 0:
+            size = common.BUFSIZE if length is None else min(
+                common.BUFSIZE, length
+            )
+            chunk = f.read(size)
+            if not chunk:
+                break
+            digester.update(chunk)
+            if length is not None:
+                length -= len(chunk)
+    return digester.hexdigests()[algorithm]
+
+
+_RESUME_CHECK_SIZE = 1048576  # see sync
+
+
+def _append_file(src_fs, src_path, dest_fs, dest_path, offset):
+    with src_fs.open_file(src_path) as fi:
+        fi.seek(offset)
+        with dest_fs.open_file(dest_path, "a") as fo:
+            while True:
+                chunk = fi.read(common.BUFSIZE)
+                if not chunk:
+                    break
+                fo.write(chunk)
+
+
+def sync(src_hdfs_path, dest_hdfs_path, checksum=None, delete=False,
+         replace=False, user=None, max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Make ``dest_hdfs_path`` a copy of ``src_hdfs_path``, transferring
+    only what has changed.
+
+    Unlike :func:`cp`, if ``src_hdfs_path`` is a directory its
+    *contents* are synchronized with those of ``dest_hdfs_path``,
+    which is created if necessary. As in :func:`cp`, if
+    ``src_hdfs_path`` is a file and ``dest_hdfs_path`` is an existing
+    directory, the file is synchronized with a file of the same name
+    inside that directory. Both trees are listed concurrently,
+    then each file in the source tree is:
+
+    * skipped, if the corresponding destination file has the same size
+      and modification time (or, if ``checksum`` is an algorithm name
+      such as ``"md5"``, the same size and digest);
+    * resumed, if the destination file is shorter, not older than the
+      source and holds at least one complete block whose content
+      matches the source (i.e., it is what is left of an interrupted
+      transfer): the destination is truncated to its last complete
+      block, then the rest of the data is appended. Only the last
+      megabyte of the data that is kept is compared, unless
+      ``checksum`` is set, in which case all of it is;
+    * copied otherwise.
+
+    Transfers run in parallel, using up to ``max_workers`` threads.
+    Copied files get the modification and access times of their
+    source. If a destination path's kind (file or directory) differs
+    from that of its source, :exc:`IOError` is raised before anything
+    is changed, unless ``replace`` is :obj:`True`, in which case the
+    destination path is deleted and replaced. If ``delete`` is
+    :obj:`True`, destination paths that do not exist in the source
+    tree are deleted.
+
+    Return a dictionary with the following lists of fully qualified
+    destination paths: ``copied``, ``resumed``, ``skipped`` and
+    ``deleted``.
+    """
+    pool = get_default_pool()
+    ends = []
+    for p in src_hdfs_path, dest_hdfs_path:
+        host, port, path_ = path.split(p, user)
+        ends.append((pool.get(host, port, user), path_))
+    (src_fs, src_top), (dest_fs, dest_top) = ends
+    src_info, dest_info = common.map_concurrently(
+        lambda e: _path_info(*e), ends, 2
+    )
+    if src_info is None:
+        raise IOError("no such file or directory: %r" % (src_hdfs_path,))
+    dest_root = path.abspath(dest_hdfs_path, user).rstrip("/")
+    if src_info["kind"] == "file" and dest_info and \
+            dest_info["kind"] == "directory":
+        name = path.basename(src_top)
+        dest_top = path.join(dest_top, name)
+        dest_root = "%s/%s" % (dest_root, name)
+        dest_info = _path_info(dest_fs, dest_top)
+    src_tree, dest_tree = common.map_concurrently(
+        lambda e: _walk_tree(e[0], e[1], max_workers),
+        [(src_fs, src_info), (dest_fs, dest_info)], 2
+    )
+    dest_tree = dest_tree or {}
+    mismatch = sorted(
+        rel for rel, info in dest_tree.items()
+        if src_tree.get(rel, info)["kind"] != info["kind"]
+    )
+    if mismatch and not replace:
+        rel = mismatch[0]
+        raise IOError("%r is a %s, but its source is a %s" % (
+            "%s/%s" % (dest_root, rel) if rel else dest_root,
+            dest_tree[rel]["kind"], src_tree[rel]["kind"]
+        ))
+
+    def src_path(rel):
+        return path.split(src_tree[rel]["name"])[2]
+
+    def dest_path(rel):
+        return path.join(dest_top, rel) if rel else dest_top
+
+    def dest_name(rel):
+        return "%s/%s" % (dest_root, rel) if rel else dest_root
+
+    report = {"copied": [], "resumed": [], "skipped": [], "deleted": []}
+    # --- remove mismatching and (optionally) extraneous dest paths ---
+    to_delete = []
+    for rel in dest_tree:
+        if rel not in src_tree and delete:
+            to_delete.append(rel)
+    to_delete.extend(mismatch)
+    deleted = []
+    for rel in sorted(to_delete):
+        if not deleted or not _is_under(rel, deleted[-1]):
+            deleted.append(rel)
+    common.map_concurrently(
+        lambda rel: dest_fs.delete(dest_path(rel)), deleted, max_workers
+    )
+    for rel in list(dest_tree):
+        if any(_is_under(rel, _) for _ in deleted):
+            del dest_tree[rel]
+    report["deleted"] = [dest_name(_) for _ in deleted]
+    # --- create missing directories ---
+    common.map_concurrently(
+        lambda rel: dest_fs.create_directory(dest_path(rel)),
+        [rel for rel, info in src_tree.items()
+         if info["kind"] == "directory" and rel not in dest_tree],
+        max_workers
+    )
+    # --- plan transfers ---
+    transfers, to_verify, to_resume = [], [], []
+    for rel, info in src_tree.items():
+        if info["kind"] != "file":
+            continue
+        d = dest_tree.get(rel)
+        if d is None:
+            transfers.append((rel, 0))
+        elif d["size"] == info["size"] and checksum:
+            to_verify.append(rel)
+        elif d["size"] == info["size"] and d["last_mod"] == info["last_mod"]:
+            report["skipped"].append(dest_name(rel))
+        elif 0 < d["block_size"] <= d["size"] < info["size"] and \
+                d["last_mod"] >= info["last_mod"]:
+            # resumable if its content matches (see below)
+            to_resume.append(rel)
+        else:
+            transfers.append((rel, 0))
+
+    def verify(rel, length=None, algorithm=checksum, offset=0):
+        src_digest = _file_digest(
+            src_fs, src_path(rel), algorithm, length, offset
+        )
+        return src_digest == _file_digest(
+            dest_fs, dest_path(rel), algorithm, length, offset
+        )
+
+    def resume_offset(rel):
+        size = dest_tree[rel]["size"]
+        return size - size % dest_tree[rel]["block_size"]
+
+    def verify_prefix(rel):
+        offset = resume_offset(rel)
+        if checksum:
+            return verify(rel, offset)
+        start = max(0, offset - _RESUME_CHECK_SIZE)
+        return verify(rel, offset - start, "md5", start)
+
+    for rel, same in czip(to_verify, common.map_concurrently(
+            verify, to_verify, max_workers)):
+        if same:
+            report["skipped"].append(dest_name(rel))
+        else:
+            transfers.append((rel, 0))
+
+    # the source might have been rewritten since the interrupted transfer
+    for rel, same in czip(to_resume, common.map_concurrently(
+            verify_prefix, to_resume, max_workers)):
+        transfers.append((rel, resume_offset(rel) if same else 0))
+
+    # --- transfer ---
+    def transfer(item):
+        rel, offset = item
+        src, dest = src_path(rel), dest_path(rel)
+        if offset and offset < dest_tree[rel]["size"]:
+            if not dest_fs.truncate(dest, offset):
+                offset = 0  # last block still being adjusted, start over
+        if offset:
+            _append_file(src_fs, src, dest_fs, dest, offset)
+        else:
+            _cp_file(src_fs, src, dest_fs, dest)
+        info = src_tree[rel]
+        dest_fs.utime(dest, info["last_mod"], info["last_access"])
+        return offset
+
+    for (rel, _), offset in czip(transfers, common.map_concurrently(
+            transfer, transfers, max_workers)):
+        report["resumed" if offset else "copied"].append(dest_name(rel))
+    for v in report.values():
+        v.sort()
+    return report
 
 
 def mkdir(hdfs_path, user=None):
@@ -258,10 +579,8 @@ def mkdir(hdfs_path, user=None):
     Create a directory and its parents as needed.
     """
     host, port, path_ = path.split(hdfs_path, user)
-    fs = hdfs(host, port, user)
-    retval = fs.create_directory(path_)
-    fs.close()
-    return retval
+    with get_default_pool().connection(host, port, user) as fs:
+        return fs.create_directory(path_)
 
 
 def rmr(hdfs_path, user=None):
@@ -269,10 +588,8 @@ def rmr(hdfs_path, user=None):
     Recursively remove files and directories.
     """
     host, port, path_ = path.split(hdfs_path, user)
-    fs = hdfs(host, port, user)
-    retval = fs.delete(path_)
-    fs.close()
-    return retval
+    with get_default_pool().connection(host, port, user) as fs:
+        return fs.delete(path_)
 
 
 def lsl(hdfs_path, user=None, recursive=False):
@@ -287,17 +604,16 @@ def lsl(hdfs_path, user=None, recursive=False):
     in the tree rooted at ``hdfs_path``.
     """
     host, port, path_ = path.split(hdfs_path, user)
-    fs = hdfs(host, port, user)
-    if not recursive:
-        dir_list = fs.list_directory(path_)
-    else:
-        treewalk = fs.walk(path_)
-        top = next(treewalk)
-        if top['kind'] == 'directory':
-            dir_list = list(treewalk)
+    with get_default_pool().connection(host, port, user) as fs:
+        if not recursive:
+            dir_list = fs.list_directory(path_)
         else:
-            dir_list = [top]
-    fs.close()
+            treewalk = fs.walk(path_)
+            top = next(treewalk)
+            if top['kind'] == 'directory':
+                dir_list = list(treewalk)
+            else:
+                dir_list = [top]
     return dir_list
 
 
@@ -312,6 +628,304 @@ def ls(hdfs_path, user=None, recursive=False):
     return [d["name"] for d in dir_list]
 
 
+def du(hdfs_path, user=None, depth=0, max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Summarize disk usage for the tree rooted at ``hdfs_path``.
+
+    Return a list of dictionaries, sorted by name, with the following
+    fields:
+
+    * ``name``: fully qualified path name
+    * ``size``: total size in bytes of all files in the tree
+    * ``file_count``: number of files in the tree
+    * ``directory_count``: number of directories in the tree,
+      including its root
+
+    The first item refers to ``hdfs_path`` itself, followed by one item
+    for every directory up to ``depth`` levels below it.
+
+    Directories are listed concurrently, using up to ``max_workers``
+    threads. Each directory is listed in full with a single request,
+    but its listing is discarded as soon as it has been added to the
+    totals, so only the listings in progress are held in memory, rather
+    than the listing of the whole tree.
+    """
+    host, port, path_ = path.split(hdfs_path, user)
+    pool = get_default_pool()
+    with pool.connection(host, port, user) as fs:
+        top = fs.get_path_info(path_)
+    summaries = {}
+    lock = threading.Lock()
+
+    def new_summary(info):
+        is_dir = info["kind"] == "directory"
+        summaries[info["name"]] = {
+            "name": info["name"],
+            "size": 0 if is_dir else info["size"],
+            "file_count": 0 if is_dir else 1,
+            "directory_count": 1 if is_dir else 0,
+        }
+        return info["name"]
+
+    def process(item):
+        name, level, buckets = item
+        with pool.connection(host, port, user) as fs:
+            ls = fs.list_directory(name)
+        size, n_files, subdirs = 0, 0, []
+        for info in ls:
+            if info["kind"] == "directory":
+                subdirs.append(info)
+            else:
+                size += info["size"]
+                n_files += 1
+        with lock:
+            for b in buckets:
+                s = summaries[b]
+                s["size"] += size
+                s["file_count"] += n_files
+                s["directory_count"] += len(subdirs)
+            children = []
+            for info in subdirs:
+                if level < depth:
+                    sub_buckets = buckets + (new_summary(info),)
+                else:
+                    sub_buckets = buckets
+                children.append((info["name"], level + 1, sub_buckets))
+        return children
+
+    root = new_summary(top)
+    if top["kind"] == "directory":
+        common.traverse_concurrently(
+            process, [(top["name"], 0, (root,))], max_workers=max_workers
+        )
+    return [summaries[k] for k in sorted(summaries)]
+
+
+def _split_glob(pattern):
+    # split on slashes that are not part of a {...} group
+    components, start, depth, i = [], 0, 0, 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 1
+        elif c == "{":
+            depth += 1
+        elif c == "}" and depth:
+            depth -= 1
+        elif c == "/" and not depth:
+            components.append(pattern[start: i])
+            start = i + 1
+        i += 1
+    components.append(pattern[start:])
+    return [_ for _ in components if _]
+
+
+def _expand_braces(pattern):
+    depth, start, commas, i = 0, None, [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 1
+        elif c == "{":
+            if not depth:
+                start, commas = i, []
+            depth += 1
+        elif c == "," and depth == 1:
+            commas.append(i)
+        elif c == "}" and depth:
+            depth -= 1
+            if not depth:
+                bounds = [start] + commas + [i]
+                head, tail = pattern[:start], pattern[i + 1:]
+                return [
+                    e for j in range(len(bounds) - 1) for e in _expand_braces(
+                        head + pattern[bounds[j] + 1: bounds[j + 1]] + tail
+                    )
+                ]
+        i += 1
+    return [pattern]
+
+
+def _glob_regex(component):
+    """\
+    Translate a Hadoop glob path component into a compiled regex.
+
+    Return :obj:`None` if ``component`` has no special characters.
+    """
+    regex, in_set, depth, magic, i = [], False, 0, False, 0
+    while i < len(component):
+        c = component[i]
+        if c == "\\":
+            i += 1
+            if i >= len(component):
+                raise ValueError("%r: missing escaped character" % component)
+            regex.append(re.escape(component[i]))
+            magic = True
+        elif in_set:
+            if c == "]":
+                in_set = False
+                regex.append(c)
+            elif c in "^!" and component[i - 1] == "[":
+                regex.append("^")
+            else:
+                regex.append(c if c == "-" else re.escape(c))
+        elif c == "[":
+            in_set = magic = True
+            regex.append(c)
+        elif c == "*":
+            regex.append(".*")
+            magic = True
+        elif c == "?":
+            regex.append(".")
+            magic = True
+        elif c == "{":
+            depth += 1
+            regex.append("(?:")
+            magic = True
+        elif c == "," and depth:
+            regex.append("|")
+        elif c == "}" and depth:
+            depth -= 1
+            regex.append(")")
+        else:
+            regex.append(re.escape(c))
+        i += 1
+    if in_set:
+        raise ValueError("%r: unclosed character class" % component)
+    if depth:
+        raise ValueError("%r: unclosed group" % component)
+    if not magic:
+        return None
+    try:
+        return re.compile("".join(regex) + r"\Z", re.DOTALL)
+    except re.error as e:
+        raise ValueError("%r: %s" % (component, e))
+
+
+def _join_name(dirname, basename):
+    return "%s/%s" % (dirname.rstrip("/"), basename)
+
+
+def iglob(pattern, user=None, max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Generate the fully qualified names of all paths matching
+    ``pattern``.
+
+    Patterns follow Hadoop's glob syntax (the one accepted, e.g., by
+    job input paths):
+
+    * ``?`` matches any single character
+    * ``*`` matches zero or more characters
+    * ``[abc]``, ``[a-c]`` match a single character from the given
+      set or range; ``[^abc]`` (or ``[!abc]``) from its complement
+    * ``{ab,cd}`` matches either of the comma-separated alternatives
+    * ``\\c`` matches character ``c`` literally
+
+    Wildcards never match the path separator. The pattern is expanded
+    one path component at a time: directories at each level are listed
+    concurrently, using up to ``max_workers`` threads, and only
+    directories that match are descended into. Components without
+    special characters are never listed.
+    """
+    host, port, path_ = path.split(pattern, user)
+    pool = get_default_pool()
+    fs = pool.get(host, port, user)
+    if host:
+        root = "hdfs://%s:%s/" % (fs.host, fs.port)
+    else:
+        root, path_ = "file:/", os.path.abspath(path_)
+    components = _split_glob(path_)
+    if any("/" in _ for _ in components):
+        patterns = [_split_glob(_) for _ in _expand_braces(path_)]
+    else:
+        patterns = [components]
+    seen = set()
+
+    def expand(item):
+        dirname, regex, last = item
+        with pool.connection(host, port, user) as fs:
+            try:
+                ls = fs.list_directory(dirname)
+            except IOError:
+                return []
+        names = []
+        for info in ls:
+            name = info["name"]
+            if name.rstrip("/") == dirname.rstrip("/"):
+                continue  # dirname is a file
+            if not last and info["kind"] != "directory":
+                continue
+            if regex.match(path.basename(name)):
+                names.append(name)
+        return names
+
+    def check(name):
+        with pool.connection(host, port, user) as fs:
+            try:
+                return fs.get_path_info(name)["name"]
+            except IOError:
+                return None
+
+    for components in patterns:
+        candidates, needs_check = [root], True
+        for i, c in enumerate(components):
+            regex = _glob_regex(c)
+            if regex is None:
+                candidates = [_join_name(_, c) for _ in candidates]
+                needs_check = True
+                continue
+            last = i == len(components) - 1
+            candidates = [_ for names in common.map_concurrently(
+                expand, [(d, regex, last) for d in candidates], max_workers
+            ) for _ in names]
+            needs_check = False
+            if not candidates:
+                break
+        if needs_check:
+            candidates = [_ for _ in common.map_concurrently(
+                check, candidates, max_workers
+            ) if _ is not None]
+        for name in candidates:
+            if name not in seen:
+                seen.add(name)
+                yield name
+
+
+def glob(pattern, user=None, max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Return a sorted list of the fully qualified names of all paths
+    matching ``pattern``. See :func:`iglob`.
+    """
+    return sorted(iglob(pattern, user=user, max_workers=max_workers))
+
+
+def ilsl(hdfs_path, user=None, recursive=False, fields=None):
+    """
+    Generate path info records for ``hdfs_path``.
+
+    Works like :func:`lsl`, but items are converted one at a time into
+    compact records instead of being returned as a list of
+    dictionaries. Only the fields listed in ``fields`` (default: all)
+    are included. Directories are still listed in full, so this saves
+    Python objects, not requests. See :meth:`fs.hdfs.iter_directory`.
+    """
+    host, port, path_ = path.split(hdfs_path, user)
+    fs = get_default_pool().get(host, port, user)
+    for info in fs.iter_directory(path_, fields=fields, recursive=recursive):
+        yield info
+
+
+def ils(hdfs_path, user=None, recursive=False):
+    """
+    Generate hdfs paths.
+
+    Works in the same way as :func:`ilsl`, except for the fact that
+    items are hdfs paths instead of path info records.
+    """
+    for info in ilsl(hdfs_path, user, recursive, fields=("name",)):
+        yield info.name
+
+
 def chmod(hdfs_path, mode, user=None):
     """
     Change file mode bits.
@@ -322,10 +936,8 @@ def chmod(hdfs_path, mode, user=None):
     :param mode: the bitmask to set it to (e.g., 0777)
     """
     host, port, path_ = path.split(hdfs_path, user)
-    fs = hdfs(host, port, user)
-    retval = fs.chmod(path_, mode)
-    fs.close()
-    return retval
+    with get_default_pool().connection(host, port, user) as fs:
+        return fs.chmod(path_, mode)
 
 
 def move(src, dest, user=None):
@@ -334,14 +946,10 @@ def move(src, dest, user=None):
     """
     src_host, src_port, src_path = path.split(src, user)
     dest_host, dest_port, dest_path = path.split(dest, user)
-    src_fs = hdfs(src_host, src_port, user)
-    dest_fs = hdfs(dest_host, dest_port, user)
-    try:
-        retval = src_fs.move(src_path, dest_fs, dest_path)
-        return retval
-    finally:
-        src_fs.close()
-        dest_fs.close()
+    pool = get_default_pool()
+    dest_fs = pool.get(dest_host, dest_port, user)
+    with pool.connection(src_host, src_port, user) as src_fs:
+        return src_fs.move(src_path, dest_fs, dest_path)
 
 
 def chown(hdfs_path, user=None, group=None, hdfs_user=None):
@@ -351,7 +959,7 @@ def chown(hdfs_path, user=None, group=None, hdfs_user=None):
     user = user or ''
     group = group or ''
     host, port, path_ = path.split(hdfs_path, hdfs_user)
-    with hdfs(host, port, hdfs_user) as fs:
+    with get_default_pool().connection(host, port, hdfs_user) as fs:
         return fs.chown(path_, user=user, group=group)
 
 
@@ -361,10 +969,10 @@ def rename(from_path, to_path, user=None):
     """
     fhost, fport, fpath = path.split(from_path, user)
     thost, tport, tpath = path.split(to_path, user)
-    with hdfs(thost, tport, user) as fs:
-        chost, cport = fs.host, fs.port
-    with hdfs(fhost, fport, user) as fs:
-        if fs.host != chost or fs.port != cport:
+    pool = get_default_pool()
+    to_fs = pool.get(thost, tport, user)
+    with pool.connection(fhost, fport, user) as fs:
+        if fs.host != to_fs.host or fs.port != to_fs.port:
             raise RuntimeError("can't do a cross-fs rename")
         return fs.rename(fpath, tpath)
 
@@ -379,6 +987,84 @@ def renames(from_path, to_path, user=None):
     rename(from_path, to_path, user=user)
 
 
+def _run_many(op, items, max_workers):
+    def run(item):
+        try:
+            op(item)
+        except Exception as e:
+            return item, e
+        return item, None
+    return common.map_concurrently(run, items, max_workers=max_workers)
+
+
+def delete_many(hdfs_paths, user=None, recursive=True,
+                max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Delete all paths in ``hdfs_paths``, running up to ``max_workers``
+    operations at the same time.
+
+    Failures do not stop the batch. The return value is a list of
+    ``(path, error)`` tuples, in the same order as ``hdfs_paths``,
+    where ``error`` is the exception raised while processing ``path``,
+    or :obj:`None` if the operation was successful.
+    """
+    def op(hdfs_path):
+        host, port, path_ = path.split(hdfs_path, user)
+        with get_default_pool().connection(host, port, user) as fs:
+            fs.delete(path_, recursive)
+    return _run_many(op, hdfs_paths, max_workers)
+
+
+def chmod_many(hdfs_paths, mode, user=None,
+               max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Apply ``mode`` to all paths in ``hdfs_paths``.
+
+    ``mode`` is handled like in :meth:`fs.hdfs.chmod`. Operations are
+    run concurrently and their outcome is reported like in
+    :func:`delete_many`.
+    """
+    def op(hdfs_path):
+        host, port, path_ = path.split(hdfs_path, user)
+        with get_default_pool().connection(host, port, user) as fs:
+            fs.chmod(path_, mode)
+    return _run_many(op, hdfs_paths, max_workers)
+
+
+def chown_many(hdfs_paths, user=None, group=None, hdfs_user=None,
+               max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Change owner and group of all paths in ``hdfs_paths``.
+
+    Arguments are handled like in :func:`chown`. Operations are run
+    concurrently and their outcome is reported like in
+    :func:`delete_many`.
+    """
+    user = user or ''
+    group = group or ''
+
+    def op(hdfs_path):
+        host, port, path_ = path.split(hdfs_path, hdfs_user)
+        with get_default_pool().connection(host, port, hdfs_user) as fs:
+            fs.chown(path_, user=user, group=group)
+    return _run_many(op, hdfs_paths, max_workers)
+
+
+def rename_many(pairs, user=None, max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Rename each ``from_path`` to the corresponding ``to_path``, where
+    ``pairs`` is a sequence of ``(from_path, to_path)`` tuples.
+
+    Operations are run concurrently and their outcome is reported like
+    in :func:`delete_many`, with ``(from_path, to_path)`` tuples in
+    place of paths. Since there is no guarantee on the order in which
+    renames are performed, pairs must not depend on each other.
+    """
+    def op(pair):
+        rename(pair[0], pair[1], user=user)
+    return _run_many(op, [tuple(_) for _ in pairs], max_workers)
+
+
 # direct bindings
 stat = path.stat
 lstat = path.lstat
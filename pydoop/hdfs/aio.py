@@ -0,0 +1,346 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+"""
+pydoop.hdfs.aio -- Asyncio Front End
+------------------------------------
+
+Coroutine-based counterparts of the main :mod:`pydoop.hdfs` calls, for
+use from :mod:`asyncio` applications (Python 3 only).
+
+libhdfs calls are blocking, so they are run on a thread pool executor.
+There is one executor for each NameNode (or for the local file
+system), with at most :data:`DEFAULT_MAX_WORKERS` threads: any number
+of coroutines can wait on HDFS operations without requiring a thread
+each, and a slow NameNode does not starve the others.
+
+.. code-block:: python
+
+  >>> import asyncio
+  >>> from pydoop.hdfs import aio
+  >>> async def count_lines(path):
+  ...     n = 0
+  ...     async with await aio.open(path, "rt") as f:
+  ...         async for _ in f:
+  ...             n += 1
+  ...     return n
+  ...
+  >>> loop = asyncio.get_event_loop()
+  >>> loop.run_until_complete(count_lines("hdfs://localhost:9000/foo.txt"))
+"""
+
+import asyncio
+import collections
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import path, common
+from .fs import hdfs
+from .pool import get_default_pool, DEFAULT_MAX_CONCURRENCY
+from . import cp as _cp, open as _open
+
+DEFAULT_MAX_WORKERS = DEFAULT_MAX_CONCURRENCY
+LINE_BATCH_SIZE = 128
+
+_EXECUTORS = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def get_executor(host="default", port=0, max_workers=None):
+    """
+    Get the executor used for operations on the given NameNode,
+    creating it if necessary.
+
+    ``max_workers`` (default: :data:`DEFAULT_MAX_WORKERS`) is only
+    used when the executor is created. Different spellings of the same
+    address get the same executor once it has been connected to (see
+    :class:`~.fs.hdfs`).
+    """
+    key = hdfs._cache_key(host, port)[:2]
+    with _EXECUTORS_LOCK:
+        try:
+            return _EXECUTORS[key]
+        except KeyError:
+            ex = _EXECUTORS[key] = ThreadPoolExecutor(
+                max_workers or DEFAULT_MAX_WORKERS
+            )
+            return ex
+
+
+def shutdown(wait=True):
+    """
+    Shut down all executors. New ones are created on demand.
+    """
+    with _EXECUTORS_LOCK:
+        executors = list(_EXECUTORS.values())
+        _EXECUTORS.clear()
+    for ex in executors:
+        ex.shutdown(wait=wait)
+
+
+async def _run(executor, func, *args, **kwargs):
+    loop = asyncio.get_event_loop()
+    if kwargs:
+        func = functools.partial(func, **kwargs)
+    return await loop.run_in_executor(executor, func, *args)
+
+
+async def _connect(hdfs_path, user=None):
+    # resolving the default file system might read the Hadoop
+    # configuration and getting the pooled handle might connect, so
+    # this runs on the loop's default executor
+    def connect():
+        host, port, path_ = path.split(hdfs_path, user)
+        return get_default_pool().get(host, port, user), path_
+    return await _run(None, connect)
+
+
+def _read_lines(f, n):
+    lines = []
+    for _ in range(n):
+        line = f.readline()
+        if not line:
+            break
+        lines.append(line)
+    return lines
+
+
+class AsyncFile(object):
+    """
+    Asynchronous wrapper for the file objects returned by
+    :func:`pydoop.hdfs.open`. Do not instantiate directly: use
+    :func:`open`.
+
+    Iterating over the file with ``async for`` yields its lines, read
+    from the underlying file in batches of :data:`LINE_BATCH_SIZE`.
+    """
+
+    def __init__(self, f, executor):
+        self.file = f
+        self.executor = executor
+        self.__lines = collections.deque()
+        self.__eof = False
+
+    @property
+    def name(self):
+        return self.file.name
+
+    @property
+    def mode(self):
+        return self.file.mode
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def __run(self, func, *args):
+        return _run(self.executor, func, *args)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.__lines and not self.__eof:
+            lines = await self.__run(
+                _read_lines, self.file, LINE_BATCH_SIZE
+            )
+            if len(lines) < LINE_BATCH_SIZE:
+                self.__eof = True
+            self.__lines.extend(lines)
+        if not self.__lines:
+            raise StopAsyncIteration
+        return self.__lines.popleft()
+
+    def chunks(self, chunk_size=common.BUFSIZE):
+        """
+        Get an asynchronous iterator over the rest of the file, in
+        chunks of (at most) ``chunk_size`` bytes (characters in text
+        mode).
+        """
+        return _ChunkIterator(self, chunk_size)
+
+    async def read(self, length=-1):
+        """
+        Read ``length`` bytes (characters in text mode) from the file.
+        If ``length`` is negative or omitted, read all data until EOF.
+        """
+        return await self.__run(self.file.read, length)
+
+    async def readline(self):
+        """
+        Read and return a line of text.
+        """
+        return await self.__run(self.file.readline)
+
+    async def pread(self, position, length):
+        """
+        Read ``length`` bytes of data from the file, starting from
+        ``position``, without changing the file's current offset.
+        """
+        return await self.__run(self.file.pread, position, length)
+
+    async def write(self, data):
+        """
+        Write ``data`` to the file, returning the number of bytes (or
+        characters in text mode) written.
+        """
+        return await self.__run(self.file.write, data)
+
+    async def seek(self, position, whence=0):
+        """
+        Seek to ``position``: see :meth:`~.file.FileIO.seek`.
+        """
+        self.__lines.clear()
+        self.__eof = False
+        return await self.__run(self.file.seek, position, whence)
+
+    async def tell(self):
+        """
+        Get the current byte offset in the file.
+        """
+        return await self.__run(self.file.tell)
+
+    async def flush(self):
+        """
+        Force any buffered output to be written.
+        """
+        return await self.__run(self.file.flush)
+
+    async def close(self):
+        """
+        Close the file and release its file system handle.
+        """
+        await self.__run(_close_file, self.file)
+
+
+def _close_file(f):
+    if not f.closed:
+        f.close()
+        f.fs.close()
+
+
+class _ChunkIterator(object):
+
+    def __init__(self, afile, chunk_size):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.afile = afile
+        self.chunk_size = chunk_size
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self.afile.read(self.chunk_size)
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+
+async def open(hdfs_path, mode="r", buff_size=0, replication=0,
+               blocksize=0, user=None, encoding=None, errors=None):
+    """
+    Open a file, returning an :class:`AsyncFile` object.
+
+    Arguments are handled as in :func:`pydoop.hdfs.open`.
+    """
+    fs, _ = await _connect(hdfs_path, user)
+    executor = get_executor(fs.host, fs.port)
+    f = await _run(
+        executor, _open, hdfs_path, mode=mode, buff_size=buff_size,
+        replication=replication, blocksize=blocksize, user=user,
+        encoding=encoding, errors=errors
+    )
+    return AsyncFile(f, executor)
+
+
+async def _call(method_name, hdfs_path, user, *args):
+    fs, path_ = await _connect(hdfs_path, user)
+    return await _run(
+        get_executor(fs.host, fs.port), getattr(fs, method_name), path_, *args
+    )
+
+
+async def get_path_info(hdfs_path, user=None):
+    """
+    Get information about ``hdfs_path``: see
+    :meth:`~.fs.hdfs.get_path_info`.
+    """
+    return await _call("get_path_info", hdfs_path, user)
+
+
+async def list_directory(hdfs_path, user=None):
+    """
+    Get the list of files and directories in ``hdfs_path``: see
+    :meth:`~.fs.hdfs.list_directory`.
+    """
+    return await _call("list_directory", hdfs_path, user)
+
+
+def walk(hdfs_path, user=None):
+    """
+    Get an asynchronous iterator over the path infos for all paths in
+    the tree rooted at ``hdfs_path`` (included), in the same order as
+    :meth:`~.fs.hdfs.walk`. Each directory is listed when reached.
+    """
+    return _Walker(hdfs_path, user)
+
+
+class _Walker(object):
+
+    def __init__(self, hdfs_path, user):
+        if not hdfs_path:
+            raise ValueError("Empty path")
+        self.user = user
+        self.__top = hdfs_path
+        self.__stack = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.__top is not None:
+            info = await get_path_info(self.__top, self.user)
+            self.__top = None
+        elif self.__stack:
+            info = self.__stack.pop()
+        else:
+            raise StopAsyncIteration
+        if info["kind"] == "directory":
+            children = await list_directory(info["name"], self.user)
+            self.__stack.extend(reversed(children))
+        return info
+
+
+async def cp(src_hdfs_path, dest_hdfs_path, **kwargs):
+    """
+    Copy the contents of ``src_hdfs_path`` to ``dest_hdfs_path``: see
+    :func:`pydoop.hdfs.cp`. Runs on the executor for the destination.
+    """
+    fs, _ = await _connect(dest_hdfs_path)
+    return await _run(
+        get_executor(fs.host, fs.port), _cp, src_hdfs_path, dest_hdfs_path,
+        **kwargs
+    )
@@ -21,17 +21,35 @@ Common hdfs utilities.
 """
 
 import getpass
+import hashlib
 import pwd
 import grp
 import sys
+import threading
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+from pydoop.utils.py3compat import basestring
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    import crc32c as _crc32c  # optional, see Digester
+except ImportError:
+    _crc32c = None
 
 __is_py3 = sys.version_info >= (3, 0)
 
 
 BUFSIZE = 16384
+WRITE_BEHIND_BUFSIZE = 1048576  # see fs.hdfs.open_file
+WRITE_BEHIND_BUFFERS = 4
 DEFAULT_PORT = 8020  # org/apache/hadoop/hdfs/server/namenode/NameNode.java
 DEFAULT_USER = getpass.getuser()
 DEFAULT_LIBHDFS_OPTS = "-Xmx48m"  # enough for most applications
+DEFAULT_MAX_WORKERS = 8  # threads used by batch operations
+FOLLOW_MIN_DELAY = 0.1  # seconds, see file.FollowReader
+FOLLOW_MAX_DELAY = 10.0
 
 # Unicode objects are encoded using this encoding:
 TEXT_ENCODING = 'utf-8'
@@ -42,6 +60,21 @@ TEXT_ENCODING = 'utf-8'
 
 BASE_MODES = frozenset("rwa")
 
+# see fs.hdfs.get_path_info
+PATH_INFO_FIELDS = (
+    "name",
+    "kind",
+    "group",
+    "last_mod",
+    "last_access",
+    "replication",
+    "owner",
+    "permissions",
+    "block_size",
+    "path",
+    "size",
+)
+
 
 def parse_mode(mode):
     try:
@@ -91,8 +124,198 @@ else:
         return host
 
 
+_PATH_INFO_TYPES = {}
+
+
+def path_info_type(fields=PATH_INFO_FIELDS):
+    """\
+    Get the record type (a :func:`~collections.namedtuple`) for path
+    infos restricted to ``fields``.
+    """
+    fields = tuple(fields)
+    try:
+        return _PATH_INFO_TYPES[fields]
+    except KeyError:
+        for f in fields:
+            if f not in PATH_INFO_FIELDS:
+                raise ValueError("unknown path info field: %r" % (f,))
+        t = _PATH_INFO_TYPES[fields] = namedtuple("PathInfo", fields)
+        return t
+
+
 def get_groups(user=DEFAULT_USER):
     groups = set(_.gr_name for _ in grp.getgrall() if user in set(_.gr_mem))
     primary_gid = pwd.getpwnam(user).pw_gid
     groups.add(grp.getgrgid(primary_gid).gr_name)
     return groups
+
+
+def map_concurrently(func, iterable, max_workers=DEFAULT_MAX_WORKERS):
+    """\
+    Same as ``[func(_) for _ in iterable]``, but use up to
+    ``max_workers`` threads. Results are returned in input order.
+    """
+    items = list(iterable)
+    n_threads = min(max_workers, len(items))
+    if n_threads <= 1:
+        return [func(_) for _ in items]
+    pool = ThreadPool(n_threads)
+    try:
+        return pool.map(func, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def traverse_concurrently(process, roots, max_workers=DEFAULT_MAX_WORKERS):
+    """\
+    Process a tree of work items with up to ``max_workers`` threads.
+
+    Starting from ``roots``, call ``process`` on each item: the return
+    value must be an iterable of new (child) items to process. Only
+    pending items are kept in memory. Once no items are left, raise
+    the first exception (if any) raised by ``process``.
+    """
+    q = queue.Queue()
+    errors = []
+    for item in roots:
+        q.put(item)
+
+    def work():
+        while True:
+            item = q.get()
+            try:
+                if item is None:
+                    return
+                if not errors:
+                    for child in process(item):
+                        q.put(child)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                q.task_done()
+
+    threads = [threading.Thread(target=work) for _ in range(max_workers)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    q.join()
+    for _ in threads:
+        q.put(None)
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+
+class _CRC32C(object):
+
+    name = "crc32c"
+
+    def __init__(self):
+        if _crc32c is None:
+            raise ValueError("crc32c digests require the crc32c package")
+        self.value = 0
+
+    def update(self, data):
+        self.value = _crc32c.crc32c(data, self.value)
+
+    def hexdigest(self):
+        return "%08x" % self.value
+
+
+def new_digest(algorithm):
+    """\
+    Get a new digest object for ``algorithm``, which can be either
+    ``"crc32c"`` (requires the ``crc32c`` package) or any algorithm
+    supported by :func:`hashlib.new` (e.g., ``"md5"`` or ``"sha256"``).
+    """
+    if algorithm == "crc32c":
+        return _CRC32C()
+    return hashlib.new(algorithm)
+
+
+class Digester(object):
+    """\
+    Feed a stream of data chunks to a set of digests.
+
+    ``digests`` can be either a sequence of algorithm names (see
+    :func:`new_digest`) or a callable, which is called with each
+    chunk. If ``threaded`` is :obj:`True`, chunks are copied and
+    processed by a worker thread, with up to ``max_pending`` chunks
+    waiting in a queue, so that callers (e.g., copy loops) are not
+    slowed down by hashing.
+
+    .. code-block:: python
+
+      >>> d = Digester(["md5", "sha256"])
+      >>> d.update(b"hello")
+      >>> d.hexdigests()["md5"]
+      '5d41402abc4b2a76b9719d911017c592'
+    """
+
+    def __init__(self, digests, threaded=False, max_pending=8):
+        if callable(digests):
+            self.__digests = {}
+            self.__process = digests
+        else:
+            if isinstance(digests, basestring):
+                raise TypeError("digests must be a sequence of names")
+            self.__digests = dict((_, new_digest(_)) for _ in digests)
+            self.__process = self.__update_all
+        self.__error = None
+        self.__queue = self.__thread = None
+        if threaded:
+            self.__queue = queue.Queue(max_pending)
+            self.__thread = threading.Thread(target=self.__work)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def __update_all(self, chunk):
+        for d in self.__digests.values():
+            d.update(chunk)
+
+    def __work(self):
+        while True:
+            chunk = self.__queue.get()
+            if chunk is None:
+                return
+            if self.__error is None:
+                try:
+                    self.__process(chunk)
+                except Exception as e:
+                    self.__error = e
+
+    def __check_error(self):
+        if self.__error is not None:
+            raise self.__error
+
+    def update(self, chunk):
+        """\
+        Process ``chunk`` (any object supporting the buffer protocol).
+        """
+        if self.__queue is None:
+            self.__process(chunk)
+        else:
+            self.__check_error()
+            self.__queue.put(bytes(chunk))
+
+    __call__ = update
+
+    def close(self):
+        """\
+        Wait for pending chunks to be processed.
+        """
+        if self.__thread is not None:
+            self.__queue.put(None)
+            self.__thread.join()
+            self.__queue = self.__thread = None
+        self.__check_error()
+
+    def hexdigests(self):
+        """\
+        Wait for pending chunks, then return a dictionary that maps
+        each algorithm name to the corresponding hex digest.
+        """
+        self.close()
+        return dict((k, d.hexdigest()) for k, d in self.__digests.items())
@@ -23,7 +23,14 @@ pydoop.hdfs.file -- HDFS File Objects
 
 import os
 import io
+import mmap
 import codecs
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from pydoop.hdfs import common
 
@@ -33,6 +40,122 @@ def _complain_ifclosed(closed):
         raise ValueError("I/O operation on closed HDFS file object")
 
 
+def _byte_view(buf):
+    view = memoryview(buf)
+    try:
+        return view.cast("B")
+    except AttributeError:  # Python 2
+        return view
+
+
+def _update_digest(digest, chunk, n):
+    if digest is not None and n:
+        update = getattr(digest, "update", digest)
+        update(_byte_view(chunk)[:n])
+    return n
+
+
+class _WriteBehindWriter(object):
+    """\
+    Drop-in replacement for :class:`io.BufferedWriter` that hands full
+    buffers over to a background thread, which writes them to the raw
+    file. Up to ``n_buffers`` buffers are recycled: when they are all
+    in flight, writers block until one is drained.
+
+    Once the background thread fails, all subsequent calls to
+    :meth:`write`, :meth:`flush` and :meth:`close` raise its error.
+    """
+
+    def __init__(self, raw, buffer_size, n_buffers):
+        if n_buffers < 2:
+            raise ValueError("n_buffers must be at least 2")
+        self.raw = raw
+        self.buffer_size = buffer_size
+        self.__pos = raw.tell()
+        self.__buf = bytearray()
+        self.__free = queue.Queue()
+        for _ in range(n_buffers - 1):
+            self.__free.put(bytearray())
+        self.__pending = queue.Queue()
+        self.__error = None
+        self.closed = False
+        self.__thread = threading.Thread(target=self.__drain)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __write_all(self, buf):
+        view, written = memoryview(buf), 0
+        while written < len(buf):
+            written += self.raw.write(view[written:])
+
+    def __drain(self):
+        while True:
+            buf = self.__pending.get()
+            try:
+                if buf is None:
+                    return
+                if self.__error is None:
+                    self.__write_all(buf)
+                del buf[:]
+            except Exception as e:
+                self.__error = e
+                buf = bytearray()  # the traceback might still refer to it
+            finally:
+                if buf is not None:
+                    self.__free.put(buf)
+                self.__pending.task_done()
+
+    def __check_error(self):
+        if self.__error is not None:
+            raise self.__error
+
+    def __submit(self):
+        self.__pending.put(self.__buf)
+        self.__buf = self.__free.get()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.__pos
+
+    def seek(self, position, whence=os.SEEK_SET):
+        if (position, whence) in ((0, os.SEEK_CUR), (self.__pos, os.SEEK_SET)):
+            return self.__pos
+        raise io.UnsupportedOperation("seek")
+
+    def write(self, data):
+        _complain_ifclosed(self.closed)
+        self.__check_error()
+        n = len(data)
+        self.__buf += data
+        self.__pos += n
+        if len(self.__buf) >= self.buffer_size:
+            self.__submit()
+        return n
+
+    def flush(self):
+        """\
+        Wait until all data written so far has been passed to the raw file.
+        """
+        _complain_ifclosed(self.closed)
+        if self.__buf:
+            self.__submit()
+        self.__pending.join()
+        self.__check_error()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.closed = True
+            self.__pending.put(None)
+            self.__thread.join()
+            self.raw.close()
+
+
 class FileIO(object):
     """
     Instances of this class represent HDFS file objects.
@@ -44,7 +167,8 @@ class FileIO(object):
     ENCODING = "utf-8"
     ERRORS = "strict"
 
-    def __init__(self, raw_hdfs_file, fs, mode, encoding=None, errors=None):
+    def __init__(self, raw_hdfs_file, fs, mode, encoding=None, errors=None,
+                 write_behind=False):
         self.mode = mode
         self.base_mode, is_text = common.parse_mode(self.mode)
         self.buff_size = raw_hdfs_file.buff_size
@@ -65,8 +189,15 @@ class FileIO(object):
             if errors:
                 raise ValueError("binary mode doesn't take an errors argument")
             self.__encoding = self.__errors = None
-        cls = io.BufferedReader if self.base_mode == "r" else io.BufferedWriter
-        self.f = cls(raw_hdfs_file, buffer_size=self.buff_size)
+        if self.base_mode == "r":
+            self.f = io.BufferedReader(raw_hdfs_file, self.buff_size)
+        elif write_behind:
+            bufsize = max(self.buff_size, common.WRITE_BEHIND_BUFSIZE)
+            self.f = _WriteBehindWriter(
+                raw_hdfs_file, bufsize, common.WRITE_BEHIND_BUFFERS
+            )
+        else:
+            self.f = io.BufferedWriter(raw_hdfs_file, self.buff_size)
         self.__fs = fs
         info = fs.get_path_info(self.f.raw.name)
         self.__name = info["name"]
@@ -262,6 +393,26 @@ class FileIO(object):
         _complain_ifclosed(self.closed)
         return self.f.flush()
 
+    def hflush(self):
+        """
+        Flush buffered output and make it visible to new readers.
+
+        Data is guaranteed to have reached all datanodes in the write
+        pipeline, but not to have been written to disk.
+        """
+        _complain_ifclosed(self.closed)
+        self.f.flush()
+        self.f.raw.hflush()
+
+    def hsync(self):
+        """
+        Like :meth:`hflush`, but also make datanodes sync the data to
+        disk.
+        """
+        _complain_ifclosed(self.closed)
+        self.f.flush()
+        self.f.raw.hsync()
+
 
 class hdfs_file(FileIO):
 
@@ -283,19 +434,26 @@ class hdfs_file(FileIO):
             raise IOError("position cannot be past EOF")
         return self.f.raw.pread_chunk(position, chunk)
 
-    def read_chunk(self, chunk):
+    def read_chunk(self, chunk, digest=None):
         r"""
         Works like :meth:`read`\ , but data is stored in the writable
         buffer ``chunk`` rather than returned. Reads at most a number of
         bytes equal to the size of ``chunk``\ .
 
+        If ``digest`` is not :obj:`None`, it is fed the data that has
+        been read: it can be either a callable or an object with an
+        ``update`` method, such as a :mod:`hashlib` digest or a
+        :class:`~.common.Digester`.
+
         :type chunk: buffer
         :param chunk: a writable object that supports the buffer protocol
+        :type digest: callable
+        :param digest: digest or callback that receives the data read
         :rtype: int
         :return: the number of bytes read
         """
         _complain_ifclosed(self.closed)
-        return self.f.readinto(chunk)
+        return _update_digest(digest, chunk, self.f.readinto(chunk))
 
 
 class local_file(io.FileIO):
@@ -349,6 +507,13 @@ class local_file(io.FileIO):
             raise IOError("position cannot be past EOF")
         return super(local_file, self).seek(position, whence)
 
+    def hflush(self):
+        self.flush()
+
+    def hsync(self):
+        self.flush()
+        os.fsync(self.fileno())
+
     def __seek_and_read(self, position, length=None, buf=None):
         assert (length is None) != (buf is None)
         _complain_ifclosed(self.closed)
@@ -369,9 +534,141 @@ class local_file(io.FileIO):
     def pread_chunk(self, position, chunk):
         return self.__seek_and_read(position, buf=chunk)
 
-    def read_chunk(self, chunk):
+    def read_chunk(self, chunk, digest=None):
+        _complain_ifclosed(self.closed)
+        return _update_digest(digest, chunk, self.readinto(chunk))
+
+
+class local_mmap_file(local_file):
+    """\
+    Memory-mapped, read-only local file.
+
+    Data is served directly from the memory map: :meth:`view` returns
+    zero-copy :class:`memoryview` slices (on Python 2, where memory
+    maps do not support :class:`memoryview`, it returns copies), while
+    :meth:`pread` and :meth:`pread_chunk` do not move the file position
+    and are therefore safe to call from multiple threads.
+
+    Objects from this class should not be instantiated directly, but
+    rather obtained through the top-level ``open`` function in the
+    hdfs package (with ``use_mmap=True``).
+    """
+    def __init__(self, fs, name, mode):
+        if not mode.startswith("r"):
+            raise ValueError("memory mapping is only supported in read mode")
+        super(local_mmap_file, self).__init__(fs, name, mode)
+        if self.size > 0:
+            self.__map = mmap.mmap(self.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.__map = b""  # empty files cannot be mapped
+        try:
+            self.__view = memoryview(self.__map)
+        except TypeError:  # Python 2: mmap has no new-style buffer API
+            self.__view = None
+        self.__pos = 0
+
+    def __slice(self, start, end):
+        if self.__view is None:
+            return self.__map[start: end]
+        return self.__view[start: end]
+
+    def __check_position(self, position):
+        if position < 0:
+            raise IOError("position cannot be negative")
+        if position > self.size:
+            raise IOError("position cannot be past EOF")
+
+    def __end(self, position, length):
+        if length is None or length < 0:
+            return self.size
+        return min(position + length, self.size)
+
+    def view(self, position=0, length=-1):
+        r"""
+        Return a zero-copy :class:`memoryview` of ``length`` bytes
+        starting from ``position``\ . If ``length`` is negative, the
+        view extends to EOF.
+
+        All views must be released before the file is closed.
+
+        :type position: int
+        :param position: position from which the view starts
+        :type length: int
+        :param length: the number of bytes in the view
+        :rtype: memoryview
+        :return: a read-only view of the mapped file
+        """
+        _complain_ifclosed(self.closed)
+        self.__check_position(position)
+        return self.__slice(position, self.__end(position, length))
+
+    def read(self, length=-1):
+        _complain_ifclosed(self.closed)
+        end = self.__end(self.__pos, length)
+        data = self.__map[self.__pos: end]
+        self.__pos = max(end, self.__pos)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, b):
+        _complain_ifclosed(self.closed)
+        b = _byte_view(b)
+        end = self.__end(self.__pos, len(b))
+        n = max(end - self.__pos, 0)
+        b[:n] = self.__slice(self.__pos, end)
+        self.__pos += n
+        return n
+
+    def readline(self, size=-1):
+        _complain_ifclosed(self.closed)
+        end = self.__map.find(b"\n", self.__pos) + 1 or self.size
+        if size is not None and size >= 0:
+            end = min(end, self.__pos + size)
+        return self.read(end - self.__pos)
+
+    def seek(self, position, whence=os.SEEK_SET):
+        _complain_ifclosed(self.closed)
+        if whence == os.SEEK_CUR:
+            position += self.__pos
+        elif whence == os.SEEK_END:
+            position += self.size
+        elif whence != os.SEEK_SET:
+            raise ValueError("invalid whence (%r)" % (whence,))
+        self.__check_position(position)
+        self.__pos = position
+        return position
+
+    def tell(self):
+        _complain_ifclosed(self.closed)
+        return self.__pos
+
+    def pread(self, position, length):
+        _complain_ifclosed(self.closed)
+        self.__check_position(position)
+        return self.__map[position: self.__end(position, length)]
+
+    def pread_chunk(self, position, chunk):
         _complain_ifclosed(self.closed)
-        return self.readinto(chunk)
+        self.__check_position(position)
+        chunk = _byte_view(chunk)
+        end = self.__end(position, len(chunk))
+        chunk[:end - position] = self.__slice(position, end)
+        return end - position
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            # Python 2 memoryviews cannot be released
+            release = getattr(self.__view, "release", None)
+            if release is not None:
+                release()  # BufferError if views are still in use
+            if isinstance(self.__map, mmap.mmap):
+                self.__map.close()
+        finally:
+            super(local_mmap_file, self).close()
 
 
 class TextIOWrapper(io.TextIOWrapper):
@@ -390,3 +687,164 @@ class TextIOWrapper(io.TextIOWrapper):
     def pread(self, position, length):
         data = self.buffer.raw.pread(position, length)
         return data.decode(self.encoding, self.errors)
+
+    def hflush(self):
+        self.flush()
+        self.buffer.raw.hflush()
+
+    def hsync(self):
+        self.flush()
+        self.buffer.raw.hsync()
+
+
+def _local_pread(fd, position, length):
+    try:
+        return os.pread(fd, length, position)
+    except AttributeError:  # Python 2
+        os.lseek(fd, position, os.SEEK_SET)
+        return os.read(fd, length)
+
+
+class FollowReader(object):
+    """\
+    Follow a file that another process is appending to, like ``tail
+    -f``.
+
+    Iterating over the reader yields newly appended data in chunks of at
+    most ``chunk_size`` bytes or, in text mode, one line at a time. When
+    no new data is available, the file is checked again after a delay
+    that starts at ``min_delay`` seconds and doubles at each unsuccessful
+    check, up to ``max_delay`` seconds; the delay is reset as soon as new
+    data shows up. If ``timeout`` is not :obj:`None`, iteration stops
+    after ``timeout`` seconds without new data. All three can also be
+    changed by setting the corresponding attributes.
+
+    Data is read with ``pread`` from the last offset reached (available
+    as the ``offset`` attribute), starting from the current position of
+    ``f``: the file is never read again from the start. On HDFS, each
+    unsuccessful check asks the NameNode for the file's visible length
+    (a metadata call). Since input streams only see the data that was
+    visible when they were opened, the stream is reopened, once, only
+    when that length has grown past what it can read (the ``reopens``
+    attribute counts how many times this happened).
+
+    Objects from this class should not be instantiated directly, but
+    rather obtained through the top-level ``open`` function in the
+    hdfs package (with ``follow=True``).
+    """
+
+    def __init__(self, f, text=False, encoding=None, errors=None,
+                 chunk_size=common.BUFSIZE, min_delay=common.FOLLOW_MIN_DELAY,
+                 max_delay=common.FOLLOW_MAX_DELAY, timeout=None):
+        if "r" not in f.mode:
+            raise ValueError("can only follow files opened for reading")
+        self.file = f
+        self.offset = f.tell()
+        self.chunk_size = chunk_size
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.__encoding = (encoding or FileIO.ENCODING) if text else None
+        self.__errors = errors or FileIO.ERRORS
+        self.__lines = bytearray()
+        self.__local = isinstance(f, local_file)
+        self.__raw = None if self.__local else f.f.raw
+        self.__own_raw = False
+        self.__opened_size = None
+        self.reopens = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def name(self):
+        return self.file.name
+
+    def __pread(self):
+        if self.__local:
+            return _local_pread(self.file.fileno(), self.offset,
+                                self.chunk_size)
+        return self.__raw.pread(self.offset, self.chunk_size)
+
+    def __refresh(self):
+        # reopen the stream if (and only if) the file has grown past
+        # what it can see; return True if it was reopened
+        raw, fs = self.__raw, self.file.fs.fs
+        size = fs.get_path_info(raw.name)["size"]
+        if size <= max(self.offset, self.__opened_size or 0):
+            return False
+        self.__raw = fs.open_file(raw.name, "r", 0, 0, 0)
+        self.__opened_size = size
+        self.reopens += 1
+        if self.__own_raw:
+            raw.close()
+        self.__own_raw = True
+        return True
+
+    def poll(self):
+        """
+        Read up to ``chunk_size`` bytes of new data, without waiting.
+
+        :rtype: bytes
+        :return: the data read (empty if no new data is available)
+        """
+        _complain_ifclosed(self.closed)
+        data = self.__pread()
+        if not data and not self.__local and self.__refresh():
+            data = self.__pread()
+        self.offset += len(data)
+        return data
+
+    def __wait(self):
+        delay, idle = self.min_delay, 0
+        while not self.closed:
+            data = self.poll()
+            if data:
+                return data
+            if self.timeout is not None:
+                if idle >= self.timeout:
+                    break
+                delay = min(delay, self.timeout - idle)
+            time.sleep(delay)
+            idle += delay
+            delay = min(2 * delay, self.max_delay)
+        return b""
+
+    def __next__(self):
+        if self.__encoding is None:
+            data = self.__wait()
+            if not data:
+                raise StopIteration
+            return data
+        while True:
+            end = self.__lines.find(b"\n") + 1
+            if not end:
+                data = self.__wait()
+                if data:
+                    self.__lines.extend(data)
+                    continue
+                if not self.__lines:
+                    raise StopIteration
+                end = len(self.__lines)
+            line = bytes(self.__lines[:end])
+            del self.__lines[:end]
+            return line.decode(self.__encoding, self.__errors)
+
+    next = __next__
+
+    def __iter__(self):
+        return self
+
+    def close(self):
+        """
+        Close the file.
+        """
+        if not self.closed:
+            self.closed = True
+            if self.__own_raw:
+                self.__raw.close()
+            self.file.close()
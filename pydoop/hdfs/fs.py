@@ -27,10 +27,13 @@ import getpass
 import re
 import operator as ops
 import io
+import threading
 
 import pydoop
 from . import common
-from .file import FileIO, hdfs_file, local_file, TextIOWrapper
+from .file import (
+    FileIO, hdfs_file, local_file, local_mmap_file, TextIOWrapper
+)
 from .core import core_hdfs_fs
 
 # py3 compatibility
@@ -128,19 +131,57 @@ class hdfs(object):
     """
     _CACHE = {}
     _ALIASES = {"host": {}, "port": {}, "user": {}}
+    _CONNECT_LOCKS = {}  # requested (host, port, user) -> lock
+    _LOCK = threading.RLock()  # guards the above and refcounts
 
-    def __canonize_hpu(self, hpu):
+    @staticmethod
+    def __normalize(host, port, user):
+        host = common.encode_host(host.strip())
+        if user is None:
+            user = ""
+        if not host:
+            port = 0
+            user = user or getpass.getuser()
+        return host, port, user
+
+    @classmethod
+    def __canonize_hpu(cls, hpu):
         host, port, user = hpu
-        host = self._ALIASES["host"].get(host, host)
-        port = self._ALIASES["port"].get(port, port)
-        user = self._ALIASES["user"].get(user, user)
+        host = cls._ALIASES["host"].get(host, host)
+        port = cls._ALIASES["port"].get(port, port)
+        user = cls._ALIASES["user"].get(user, user)
         return host, port, user
 
+    @classmethod
+    def _cache_key(cls, host="default", port=0, user=None):
+        """
+        Return the key under which the connection to ``(host, port,
+        user)`` is cached.
+
+        Different spellings of the same address (e.g., ``"default"``
+        and the actual NameNode host) map to the same key once one of
+        them has been connected to.
+        """
+        hpu = cls.__normalize(host, port, user)
+        if not hpu[0]:
+            return hpu
+        with cls._LOCK:
+            return cls.__canonize_hpu(hpu)
+
     def __lookup(self, hpu):
         if hpu[0]:
             hpu = self.__canonize_hpu(hpu)
         return self._CACHE[hpu]
 
+    def __acquire(self, hpu):
+        # add a reference to the cached connection, if any (hold _LOCK)
+        try:
+            self.__status = self.__lookup(hpu)
+        except KeyError:
+            return False
+        self.__status.refcount += 1
+        return True
+
     def __eq__(self, other):
         """
         :obj:`True` if ``self`` and ``other`` wrap the same Hadoop file
@@ -149,38 +190,46 @@ class hdfs(object):
         return type(self) == type(other) and self.fs == other.fs
 
     def __init__(self, host="default", port=0, user=None, groups=None):
-        host = host.strip()
-        raw_host = host
-        host = common.encode_host(host)
-        if user is None:
-            user = ""
-        if not host:
-            port = 0
-            user = user or getpass.getuser()
-        try:
-            self.__status = self.__lookup((host, port, user))
-        except KeyError:
+        raw_host = host.strip()
+        host, port, user = key = self.__normalize(host, port, user)
+        with self._LOCK:
+            if self.__acquire(key):
+                return
+            connect_lock = self._CONNECT_LOCKS.setdefault(
+                key, threading.Lock()
+            )
+        # connect without holding the global lock, since this can take a
+        # while; concurrent requests for the same address wait here
+        with connect_lock:
+            with self._LOCK:
+                if self.__acquire(key):
+                    return
             h, p, u, fs = _get_connection_info(host, port, user)
-            aliasing_info = [] if user else [("user", u, user)]
-            if h != "":
-                aliasing_info.append(("port", p, port))
-            ip = _get_ip(h, None)
-            if ip:
-                aliasing_info.append(("host", ip, h))
-            else:
-                ip = h
-            aliasing_info.append(("host", ip, host))
-            if raw_host != host:
-                aliasing_info.append(("host", ip, raw_host))
-            for k, true_x, x in aliasing_info:
-                if true_x != x:
-                    self._ALIASES[k][x] = true_x
-            try:
-                self.__status = self.__lookup((h, p, u))
-            except KeyError:
-                self.__status = _FSStatus(fs, h, p, u, refcount=0)
-                self._CACHE[(ip, p, u)] = self.__status
-        self.__status.refcount += 1
+            with self._LOCK:
+                aliasing_info = [] if user else [("user", u, user)]
+                if h != "":
+                    aliasing_info.append(("port", p, port))
+                ip = _get_ip(h, None)
+                if ip:
+                    aliasing_info.append(("host", ip, h))
+                else:
+                    ip = h
+                aliasing_info.append(("host", ip, host))
+                if raw_host != host:
+                    aliasing_info.append(("host", ip, raw_host))
+                for k, true_x, x in aliasing_info:
+                    if true_x != x:
+                        self._ALIASES[k][x] = true_x
+                duplicate = self.__acquire((h, p, u))
+                if not duplicate:
+                    self.__status = _FSStatus(fs, h, p, u, refcount=1)
+                    self._CACHE[(ip, p, u)] = self.__status
+        if duplicate and user:
+            # another spelling of the same address was connected first.
+            # Connections made as a given user are separate instances and
+            # must be closed; without one, libhdfs returns the instance
+            # cached by Hadoop, which the other handle is still using
+            fs.close()
 
     def __enter__(self):
         return self
@@ -221,12 +270,13 @@ class hdfs(object):
         """
         Close the HDFS handle (disconnect).
         """
-        self.__status.refcount -= 1
-        if self.refcount == 0:
-            self.fs.close()
-            for k, status in list(self._CACHE.items()):  # yes, we want a copy
-                if status.refcount == 0:
-                    del self._CACHE[k]
+        with self._LOCK:
+            self.__status.refcount -= 1
+            if self.refcount == 0:
+                self.fs.close()
+                for k, status in list(self._CACHE.items()):  # yes, a copy
+                    if status.refcount == 0:
+                        del self._CACHE[k]
 
     @property
     def closed(self):
@@ -238,7 +288,9 @@ class hdfs(object):
                   replication=0,
                   blocksize=0,
                   encoding=None,
-                  errors=None):
+                  errors=None,
+                  use_mmap=False,
+                  write_behind=False):
         """
         Open an HDFS file.
 
@@ -260,6 +312,18 @@ class hdfs(object):
         :param replication: HDFS block replication
         :type blocksize: int
         :param blocksize: HDFS block size
+        :type use_mmap: bool
+        :param use_mmap: if :obj:`True` and the file system is local, open
+          the file as a :class:`~.file.local_mmap_file` (read mode only).
+          Ignored for non-local file systems.
+        :type write_behind: bool
+        :param write_behind: if :obj:`True` and the file is opened for
+          writing, :meth:`~.file.FileIO.write` returns as soon as data
+          is copied to one of ``common.WRITE_BEHIND_BUFFERS`` buffers of
+          at least ``common.WRITE_BEHIND_BUFSIZE`` bytes: full buffers
+          are written to HDFS by a background thread. Use
+          :meth:`~.file.FileIO.hflush` or :meth:`~.file.FileIO.hsync`
+          to control durability. Ignored for local file systems.
         :rtpye: :class:`~.file.hdfs_file`
         :return: handle to the open file
 
@@ -269,14 +333,15 @@ class hdfs(object):
             raise ValueError("Empty path")
         m, is_text = common.parse_mode(mode)
         if not self.host:
-            fret = local_file(self, path, m)
+            cls = local_mmap_file if use_mmap else local_file
+            fret = cls(self, path, m)
             if is_text:
                 cls = io.BufferedReader if m == "r" else io.BufferedWriter
                 fret = TextIOWrapper(cls(fret), encoding, errors)
             return fret
         f = self.fs.open_file(path, m, buff_size, replication, blocksize)
         cls = FileIO if is_text else hdfs_file
-        fret = cls(f, self, mode)
+        fret = cls(f, self, mode, write_behind=write_behind)
         return fret
 
     def capacity(self):
@@ -415,6 +480,59 @@ class hdfs(object):
         _complain_ifclosed(self.closed)
         return self.fs.list_directory(path)
 
+    def iter_directory(self, path, fields=None, recursive=False):
+        r"""
+        Iterate over files and directories in ``path``\ .
+
+        Works like :meth:`list_directory`, but items are converted one
+        at a time into compact records (see
+        :func:`~.common.path_info_type`) rather than dictionaries, and
+        only the attributes listed in ``fields`` (default: all) are
+        materialized. If ``recursive`` is :obj:`True`, also generate
+        items for all files and directories in the subtrees rooted at
+        each directory in ``path``.
+
+        This is **not** a streaming listing: libhdfs has no paged
+        listing call, so each directory is still fetched with a single
+        request, and its whole listing is held (in its native form)
+        until all of its items have been generated. When recursing, this
+        holds for every directory on the path from ``path`` to the
+        current item.
+
+        :type path: str
+        :param path: the path of the directory
+        :type fields: list
+        :param fields: names of the path info fields to include (see
+          :meth:`get_path_info`)
+        :type recursive: bool
+        :param recursive: if :obj:`True`, descend into subdirectories
+        :rtype: iterator
+        :return: path info records of files and directories in ``path``
+        :raises: :exc:`~exceptions.IOError`
+        """
+        _complain_ifclosed(self.closed)
+        fields = tuple(fields or common.PATH_INFO_FIELDS)
+        make_record = common.path_info_type(fields)._make
+        if not recursive:
+            for t in self.fs.iter_directory(path, fields):
+                yield make_record(t)
+            return
+        n = len(fields)
+        all_fields = fields + tuple(
+            _ for _ in ("name", "kind") if _ not in fields
+        )
+        name_idx, kind_idx = all_fields.index("name"), all_fields.index("kind")
+        stack = [self.fs.iter_directory(path, all_fields)]
+        while stack:
+            try:
+                t = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                continue
+            yield make_record(t[:n])
+            if t[kind_idx] == "directory":
+                stack.append(self.fs.iter_directory(t[name_idx], all_fields))
+
     def move(self, from_path, to_hdfs, to_path):
         """
         Move file from one filesystem to another.
@@ -607,12 +725,35 @@ class hdfs(object):
         _complain_ifclosed(self.closed)
         return self.fs.utime(path, int(mtime), int(atime))
 
+    def truncate(self, path, length):
+        """
+        Truncate a file to ``length`` bytes.
+
+        On HDFS, if ``length`` is not on a block boundary, the length of
+        the last block is adjusted in the background: the file cannot
+        be written to (e.g., appended) until the process is complete.
+
+        :type path: str
+        :param path: the path to the file
+        :type length: int
+        :param length: the new length of the file
+        :rtype: bool
+        :return: :obj:`True` if the file is immediately available for
+          further writes, :obj:`False` if a background adjustment
+          process has been started
+        :raises: :exc:`~exceptions.IOError`
+        """
+        _complain_ifclosed(self.closed)
+        return self.fs.truncate(path, length)
+
     def walk(self, top):
         """
         Generate infos for all paths in the tree rooted at ``top`` (included).
 
         The ``top`` parameter can be either an HDFS path string or a
         dictionary of properties as returned by :meth:`get_path_info`.
+        Each directory is listed in full (see :meth:`list_directory`)
+        when it is reached.
 
         :type top: str, dict
         :param top: an HDFS path or path info dict
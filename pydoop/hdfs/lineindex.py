@@ -0,0 +1,308 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+"""
+pydoop.hdfs.lineindex -- Line Indexes for Text Files
+----------------------------------------------------
+
+Getting to line N of a text file normally requires reading all lines
+that come before it. A *line index* is a small sidecar file that
+records the byte offset of one line every ``stride`` lines, so that
+any line can be reached with a binary search on the index followed by
+a ``pread`` of less than ``stride`` lines:
+
+.. code-block:: python
+
+  >>> from pydoop.hdfs.lineindex import build_index, LineIndex
+  >>> build_index("hdfs://localhost:9000/user/me/big.txt")
+  >>> with LineIndex("hdfs://localhost:9000/user/me/big.txt") as idx:
+  ...     n_lines = len(idx)
+  ...     page = idx[1000000:1000050]
+
+The index is built with a single pass over the file, with the file's
+blocks scanned in parallel. By default, it is stored next to the
+indexed file, in a hidden file (see :func:`default_index_path`) that is
+ignored by Hadoop input formats.
+"""
+
+import array
+import bisect
+import io
+import struct
+import sys
+
+from . import common, path
+from .pool import get_default_pool
+
+DEFAULT_STRIDE = 1024
+DEFAULT_CHUNK_SIZE = 1 << 20
+INDEX_SUFFIX = ".lidx"
+
+_MAGIC = b"PYDLIDX1"
+# magic, stride, file size, file mtime, n. of lines, n. of ranges,
+# n. of checkpoints
+_HEADER = struct.Struct(">8sQQqQQQ")
+_NL = b"\n"
+
+
+def _new_array(data=None):
+    for typecode in "QL":  # "Q" is not available in Python 2
+        try:
+            a = array.array(typecode)
+        except ValueError:
+            continue
+        if a.itemsize == 8:
+            break
+    else:
+        raise RuntimeError("no 64-bit unsigned array type")
+    if data is not None:
+        (getattr(a, "frombytes", None) or a.fromstring)(data)
+        if sys.byteorder == "little":
+            a.byteswap()
+    return a
+
+
+def _array_bytes(a):
+    if sys.byteorder == "little":
+        a = array.array(a.typecode, a)
+        a.byteswap()
+    return (getattr(a, "tobytes", None) or a.tostring)()
+
+
+def default_index_path(hdfs_path):
+    """
+    Get the default index path for ``hdfs_path``: for instance, the
+    index for ``/user/me/big.txt`` is ``/user/me/.big.txt.lidx``.
+    """
+    return path.join(
+        path.dirname(hdfs_path),
+        ".%s%s" % (path.basename(hdfs_path), INDEX_SUFFIX)
+    )
+
+
+def _scan_range(hdfs_path, user, offset, length, stride, chunk_size):
+    # Count the newlines in the range, recording the offset that follows
+    # the 1st, (stride+1)th, (2*stride+1)th, ... one.
+    host, port, path_ = path.split(hdfs_path, user)
+    count, checkpoints = 0, _new_array()
+    pos, end = offset, offset + length
+    with get_default_pool().connection(host, port, user) as fs:
+        with fs.open_file(path_) as f:
+            while pos < end:
+                data = f.pread(pos, min(chunk_size, end - pos))
+                if not data:
+                    break
+                n = data.count(_NL)
+                target, i, seen = -count % stride, -1, 0
+                while target < n:
+                    while seen <= target:
+                        i = data.find(_NL, i + 1)
+                        seen += 1
+                    checkpoints.append(pos + i + 1)
+                    target += stride
+                count += n
+                pos += len(data)
+    return count, checkpoints
+
+
+def build_index(hdfs_path, index_path=None, stride=DEFAULT_STRIDE,
+                range_size=None, user=None,
+                max_workers=common.DEFAULT_MAX_WORKERS,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Build a line index for the text file at ``hdfs_path``.
+
+    The file is split into ranges of ``range_size`` bytes (by default,
+    the file's block size), which are scanned concurrently with up to
+    ``max_workers`` threads, each reading ``chunk_size`` bytes at a
+    time. Lines are terminated by ``"\\n"``.
+
+    :type hdfs_path: str
+    :param hdfs_path: the text file to index
+    :type index_path: str
+    :param index_path: where to write the index (by default,
+      :func:`default_index_path` is used)
+    :type stride: int
+    :param stride: distance, in lines, between indexed lines
+    :type user: str
+    :param user: passed to :func:`~.path.split`
+    :rtype: str
+    :return: the index path
+    """
+    if stride < 1:
+        raise ValueError("stride must be positive")
+    if index_path is None:
+        index_path = default_index_path(hdfs_path)
+    host, port, path_ = path.split(hdfs_path, user)
+    with get_default_pool().connection(host, port, user) as fs:
+        info = fs.get_path_info(path_)
+    if info["kind"] != "file":
+        raise IOError("%r is not a file" % (hdfs_path,))
+    size = info["size"]
+    range_size = range_size or info["block_size"] or size or 1
+    # a newline at the very end of the file does not start a new line
+    results = common.map_concurrently(
+        lambda offset: _scan_range(
+            hdfs_path, user, offset, min(range_size, size - 1 - offset),
+            stride, chunk_size
+        ), range(0, max(size - 1, 0), range_size), max_workers
+    )
+    ranges, checkpoints, n_newlines = _new_array(), _new_array(), 0
+    for count, cp in results:
+        ranges.extend((n_newlines, len(checkpoints)))
+        checkpoints.extend(cp)
+        n_newlines += count
+    n_lines = n_newlines + 1 if size else 0
+    host, port, ipath = path.split(index_path, user)
+    with get_default_pool().connection(host, port, user) as fs:
+        with fs.open_file(ipath, "w") as f:
+            f.write(_HEADER.pack(
+                _MAGIC, stride, size, info["last_mod"], n_lines,
+                len(ranges) // 2, len(checkpoints)
+            ))
+            f.write(_array_bytes(ranges))
+            f.write(_array_bytes(checkpoints))
+    return index_path
+
+
+class LineIndex(object):
+    """
+    Random access to the lines of the text file at ``hdfs_path``, based
+    on its line index (see :func:`build_index`).
+
+    Indexing the object with an integer returns the corresponding line,
+    while slicing (with a step of 1) returns a list of lines. Lines are
+    returned as bytes, including the terminating newline (if any).
+
+    :raises: :exc:`~exceptions.IOError` if the index is not valid, or
+      if the file has changed since the index was built
+    """
+
+    def __init__(self, hdfs_path, index_path=None, user=None):
+        if index_path is None:
+            index_path = default_index_path(hdfs_path)
+        host, port, ipath = path.split(index_path, user)
+        with get_default_pool().connection(host, port, user) as fs:
+            with fs.open_file(ipath) as f:
+                data = f.read()
+        try:
+            (magic, self.stride, self.__size, mtime, self.__n, n_ranges,
+             n_checkpoints) = _HEADER.unpack_from(data)
+        except struct.error:
+            magic = None
+        if magic != _MAGIC:
+            raise IOError("%r is not a line index" % (index_path,))
+        start = _HEADER.size
+        end = start + 16 * n_ranges
+        ranges = _new_array(data[start: end])
+        self.__bases = ranges[::2]
+        self.__cp_starts = ranges[1::2]
+        self.__checkpoints = _new_array(data[end: end + 8 * n_checkpoints])
+        host, port, path_ = path.split(hdfs_path, user)
+        self.fs = get_default_pool().connect(host, port, user)
+        self.__file = None
+        try:
+            info = self.fs.get_path_info(path_)
+            if info["size"] != self.__size or info["last_mod"] != mtime:
+                raise IOError("%r has changed since %r was built" % (
+                    hdfs_path, index_path
+                ))
+            self.__file = self.fs.open_file(path_)
+        except Exception:
+            self.close()
+            raise
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.__n
+
+    def __skip_lines(self, pos, n):
+        # get the offset that follows the n-th newline after pos
+        while n:
+            data = self.__file.pread(pos, min(DEFAULT_CHUNK_SIZE,
+                                              self.__size - pos))
+            if not data:
+                break
+            count = data.count(_NL)
+            if count >= n:
+                i = -1
+                for _ in range(n):
+                    i = data.find(_NL, i + 1)
+                return pos + i + 1
+            n -= count
+            pos += len(data)
+        return pos
+
+    def offset(self, n):
+        """
+        Get the byte offset of line ``n`` (``len(self)`` maps to the
+        file's size).
+        """
+        if self.closed:
+            raise ValueError("operation on closed line index")
+        if n < 0 or n > self.__n:
+            raise IndexError("line number out of range")
+        if n == 0:
+            return 0
+        if n == self.__n:
+            return self.__size
+        j = n - 1  # line n starts after the j-th newline
+        r = bisect.bisect_right(self.__bases, j) - 1
+        k, rest = divmod(j - self.__bases[r], self.stride)
+        pos = self.__checkpoints[self.__cp_starts[r] + k]
+        return self.__skip_lines(pos, rest)
+
+    def lines(self, start, stop):
+        """
+        Get lines ``start`` (included) to ``stop`` (excluded), with a
+        single ``pread``.
+        """
+        start, stop, _ = slice(start, stop).indices(self.__n)
+        if start >= stop:
+            return []
+        begin = self.offset(start)
+        data = self.__file.pread(begin, self.offset(stop) - begin)
+        return io.BytesIO(data).readlines()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError("slice step must be 1")
+            return self.lines(key.start, key.stop)
+        if key < 0:
+            key += self.__n
+        if key < 0 or key >= self.__n:
+            raise IndexError("line number out of range")
+        return self.lines(key, key + 1)[0]
+
+    def close(self):
+        """
+        Close the indexed file.
+        """
+        if getattr(self, "closed", False):
+            return
+        self.closed = True
+        if self.__file is not None:
+            self.__file.close()
+        self.fs.close()
@@ -0,0 +1,294 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+"""
+pydoop.hdfs.pack -- Small File Containers
+-----------------------------------------
+
+Storing many small objects as individual HDFS files puts a heavy load
+on the NameNode. A *pack* is a directory that stores any number of
+key/blob pairs in a few large files:
+
+* ``part-NNNNN``: blobs, concatenated. Each part is at most
+  ``part_size`` bytes long (unless it holds a single larger blob) and,
+  on HDFS, is written with a block size of at least ``part_size``, so
+  that each blob lives in a single block.
+* ``index``: the location of each blob, sorted by key.
+
+.. code-block:: python
+
+  >>> from pydoop.hdfs.pack import PackWriter, PackReader
+  >>> with PackWriter("hdfs://localhost:9000/user/me/images") as writer:
+  ...     writer.add("cat.jpg", cat_data)
+  ...     writer.add("dog.jpg", dog_data)
+  ...
+  >>> with PackReader("hdfs://localhost:9000/user/me/images") as reader:
+  ...     dog_data = reader["dog.jpg"]
+
+The index is loaded once when the reader is opened (on the local file
+system it is memory-mapped); each lookup is a binary search on the
+index followed by a single ``pread``.
+"""
+
+import struct
+
+from . import path
+from .file import local_mmap_file
+from .pool import get_default_pool
+from pydoop.utils.py3compat import unicode
+
+DEFAULT_PART_SIZE = 1 << 27
+INDEX_NAME = "index"
+PART_TEMPLATE = "part-%05d"
+
+_MAGIC = b"PYDPACK1"
+_HEADER = struct.Struct(">8sQ")  # magic, number of entries
+# key offset in the key table, key length, part, blob offset, blob length
+_ENTRY = struct.Struct(">QIIQQ")
+_MIN_BLOCK_SIZE = 1 << 20  # dfs.namenode.fs-limits.min-block-size
+_CHECKSUM_CHUNK = 512  # dfs.bytes-per-checksum
+
+
+def _encode_key(key):
+    if isinstance(key, unicode):
+        return key.encode("utf-8")
+    return bytes(key)
+
+
+class PackWriter(object):
+    """
+    Write blobs to a new pack at ``hdfs_path``.
+
+    Blobs are appended to the current part file as they are added; the
+    index is written when the writer is closed, so the pack is not
+    readable until then.
+
+    :type hdfs_path: str
+    :param hdfs_path: the pack's directory, which must not exist
+    :type part_size: int
+    :param part_size: maximum size of a part file
+    :type user: str
+    :param user: passed to :func:`~.path.split`
+    :type replication: int
+    :param replication: HDFS replication for part and index files
+    """
+
+    def __init__(self, hdfs_path, part_size=DEFAULT_PART_SIZE, user=None,
+                 replication=0):
+        if part_size < 1:
+            raise ValueError("part_size must be positive")
+        host, port, self.path = path.split(hdfs_path, user)
+        self.fs = get_default_pool().connect(host, port, user)
+        if self.fs.exists(self.path):
+            self.fs.close()
+            raise IOError("%r already exists" % (hdfs_path,))
+        self.fs.create_directory(self.path)
+        self.part_size = part_size
+        self.replication = replication
+        self.blocksize = max(part_size, _MIN_BLOCK_SIZE)
+        self.blocksize += -self.blocksize % _CHECKSUM_CHUNK
+        self.__entries = {}
+        self.__part = None
+        self.__n_parts = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __open(self, name):
+        return self.fs.open_file(
+            path.join(self.path, name), "w", replication=self.replication,
+            blocksize=self.blocksize, write_behind=True
+        )
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def add(self, key, data):
+        """
+        Add a blob to the pack.
+
+        :type key: str
+        :param key: the blob's key (text keys are stored as UTF-8)
+        :type data: bytes
+        :param data: the blob
+        :raises: :exc:`~exceptions.KeyError` if ``key`` is already in
+          the pack
+        """
+        if self.closed:
+            raise ValueError("operation on closed pack writer")
+        key = _encode_key(key)
+        if key in self.__entries:
+            raise KeyError("duplicate key: %r" % (key,))
+        length = len(data)
+        f = self.__part
+        if f is None or f.tell() and f.tell() + length > self.part_size:
+            if f is not None:
+                f.close()
+            f = self.__part = self.__open(PART_TEMPLATE % self.__n_parts)
+            self.__n_parts += 1
+        self.__entries[key] = (self.__n_parts - 1, f.tell(), length)
+        f.write(data)
+
+    def close(self):
+        """
+        Close the current part file and write the index.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.__part is not None:
+                self.__part.close()
+            keys = sorted(self.__entries)
+            with self.__open(INDEX_NAME) as f:
+                f.write(_HEADER.pack(_MAGIC, len(keys)))
+                key_offset = 0
+                for k in keys:
+                    part, offset, length = self.__entries[k]
+                    f.write(_ENTRY.pack(key_offset, len(k), part, offset,
+                                        length))
+                    key_offset += len(k)
+                for k in keys:
+                    f.write(k)
+        finally:
+            self.fs.close()
+
+
+class PackReader(object):
+    """
+    Read blobs from the pack at ``hdfs_path``.
+
+    Part files are opened as needed and kept open until the reader is
+    closed. Text keys are looked up by their UTF-8 encoding.
+    """
+
+    def __init__(self, hdfs_path, user=None):
+        host, port, self.path = path.split(hdfs_path, user)
+        self.fs = get_default_pool().connect(host, port, user)
+        self.__parts = {}
+        self.__index = None
+        try:
+            self.__index = self.fs.open_file(
+                path.join(self.path, INDEX_NAME), use_mmap=True
+            )
+            if isinstance(self.__index, local_mmap_file):
+                self.__buf = self.__index.view()
+            else:
+                self.__buf = self.__index.read()
+            magic, self.__n = _HEADER.unpack_from(self.__buf)
+            if magic != _MAGIC:
+                raise IOError("%r is not a pack index" % (self.__index.name,))
+        except Exception:
+            self.close()
+            raise
+        self.__keys_start = _HEADER.size + self.__n * _ENTRY.size
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.__n
+
+    def __entry(self, i):
+        return _ENTRY.unpack_from(self.__buf, _HEADER.size + i * _ENTRY.size)
+
+    def __key(self, entry):
+        start = self.__keys_start + entry[0]
+        return bytes(self.__buf[start: start + entry[1]])
+
+    def __find(self, key):
+        lo, hi = 0, self.__n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self.__entry(mid)
+            k = self.__key(entry)
+            if k == key:
+                return entry
+            if k < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def keys(self):
+        """
+        Iterate over all keys (as bytes), in sorted order.
+        """
+        for i in range(self.__n):
+            yield self.__key(self.__entry(i))
+
+    __iter__ = keys
+
+    def __contains__(self, key):
+        return self.__find(_encode_key(key)) is not None
+
+    def locate(self, key):
+        """
+        Get the location of the blob for ``key``.
+
+        :rtype: tuple
+        :return: part file name, offset and length
+        :raises: :exc:`~exceptions.KeyError` if ``key`` is not in the pack
+        """
+        entry = self.__find(_encode_key(key))
+        if entry is None:
+            raise KeyError(key)
+        return (path.join(self.path, PART_TEMPLATE % entry[2]),) + entry[3:]
+
+    def __getitem__(self, key):
+        if self.closed:
+            raise ValueError("operation on closed pack reader")
+        name, offset, length = self.locate(key)
+        try:
+            f = self.__parts[name]
+        except KeyError:
+            f = self.__parts[name] = self.fs.open_file(name)
+        return f.pread(offset, length)
+
+    def get(self, key, default=None):
+        """
+        Get the blob for ``key``, or ``default`` if ``key`` is not in
+        the pack.
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def close(self):
+        """
+        Close all open files.
+        """
+        if getattr(self, "closed", False):
+            return
+        self.closed = True
+        self.__buf = None
+        for f in self.__parts.values():
+            f.close()
+        self.__parts.clear()
+        if self.__index is not None:
+            self.__index.close()
+        self.fs.close()
@@ -23,14 +23,19 @@ pydoop.hdfs.path -- Path Name Manipulations
 
 import os
 import re
+import threading
 import time
+from collections import OrderedDict
 
 from . import common, fs as hdfs_fs
+from .pool import get_default_pool
 from pydoop.utils.py3compat import clong
 
 
 curdir, pardir, sep = '.', '..', '/'  # pylint: disable=C0103
 
+CACHE_SIZE = 65536  # max number of entries in each path resolution cache
+
 
 class StatResult(object):
     """
@@ -78,6 +83,64 @@ class StatResult(object):
         )
 
 
+try:
+    from functools import lru_cache as _lru_cache
+except ImportError:  # Python 2
+    def _lru_cache(maxsize):
+        def decorator(func):
+            cache = OrderedDict()
+            lock = threading.Lock()
+
+            def wrapper(*args):
+                with lock:
+                    try:
+                        value = cache.pop(args)
+                    except KeyError:
+                        pass
+                    else:
+                        cache[args] = value
+                        return value
+                value = func(*args)
+                with lock:
+                    cache[args] = value
+                    while len(cache) > maxsize:
+                        cache.popitem(last=False)
+                return value
+
+            def cache_clear():
+                with lock:
+                    cache.clear()
+
+            wrapper.cache_clear = cache_clear
+            return wrapper
+        return decorator
+
+
+_DEFAULT_SCHEME = []
+
+
+def _default_scheme():
+    if not _DEFAULT_SCHEME:
+        _DEFAULT_SCHEME.append(
+            "file" if hdfs_fs.default_is_local() else "hdfs"
+        )
+    return _DEFAULT_SCHEME[0]
+
+
+def clear_cache():
+    """
+    Clear the caches used by :func:`split` and :func:`abspath`.
+
+    Path resolution results, together with the default file system
+    scheme and the addresses of NameNodes, are cached in memory: call
+    this function if the Hadoop configuration changes at run time
+    (:func:`pydoop.hdfs.reset` does it automatically).
+    """
+    _split.cache_clear()
+    _namenode_uri.cache_clear()
+    del _DEFAULT_SCHEME[:]
+
+
 class _HdfsPathSplitter(object):
 
     PATTERN = re.compile(r"([a-z0-9+.-]+):(.*)")
@@ -152,7 +215,7 @@ class _HdfsPathSplitter(object):
             cls.raise_bad_path(hdfs_path, "empty")
         scheme, netloc, path = cls.parse(hdfs_path)
         if not scheme:
-            scheme = "file" if hdfs_fs.default_is_local() else "hdfs"
+            scheme = _default_scheme()
         if scheme == "hdfs":
             if not path:
                 cls.raise_bad_path(hdfs_path, "path part is empty")
@@ -170,6 +233,17 @@ class _HdfsPathSplitter(object):
         return hostname, port, path
 
 
+@_lru_cache(CACHE_SIZE)
+def _split(hdfs_path, user):
+    return _HdfsPathSplitter.split(hdfs_path, user)
+
+
+@_lru_cache(CACHE_SIZE)
+def _namenode_uri(hostname, port):
+    fs = get_default_pool().get(hostname, port)
+    return "hdfs://%s:%s" % (fs.host, fs.port)
+
+
 def parse(hdfs_path):
     """
     Parse the given path and return its components.
@@ -200,9 +274,11 @@ def split(hdfs_path, user=None):
       current user
     :rtype: tuple
     :return: hostname, port, path
+
+    Results are kept in a least recently used cache of up to
+    :data:`CACHE_SIZE` entries (see :func:`clear_cache`).
     """
-    # Use a helper class to compile URL_PATTERN once and for all
-    return _HdfsPathSplitter.split(hdfs_path, user or common.DEFAULT_USER)
+    return _split(hdfs_path, user or common.DEFAULT_USER)
 
 
 def join(*parts):
@@ -270,9 +346,7 @@ def abspath(hdfs_path, user=None, local=False):
         return hdfs_path
     hostname, port, path = split(hdfs_path, user=user)
     if hostname:
-        fs = hdfs_fs.hdfs(hostname, port)
-        apath = join("hdfs://%s:%s" % (fs.host, fs.port), path)
-        fs.close()
+        apath = join(_namenode_uri(hostname, port), path)
     else:
         apath = "file:%s" % os.path.abspath(path)
     return apath
@@ -306,10 +380,8 @@ def exists(hdfs_path, user=None):
     Return :obj:`True` if ``hdfs_path`` exists in the default HDFS.
     """
     hostname, port, path = split(hdfs_path, user=user)
-    fs = hdfs_fs.hdfs(hostname, port)
-    retval = fs.exists(path)
-    fs.close()
-    return retval
+    with get_default_pool().connection(hostname, port) as fs:
+        return fs.exists(path)
 
 
 # -- libhdfs does not support fs.FileStatus.isSymlink() --
@@ -329,13 +401,11 @@ def kind(path, user=None):
     Return :obj:`None` if ``path`` doesn't exist.
     """
     hostname, port, path = split(path, user=user)
-    fs = hdfs_fs.hdfs(hostname, port)
-    try:
-        return fs.get_path_info(path)['kind']
-    except IOError:
-        return None
-    finally:
-        fs.close()
+    with get_default_pool().connection(hostname, port) as fs:
+        try:
+            return fs.get_path_info(path)['kind']
+        except IOError:
+            return None
 
 
 def isdir(path, user=None):
@@ -392,11 +462,10 @@ def stat(path, user=None):
     :class:`StatResult` object.
     """
     host, port, path_ = split(path, user)
-    fs = hdfs_fs.hdfs(host, port, user)
-    retval = StatResult(fs.get_path_info(path_))
+    with get_default_pool().connection(host, port, user) as fs:
+        retval = StatResult(fs.get_path_info(path_))
     if not host:
         _update_stat(retval, path_)
-    fs.close()
     return retval
 
 
@@ -544,5 +613,5 @@ def access(path, mode, user=None):
 def utime(hdfs_path, times=None, user=None):
     atime, mtime = times or 2 * (time.time(),)
     hostname, port, path = split(hdfs_path, user=user)
-    with hdfs_fs.hdfs(hostname, port) as fs:
+    with get_default_pool().connection(hostname, port) as fs:
         fs.utime(path, mtime, atime)
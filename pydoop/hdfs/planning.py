@@ -0,0 +1,170 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+"""
+pydoop.hdfs.planning -- Locality-Aware Read Planning
+----------------------------------------------------
+
+Split a set of HDFS files into block-aligned byte ranges and assign
+each range to one of the DataNodes that store it, keeping the amount
+of data assigned to each host as balanced as replica placement
+allows. Plans can be used to schedule reads in multi-process tools, or
+to generate input splits:
+
+.. code-block:: python
+
+  >>> import pydoop.hdfs as hdfs
+  >>> from pydoop.hdfs.planning import plan_by_host, interleave
+  >>> from pydoop.utils.serialize import OpaqueInputSplit, write_opaques
+  >>> plan = plan_by_host(["hdfs://localhost:9000/user/me/input"])
+  >>> splits = [OpaqueInputSplit(1, r._asdict()) for r in interleave(plan)]
+  >>> with hdfs.open("hdfs://localhost:9000/user/me/splits", "wb") as f:
+  ...     write_opaques(splits, f)
+"""
+
+from collections import namedtuple
+
+from . import common, path
+from .pool import get_default_pool
+
+# key used for ranges with no known location
+NO_HOST = ""
+
+
+class BlockRange(namedtuple("BlockRange", "path offset length hosts")):
+    """\
+    A byte range within a file, aligned to HDFS block boundaries.
+
+    * ``path``: fully qualified name of the file
+    * ``offset``: start of the range
+    * ``length``: length of the range in bytes
+    * ``hosts``: tuple of the hosts that store the range
+    """
+    __slots__ = ()
+
+
+def _is_hidden(name):
+    return path.basename(name).startswith(("_", "."))
+
+
+def _file_ranges(fs, info):
+    size = info["size"]
+    if not size:
+        return []
+    block_size = info["block_size"] or size
+    hosts = fs.get_hosts(info["name"], 0, size)
+    ranges = []
+    for i, offset in enumerate(range(0, size, block_size)):
+        h = tuple(hosts[i]) if i < len(hosts) else ()
+        length = min(block_size, size - offset)
+        ranges.append(BlockRange(info["name"], offset, length, h))
+    return ranges
+
+
+def get_block_ranges(hdfs_paths, user=None,
+                     max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Get the list of block ranges for the given files.
+
+    Directories are replaced by the files they contain (not
+    recursively); as in Hadoop's ``FileInputFormat``, files whose names
+    start with ``_`` or ``.`` are skipped. Block locations are looked up
+    concurrently, using up to ``max_workers`` threads.
+
+    :type hdfs_paths: list
+    :param hdfs_paths: file or directory paths
+    :type user: str
+    :param user: passed to :func:`~.path.split`
+    :rtype: list
+    :return: :class:`BlockRange` objects, ordered by path and offset
+    """
+    pool = get_default_pool()
+
+    def get_infos(hdfs_path):
+        host, port, path_ = path.split(hdfs_path, user)
+        with pool.connection(host, port, user) as fs:
+            info = fs.get_path_info(path_)
+            if info["kind"] != "directory":
+                return [(host, port, info)]
+            return [(host, port, _) for _ in fs.list_directory(path_)
+                    if _["kind"] == "file" and not _is_hidden(_["name"])]
+
+    def get_ranges(item):
+        host, port, info = item
+        with pool.connection(host, port, user) as fs:
+            return _file_ranges(fs, info)
+
+    items = [_ for infos in common.map_concurrently(
+        get_infos, hdfs_paths, max_workers
+    ) for _ in infos]
+    ranges = [_ for ranges in common.map_concurrently(
+        get_ranges, items, max_workers
+    ) for _ in ranges]
+    ranges.sort()
+    return ranges
+
+
+def assign_ranges(ranges):
+    """\
+    Assign each range to one of its hosts, balancing the total number
+    of bytes per host.
+
+    Ranges are assigned largest first, each to the least loaded host
+    that stores it. Ranges with no known location are assigned to
+    :data:`NO_HOST`.
+
+    :type ranges: iterable
+    :param ranges: :class:`BlockRange` objects
+    :rtype: dict
+    :return: a host to ranges mapping; ranges in each list are ordered
+      by path and offset
+    """
+    queues, loads = {}, {}
+    for r in sorted(ranges, key=lambda r: (-r.length, r.path, r.offset)):
+        hosts = r.hosts or (NO_HOST,)
+        h = min(hosts, key=lambda h: (loads.get(h, 0), h))
+        queues.setdefault(h, []).append(r)
+        loads[h] = loads.get(h, 0) + r.length
+    for q in queues.values():
+        q.sort()
+    return queues
+
+
+def plan_by_host(hdfs_paths, user=None,
+                 max_workers=common.DEFAULT_MAX_WORKERS):
+    """\
+    Get the block ranges for ``hdfs_paths`` grouped by host.
+
+    Same as ``assign_ranges(get_block_ranges(hdfs_paths, ...))``.
+    """
+    return assign_ranges(get_block_ranges(hdfs_paths, user, max_workers))
+
+
+def interleave(plan):
+    """\
+    Flatten ``plan`` (as returned by :func:`plan_by_host`) into a single
+    list, taking one range from each host in turn.
+
+    If work items are consumed in list order by a set of workers (e.g.,
+    map tasks), consecutive items come from different hosts.
+    """
+    queues = [plan[h] for h in sorted(plan)]
+    flat = []
+    for i in range(max(len(_) for _ in queues) if queues else 0):
+        flat.extend(q[i] for q in queues if i < len(q))
+    return flat
@@ -0,0 +1,204 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+"""
+pydoop.hdfs.pool -- File System Connection Pool
+-----------------------------------------------
+
+A pool keeps one open :class:`~.fs.hdfs` handle for each (host, port,
+user) combination it is asked for, so that short-lived operations
+(such as the module-level helpers in :mod:`pydoop.hdfs`) do not
+connect and disconnect on every call. It also bounds the number of
+operations that can be in flight at the same time on each NameNode.
+
+Pools are thread-safe: handles can be shared by multiple threads.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from .fs import hdfs
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+class FSPool(object):
+    """
+    A thread-safe pool of HDFS connections.
+
+    :type max_concurrency: int
+    :param max_concurrency: maximum number of operations run through
+      :meth:`connection` that can be in flight at the same time on a
+      single NameNode (or on the local file system)
+    :type on_connect: callable
+    :param on_connect: if not :obj:`None`, called with the new
+      :class:`~.fs.hdfs` handle every time the pool opens a connection
+    :type on_close: callable
+    :param on_close: if not :obj:`None`, called with each
+      :class:`~.fs.hdfs` handle right before the pool closes it
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 on_connect=None, on_close=None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive")
+        self.max_concurrency = max_concurrency
+        self.on_connect = on_connect
+        self.on_close = on_close
+        self.__lock = threading.RLock()
+        self.__handles = {}
+        self.__semaphores = {}
+        self.__key_locks = {}
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __complain_ifclosed(self):
+        if self.closed:
+            raise ValueError("operation on closed HDFS connection pool")
+
+    def get(self, host="default", port=0, user=None):
+        """
+        Get the pooled handle for ``(host, port, user)``, connecting if
+        necessary.
+
+        The handle is owned by the pool: do **not** close it.
+        """
+        # different spellings of the same address share the handle
+        key = hdfs._cache_key(host, port, user)
+        with self.__lock:
+            self.__complain_ifclosed()
+            try:
+                return self.__handles[key]
+            except KeyError:
+                pass
+            key_lock = self.__key_locks.setdefault(key, threading.Lock())
+        # connect without holding the pool lock, so that a slow NameNode
+        # does not block requests for other ones
+        with key_lock:
+            with self.__lock:
+                self.__complain_ifclosed()
+                try:
+                    return self.__handles[key]
+                except KeyError:
+                    pass
+            fs = hdfs(host, port, user)
+            key = hdfs._cache_key(host, port, user)  # now fully resolved
+            announced = False
+            try:
+                with self.__lock:
+                    self.__complain_ifclosed()
+                    existing = self.__handles.get(key)
+                if existing is None:
+                    if self.on_connect is not None:
+                        self.on_connect(fs)
+                        announced = True
+                    with self.__lock:
+                        self.__complain_ifclosed()
+                        existing = self.__handles.setdefault(key, fs)
+                        self.__semaphores.setdefault(
+                            (fs.host, fs.port),
+                            threading.BoundedSemaphore(self.max_concurrency)
+                        )
+            except Exception:
+                fs.close()
+                raise
+            if existing is not fs:
+                # another spelling of the same address got there first
+                if announced and self.on_close is not None:
+                    self.on_close(fs)
+                fs.close()
+            return existing
+
+    def connect(self, host="default", port=0, user=None):
+        """
+        Get a new reference to the pooled connection for ``(host, port,
+        user)``.
+
+        Unlike :meth:`get`, the returned handle belongs to the caller,
+        who must close it when done. Since the pool keeps the
+        connection open, this is cheap.
+        """
+        self.get(host, port, user)
+        return hdfs(host, port, user)
+
+    @contextmanager
+    def connection(self, host="default", port=0, user=None):
+        """
+        Context manager that yields the pooled handle for ``(host, port,
+        user)``, waiting until there are less than ``max_concurrency``
+        other operations in flight on the same NameNode.
+
+        .. code-block:: python
+
+          >>> with pool.connection("default", 0) as fs:
+          ...     fs.create_directory("foo")
+
+        Do not nest calls for the same NameNode, since that might
+        exhaust the available slots and block forever.
+        """
+        fs = self.get(host, port, user)
+        with self.__lock:
+            self.__complain_ifclosed()
+            semaphore = self.__semaphores[(fs.host, fs.port)]
+        with semaphore:
+            yield fs
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        with self.__lock:
+            if self.closed:
+                return
+            self.closed = True
+            for fs in self.__handles.values():
+                if self.on_close is not None:
+                    self.on_close(fs)
+                fs.close()
+            self.__handles.clear()
+            self.__semaphores.clear()
+            self.__key_locks.clear()
+
+
+_DEFAULT_POOL = FSPool()
+_DEFAULT_POOL_LOCK = threading.Lock()
+
+
+def get_default_pool():
+    """
+    Get the pool used by the module-level functions in :mod:`pydoop.hdfs`.
+    """
+    return _DEFAULT_POOL
+
+
+def set_default_pool(pool):
+    """
+    Replace the pool used by the module-level functions in
+    :mod:`pydoop.hdfs`, returning the previous one.
+
+    The old pool is **not** closed.
+    """
+    global _DEFAULT_POOL
+    with _DEFAULT_POOL_LOCK:
+        old, _DEFAULT_POOL = _DEFAULT_POOL, pool
+    return old
@@ -38,13 +38,12 @@ from pydoop.app.submit import AVRO_IO_CHOICES
 
 from .pipes import TaskContext, StreamRunner
 from .api import RecordReader, PydoopError
-from .streams import UpStreamAdapter
+from .streams import UpStreamAdapter, DownStreamAdapter
 from .binary_streams import (
     BinaryWriter, BinaryDownStreamAdapter, BinaryUpStreamDecoder
 )
 from .string_utils import create_digest
 from .connections import BUF_SIZE
-from collections import defaultdict
 from pydoop.config import (
     AVRO_INPUT, AVRO_KEY_INPUT_SCHEMA, AVRO_VALUE_INPUT_SCHEMA,
     AVRO_OUTPUT, AVRO_KEY_OUTPUT_SCHEMA, AVRO_VALUE_OUTPUT_SCHEMA,
@@ -62,17 +61,10 @@ DEFAULT_SLEEP_DELTA = 3
 import json
 
 try:
-    from avro.datafile import DataFileReader, DataFileWriter, SCHEMA_KEY
-    from avro.io import DatumReader, DatumWriter
+    from avro.datafile import DataFileWriter, SCHEMA_KEY
+    from avro.io import DatumReader
     import pydoop.avrolib as avrolib
 
-    def get_avro_reader(fp):
-        try:
-            from pyavroc import AvroFileReader
-            return AvroFileReader(fp, False)
-        except ImportError:
-            return DataFileReader(fp, DatumReader())
-
     AVRO_INSTALLED = True
 except ImportError:
     AVRO_INSTALLED = False
@@ -174,7 +166,9 @@ class AvroRecordWriter(TrivialRecordWriter):
             }
             schema = avrolib.parse(json.dumps(schema))
 
-        self.writer = DataFileWriter(self.stream, DatumWriter(), schema)
+        self.writer = DataFileWriter(
+            self.stream, avrolib.CompiledDatumWriter(), schema
+        )
 
     def send(self, cmd, *vals):
         if cmd == self.DONE:
@@ -201,6 +195,36 @@ class AvroRecordWriter(TrivialRecordWriter):
         self.stream.close()
 
 
+class DirectDownStreamAdapter(DownStreamAdapter):
+    """
+    Down stream that feeds ``(cmd, args)`` tuples from ``commands`` to
+    the task as they are generated, without going through their binary
+    encoding. Arguments are converted to the types yielded by
+    :class:`~.binary_streams.BinaryDownStreamAdapter`.
+    """
+    def __init__(self, commands):
+        super(DirectDownStreamAdapter, self).__init__(iter(commands))
+
+    def next(self):
+        cmd, args = next(self.stream)
+        if cmd == self.MAP_ITEM:
+            return cmd, args
+        return cmd, tuple(_to_wire(_) for _ in args)
+
+    def __next__(self):
+        return self.next()
+
+
+def _to_wire(arg):
+    if isinstance(arg, unicode):
+        return arg.encode('utf-8')
+    if isinstance(arg, bool):
+        return int(arg)
+    if isinstance(arg, dict):
+        return dict((_to_wire(k), _to_wire(v)) for k, v in iteritems(arg))
+    return arg
+
+
 class TrivialRecordReader(RecordReader):
 
     def __init__(self, context):
@@ -493,6 +517,77 @@ class HadoopSimulator(object):
         down_stream.send(down_stream.START_MESSAGE, 0)
         down_stream.send(down_stream.SET_JOB_CONF, job_conf)
 
+    def map_down_commands(self, file_in, job_conf, num_reducers,
+                          authorization=None, input_split=''):
+        """
+        Generate the downward (from hadoop to the pipes program) command
+        flow for a map task as ``(cmd, args)`` tuples, reading input
+        records from ``file_in`` as they are needed. See
+        :meth:`write_map_down_stream`.
+        """
+        cmds = BinaryWriter
+        input_key_type = 'org.apache.hadoop.io.LongWritable'
+        input_value_type = 'org.apache.hadoop.io.Text'
+        piped_input = file_in is not None
+        if authorization is not None:
+            yield cmds.AUTHENTICATION_REQ, tuple(authorization)
+        yield cmds.START_MESSAGE, (0,)
+        yield cmds.SET_JOB_CONF, (job_conf,)
+        yield cmds.RUN_MAP, (input_split, num_reducers, piped_input)
+        if piped_input:
+            yield cmds.SET_INPUT_TYPES, (input_key_type, input_value_type)
+            if self.avro_input:
+                items = self.avro_map_items(file_in, job_conf)
+            else:
+                items = self.text_map_items(file_in)
+            MAP_ITEM = cmds.MAP_ITEM
+            for kv in items:
+                yield MAP_ITEM, kv
+        yield cmds.CLOSE, ()
+
+    def text_map_items(self, file_in):
+        """
+        Generate map input items from the lines of ``file_in``, keyed
+        by their offset, as Hadoop's ``TextInputFormat`` does.
+        """
+        pos = 0
+        for line in file_in:
+            self.logger.debug("Line: %s", line)
+            yield _to_wire(serialize_long_to_string(pos)), _to_wire(line)
+            pos += len(line)
+
+    def avro_map_items(self, file_in, job_conf):
+        """
+        Generate map input items from the Avro container file
+        ``file_in``. As in Hadoop, records are passed on in their binary
+        form: datums are split out of each (decompressed) data block
+        without being decoded.
+        """
+        reader = avrolib.SeekableDataFileReader(file_in, DatumReader())
+        if self.avro_input == 'KV':
+            # each datum is an AvroKeyValue record: the key's encoding,
+            # followed by the value's
+            key_codec = avrolib.get_codec(job_conf[AVRO_KEY_INPUT_SCHEMA])
+            value_codec = avrolib.get_codec(
+                job_conf[AVRO_VALUE_INPUT_SCHEMA]
+            )
+            skip_key, skip_value = key_codec.skip_at, value_codec.skip_at
+            for _, count, data in reader.iter_blocks():
+                buf, pos = bytearray(data), 0
+                for _ in range(count):
+                    mid = skip_key(buf, pos)
+                    end = skip_value(buf, mid)
+                    yield data[pos:mid], data[mid:end]
+                    pos = end
+            return
+        schema_key = (AVRO_KEY_INPUT_SCHEMA if self.avro_input == 'K'
+                      else AVRO_VALUE_INPUT_SCHEMA)
+        split = avrolib.get_codec(job_conf[schema_key]).split
+        is_key = self.avro_input == 'K'
+        for _, count, data in reader.iter_blocks():
+            for datum in split(data, count):
+                yield (datum, b'') if is_key else (b'', datum)
+
     def write_map_down_stream(self, file_in, job_conf, num_reducers,
                               authorization=None, input_split=''):
         """
@@ -503,51 +598,15 @@ class HadoopSimulator(object):
         Otherwise, it assumes that the pipes program will use the
         `input_split` variable and take care of record reading by itself.
         """
-        input_key_type = 'org.apache.hadoop.io.LongWritable'
-        input_value_type = 'org.apache.hadoop.io.Text'
-        piped_input = file_in is not None
         self.tempf = tempfile.NamedTemporaryFile('rb+', prefix='pydoop-tmp')
         f = self.tempf.file
         self.logger.debug('writing map input data to %s', self.tempf.name)
         down_stream = BinaryWriter(f)
-        self.write_header_down_stream(down_stream, authorization, job_conf)
-        down_stream.send(down_stream.RUN_MAP,
-                         input_split, num_reducers, piped_input)
-        if piped_input:
-            down_stream.send(down_stream.SET_INPUT_TYPES,
-                             input_key_type, input_value_type)
-            if self.avro_input:
-                serializers = defaultdict(lambda: lambda r: '')
-                reader = get_avro_reader(file_in)
-                if self.avro_input == 'K' or self.avro_input == 'KV':
-                    serializer = avrolib.AvroSerializer(
-                        job_conf.get(AVRO_KEY_INPUT_SCHEMA)
-                    )
-                    serializers['K'] = serializer.serialize
-                if self.avro_input == 'V' or self.avro_input == 'KV':
-                    serializer = avrolib.AvroSerializer(
-                        job_conf.get(AVRO_VALUE_INPUT_SCHEMA)
-                    )
-                    serializers['V'] = serializer.serialize
-                for record in reader:
-                    if self.avro_input == 'KV':
-                        record_k = record['key']
-                        record_v = record['value']
-                    else:
-                        record_v = record_k = record
-                    down_stream.send(
-                        down_stream.MAP_ITEM,
-                        serializers['K'](record_k),
-                        serializers['V'](record_v),
-                    )
-            else:
-                pos = 0
-                for l in file_in:
-                    self.logger.debug("Line: %s", l)
-                    k = serialize_long_to_string(pos)
-                    down_stream.send(down_stream.MAP_ITEM, k, l)
-                    pos += len(l)
-        down_stream.send(down_stream.CLOSE)
+        for cmd, args in self.map_down_commands(
+                file_in, job_conf, num_reducers,
+                authorization=authorization, input_split=input_split
+        ):
+            down_stream.send(cmd, *args)
         down_stream.flush()
         self.logger.debug('done writing, rewinding')
         f.seek(0)
@@ -581,25 +640,25 @@ class HadoopSimulator(object):
         jc = dict(job_conf)
         if self.avro_input:
             jc[AVRO_INPUT] = self.avro_input
-            reader = DataFileReader(file_in, DatumReader())
+            reader = avrolib.SeekableDataFileReader(file_in, DatumReader())
             if sys.version_info[0] == 3:
                 schema = reader.GetMeta(SCHEMA_KEY)
             else:
                 schema = reader.get_meta(SCHEMA_KEY)
+            if isinstance(schema, bytes):
+                schema = schema.decode('utf-8')
             file_in.seek(0)
             if self.avro_input == 'V':
                 jc[AVRO_VALUE_INPUT_SCHEMA] = schema
             elif self.avro_input == 'K':
                 jc[AVRO_KEY_INPUT_SCHEMA] = schema
             else:
-                schema_obj = json.loads(schema)
-                for field in schema_obj['fields']:
-                    if field['name'] == 'key':
-                        key_schema = field['type']
-                    else:
-                        value_schema = field['type']
-                jc[AVRO_KEY_INPUT_SCHEMA] = json.dumps(key_schema)
-                jc[AVRO_VALUE_INPUT_SCHEMA] = json.dumps(value_schema)
+                fields = dict(
+                    (f.name, str(f.type))
+                    for f in avrolib.get_codec(schema).schema.fields
+                )
+                jc[AVRO_KEY_INPUT_SCHEMA] = fields['key']
+                jc[AVRO_VALUE_INPUT_SCHEMA] = fields['value']
         return jc
 
     def _get_jc_for_avro_output(self, job_conf):
@@ -674,10 +733,9 @@ class HadoopSimulatorLocal(HadoopSimulator):
         ``job_conf``.
         """
         jc_avro_input = self._get_jc_for_avro_input(file_in, job_conf)
-        bytes_flow = self.write_map_down_stream(
+        dstream = DirectDownStreamAdapter(self.map_down_commands(
             file_in, jc_avro_input, num_reducers, input_split=input_split
-        )
-        dstream = BinaryDownStreamAdapter(bytes_flow)
+        ))
         # FIXME this is a quick hack to avoid crashes with user defined
         # RecordWriter
         f = StringIO() if file_out is None else file_out
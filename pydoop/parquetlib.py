@@ -0,0 +1,228 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+"""
+Parquet tools, based on `pyarrow <https://arrow.apache.org/docs/python>`_.
+
+:class:`ParquetReader` and :class:`ParquetWriter` allow Python record
+readers and writers to work with Parquet files directly, i.e., without
+going through the Java Avro-Parquet input and output formats:
+
+.. code-block:: python
+
+  class Reader(ParquetReader):
+      columns = ["name", "score"]
+
+  class Mapper(api.Mapper):
+      def map(self, ctx):
+          batch = ctx.value  # a pyarrow.RecordBatch
+          ...
+"""
+# DEV NOTE: since pyarrow is not a requirement, do *not* import this
+# module anywhere in the main code.
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pydoop.mapreduce.api import RecordReader, RecordWriter
+import pydoop.hdfs as hdfs
+
+DEFAULT_BATCH_SIZE = 65536
+DEFAULT_ROW_GROUP_SIZE = 1 << 20
+DEFAULT_COMPRESSION = "snappy"
+
+# job conf key used by parquet-mr's own output format
+COMPRESSION_KEY = "parquet.compression"
+
+
+def row_group_range(metadata, i):
+    """
+    Get the start offset and the (compressed) size, in bytes, of row
+    group ``i`` in the file described by ``metadata`` (a
+    :class:`pyarrow.parquet.FileMetaData` instance).
+    """
+    rg = metadata.row_group(i)
+    start, size = None, 0
+    for j in range(rg.num_columns):
+        col = rg.column(j)
+        offset = col.data_page_offset
+        if col.has_dictionary_page and col.dictionary_page_offset:
+            offset = min(offset, col.dictionary_page_offset)
+        start = offset if start is None else min(start, offset)
+        size += col.total_compressed_size
+    return start or 0, size
+
+
+def split_row_groups(metadata, offset, length):
+    """
+    Get the indices of the row groups that belong to the input split
+    that starts at ``offset`` and is ``length`` bytes long.
+
+    As in parquet-mr, each row group is assigned to the split that
+    contains its midpoint, so that every row group is read exactly once
+    regardless of how the file is split.
+    """
+    end = offset + length
+    selected = []
+    for i in range(metadata.num_row_groups):
+        start, size = row_group_range(metadata, i)
+        if offset <= start + size // 2 < end:
+            selected.append(i)
+    return selected
+
+
+class ParquetReader(RecordReader):
+    """
+    Parquet file reader.
+
+    Reads the row groups that belong to the given input split (see
+    :func:`split_row_groups`), yielding ``(row, batch)`` pairs, where
+    ``batch`` is a :class:`pyarrow.RecordBatch` of up to ``batch_size``
+    rows and ``row`` is the index, in the file, of its first row. Use,
+    e.g., ``batch.column(i).to_numpy()`` or ``batch.to_pydict()`` to
+    access the data.
+
+    If the ``columns`` class attribute is set to a list of column
+    names, only those columns are read from the file.
+    """
+    columns = None
+    batch_size = DEFAULT_BATCH_SIZE
+
+    def __init__(self, ctx):
+        super(ParquetReader, self).__init__(ctx)
+        isplit = ctx.input_split
+        self.file = hdfs.open(isplit.filename)
+        self.parquet_file = pq.ParquetFile(self.file)
+        md = self.parquet_file.metadata
+        self.row_groups = split_row_groups(md, isplit.offset, isplit.length)
+        self.n_rows = sum(md.row_group(_).num_rows for _ in self.row_groups)
+        self.row = sum(md.row_group(_).num_rows for _ in range(
+            self.row_groups[0] if self.row_groups else 0
+        ))
+        self.rows_read = 0
+        self.__batches = self.__iter_batches()
+
+    def __iter_batches(self):
+        # one row group at a time, to bound memory usage
+        for i in self.row_groups:
+            table = self.parquet_file.read_row_group(i, columns=self.columns)
+            for batch in table.to_batches(self.batch_size):
+                yield batch
+
+    def next(self):
+        batch = next(self.__batches)
+        row = self.row
+        self.row += batch.num_rows
+        self.rows_read += batch.num_rows
+        return row, batch
+
+    def get_progress(self):
+        """
+        Fraction of the split's rows read so far.
+        """
+        if not self.n_rows:
+            return 1.0
+        return min(self.rows_read / float(self.n_rows), 1.0)
+
+    def close(self):
+        self.file.close()
+        self.file.fs.close()
+
+
+class ParquetWriter(RecordWriter):
+    """
+    Parquet file writer that writes to the task's default work file
+    (see :meth:`~.pipes.TaskContext.get_default_work_file`), with a
+    ``.parquet`` extension.
+
+    The ``schema`` class attribute must be set to a
+    :class:`pyarrow.Schema`. Emitted values must be dictionaries that
+    map column names to values (keys are ignored): they are buffered,
+    column by column, and written out as a row group every
+    ``row_group_size`` rows. Subclasses can also write whole batches of
+    rows with :meth:`write_batch`.
+
+    The ``compression`` class attribute can be overridden through the
+    ``parquet.compression`` job conf property, as for parquet-mr's own
+    output format.
+    """
+    schema = None
+    compression = DEFAULT_COMPRESSION
+    row_group_size = DEFAULT_ROW_GROUP_SIZE
+
+    def __init__(self, context):
+        super(ParquetWriter, self).__init__(context)
+        if self.schema is None:
+            raise RuntimeError("ParquetWriter schema not set")
+        jc = context.job_conf
+        compression = jc.get(COMPRESSION_KEY, self.compression)
+        if compression.lower() == "uncompressed":
+            compression = "none"
+        self.file = hdfs.open(
+            context.get_default_work_file(".parquet"), "w",
+            user=jc.get("pydoop.hdfs.user"), write_behind=True
+        )
+        self.writer = pq.ParquetWriter(
+            self.file, self.schema, compression=compression.lower()
+        )
+        self.names = self.schema.names
+        self.__reset()
+
+    def __reset(self):
+        self.__columns = [[] for _ in self.names]
+        self.__appends = [_.append for _ in self.__columns]
+        self.__n = 0
+
+    def emit(self, key, value):
+        for append, name in zip(self.__appends, self.names):
+            append(value.get(name))
+        self.__n += 1
+        if self.__n >= self.row_group_size:
+            self.flush()
+
+    def write_batch(self, batch):
+        """
+        Write a :class:`pyarrow.RecordBatch` or :class:`pyarrow.Table`
+        with the writer's schema, after any buffered rows.
+        """
+        self.flush()
+        if isinstance(batch, pa.RecordBatch):
+            batch = pa.Table.from_batches([batch])
+        self.writer.write_table(batch, row_group_size=self.row_group_size)
+
+    def flush(self):
+        """
+        Write out buffered rows as a row group.
+        """
+        if not self.__n:
+            return
+        arrays = [
+            pa.array(col, type=field.type)
+            for col, field in zip(self.__columns, self.schema)
+        ]
+        self.__reset()
+        self.writer.write_table(
+            pa.Table.from_arrays(arrays, schema=self.schema)
+        )
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        self.file.close()
+        # only releases the reference acquired by hdfs.open
+        self.file.fs.close()
@@ -61,6 +61,7 @@ os.environ['OPT'] = ' '.join(
 )
 
 from setuptools import setup, find_packages, Extension
+from setuptools.command.build_py import build_py
 from distutils.command.build import build
 from distutils.command.build_ext import build_ext
 from distutils.command.clean import clean
@@ -89,6 +90,9 @@ if sys.version_info[0] == 3:
 else:
     CONSOLE_SCRIPTS.append('pydoop2 = pydoop.app.main:main')
 
+# (package, module) pairs that use Python 3 only syntax
+PY3_MODULES = frozenset([("pydoop.hdfs", "aio")])
+
 
 # ---------
 # UTILITIES
@@ -304,6 +308,17 @@ class BuildPydoopExt(build_ext):
         build_ext.build_extension(self, ext)
 
 
+class BuildPy(build_py):
+
+    # keep Python 3 only modules out of Python 2 builds, where they
+    # would fail to byte-compile
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info[0] == 3:
+            return modules
+        return [_ for _ in modules if _[:2] not in PY3_MODULES]
+
+
 class BuildPydoop(build):
 
     def build_java(self):
@@ -384,11 +399,13 @@ setup(
             'avro>=1.7.4;python_version<"3"',
             'avro-python3>=1.7.4;python_version>="3"',
         ],
+        'parquet': ['pyarrow>=0.15'],
     },
     packages=find_packages(exclude=['test', 'test.*']),
     package_data={"pydoop": [PROP_FN]},
     cmdclass={
         "build": BuildPydoop,
+        "build_py": BuildPy,
         "build_ext": BuildPydoopExt,
         "clean": Clean
     },
@@ -51,6 +51,10 @@ public class PydoopAvroBridgeKeyReader
     return Arrays.asList(key);
   }
 
+  protected List<String> getProjectionProperties() {
+    return Arrays.asList("AVRO_KEY_INPUT_PROJECTION");
+  }
+
   public void initialize(InputSplit split, TaskAttemptContext context)
       throws IOException, InterruptedException {
     super.initialize(split, context);
@@ -52,6 +52,11 @@ public class PydoopAvroBridgeKeyValueReader
     return Arrays.asList(key, value);
   }
 
+  protected List<String> getProjectionProperties() {
+    return Arrays.asList("AVRO_KEY_INPUT_PROJECTION",
+        "AVRO_VALUE_INPUT_PROJECTION");
+  }
+
   public void initialize(InputSplit split, TaskAttemptContext context)
       throws IOException, InterruptedException {
     super.initialize(split, context);
@@ -20,7 +20,11 @@ package it.crs4.pydoop.mapreduce.pipes;
 
 import java.util.List;
 import java.util.ArrayList;
+import java.util.Collection;
+import java.util.HashMap;
 import java.util.Iterator;
+import java.util.Map;
+import java.util.Properties;
 
 import java.io.IOException;
 import java.io.ByteArrayOutputStream;
@@ -30,9 +34,11 @@ import org.apache.hadoop.mapreduce.InputSplit;
 import org.apache.hadoop.mapreduce.TaskAttemptContext;
 import org.apache.hadoop.mapreduce.Counter;
 import org.apache.hadoop.io.Text;
+import org.apache.hadoop.conf.Configuration;
 
 import org.apache.avro.Schema;
 import org.apache.avro.generic.IndexedRecord;
+import org.apache.avro.generic.GenericData;
 import org.apache.avro.generic.GenericDatumWriter;
 import org.apache.avro.io.DatumWriter;
 import org.apache.avro.io.EncoderFactory;
@@ -47,6 +53,7 @@ public abstract class PydoopAvroBridgeReaderBase<K, V>
 
   protected RecordReader actualReader;
   protected List<Schema> schemas;
+  protected List<Schema> projections;
   protected List<Text> outRecords;
   protected List<DatumWriter<IndexedRecord>> datumWriters;
   protected List<BinaryEncoder> encoders;
@@ -71,6 +78,80 @@ public abstract class PydoopAvroBridgeReaderBase<K, V>
   protected abstract List<IndexedRecord> getInRecords()
       throws IOException, InterruptedException;
 
+  /**
+   * Get the names (as keys in the pydoop properties) of the job conf
+   * properties that hold the projection schemas for the records returned
+   * by getInRecords.
+   */
+  protected abstract List<String> getProjectionProperties();
+
+  /**
+   * Get the projection schema stored in the given job conf property
+   * (specified as a key in the pydoop properties), or null if not set.
+   */
+  protected static Schema getProjection(Configuration conf, String propName) {
+    Properties props = Submitter.getPydoopProperties();
+    String schemaJSON = conf.get(props.getProperty(propName));
+    return (null == schemaJSON) ? null : Schema.parse(schemaJSON);
+  }
+
+  /**
+   * Copy the fields of record that appear in projection (recursively,
+   * for nested records) to a new record with the projection schema.
+   */
+  protected static IndexedRecord project(
+      IndexedRecord record, Schema projection) {
+    Schema schema = record.getSchema();
+    if (schema == projection) {
+      return record;
+    }
+    GenericData.Record projected = new GenericData.Record(projection);
+    for (Schema.Field f: projection.getFields()) {
+      Schema.Field inField = schema.getField(f.name());
+      if (null == inField) {
+        throw new IllegalArgumentException(
+            "projected field not found: " + f.name());
+      }
+      projected.put(f.pos(), projectValue(record.get(inField.pos()),
+                                          f.schema()));
+    }
+    return projected;
+  }
+
+  private static Object projectValue(Object value, Schema projection) {
+    switch (projection.getType()) {
+    case RECORD:
+      return project((IndexedRecord) value, projection);
+    case ARRAY:
+      List<Object> items = new ArrayList<Object>();
+      for (Object item: (Collection<?>) value) {
+        items.add(projectValue(item, projection.getElementType()));
+      }
+      return items;
+    case MAP:
+      Map<Object, Object> entries = new HashMap<Object, Object>();
+      for (Map.Entry<?, ?> e: ((Map<?, ?>) value).entrySet()) {
+        entries.put(e.getKey(),
+                    projectValue(e.getValue(), projection.getValueType()));
+      }
+      return entries;
+    case UNION:
+      // records are matched to union branches by name
+      if (value instanceof IndexedRecord) {
+        String name = ((IndexedRecord) value).getSchema().getFullName();
+        for (Schema s: projection.getTypes()) {
+          if (s.getType() == Schema.Type.RECORD &&
+              s.getFullName().equals(name)) {
+            return project((IndexedRecord) value, s);
+          }
+        }
+      }
+      return value;
+    default:
+      return value;
+    }
+  }
+
   public void initialize(InputSplit split, TaskAttemptContext context)
       throws IOException, InterruptedException {
     actualReader.initialize(split, context);
@@ -85,13 +166,20 @@ public abstract class PydoopAvroBridgeReaderBase<K, V>
     if (hasRecord) {
       readTimeCounter.increment((System.nanoTime() - start) / 1000000);
       bufferedInRecords = getInRecords();
+      Configuration conf = context.getConfiguration();
+      Iterator<String> iterProps = getProjectionProperties().iterator();
       schemas = new ArrayList<Schema>();
+      projections = new ArrayList<Schema>();
       datumWriters = new ArrayList<DatumWriter<IndexedRecord>>();
       outStreams = new ArrayList<ByteArrayOutputStream>();
       encoders = new ArrayList<BinaryEncoder>();
       outRecords = new ArrayList<Text>();
       for (IndexedRecord r: bufferedInRecords) {
-        Schema s = r.getSchema();
+        // if a projection is set, only send the corresponding fields
+        Schema p = iterProps.hasNext() ?
+            getProjection(conf, iterProps.next()) : null;
+        projections.add(p);
+        Schema s = (null == p) ? r.getSchema() : p;
         schemas.add(s);
         datumWriters.add(new GenericDatumWriter<IndexedRecord>(s));
         ByteArrayOutputStream stream = new ByteArrayOutputStream();
@@ -122,6 +210,7 @@ public abstract class PydoopAvroBridgeReaderBase<K, V>
     }
     //--
     Iterator<IndexedRecord> iterRecords = records.iterator();
+    Iterator<Schema> iterProjections = projections.iterator();
     Iterator<DatumWriter<IndexedRecord>> iterWriters = datumWriters.iterator();
     Iterator<BinaryEncoder> iterEncoders = encoders.iterator();
     Iterator<ByteArrayOutputStream> iterStreams = outStreams.iterator();
@@ -130,8 +219,13 @@ public abstract class PydoopAvroBridgeReaderBase<K, V>
     while (iterRecords.hasNext()) {
       ByteArrayOutputStream stream = iterStreams.next();
       BinaryEncoder enc = iterEncoders.next();
+      IndexedRecord record = iterRecords.next();
+      Schema p = iterProjections.next();
+      if (null != p) {
+        record = project(record, p);
+      }
       try {
-        iterWriters.next().write(iterRecords.next(), enc);
+        iterWriters.next().write(record, enc);
         enc.flush();
       } catch (IOException e) {
         throw new RuntimeException(e);
@@ -51,6 +51,10 @@ public class PydoopAvroBridgeValueReader
     return Arrays.asList(value);
   }
 
+  protected List<String> getProjectionProperties() {
+    return Arrays.asList("AVRO_VALUE_INPUT_PROJECTION");
+  }
+
   public void initialize(InputSplit split, TaskAttemptContext context)
       throws IOException, InterruptedException {
     super.initialize(split, context);
@@ -20,6 +20,7 @@ package it.crs4.pydoop.mapreduce.pipes;
 
 import java.io.IOException;
 
+import org.apache.avro.Schema;
 import org.apache.avro.generic.GenericRecord;
 
 import org.apache.hadoop.io.NullWritable;
@@ -36,8 +37,11 @@ public class PydoopAvroKeyInputFormat
   public RecordReader<GenericRecord, NullWritable> createRecordReader(
       InputSplit split, TaskAttemptContext context)
       throws IOException, InterruptedException {
-    // null readerSchema: the reader will fall back to the writer schema
-    // FIXME: we could add our own property for setting the reader schema
-    return new PydoopAvroKeyRecordReader(null);
+    // the projection, if any, is used as the reader schema, so that Avro
+    // skips the other fields. If it's null, the reader will fall back to
+    // the writer schema
+    Schema readerSchema = PydoopAvroBridgeReaderBase.getProjection(
+        context.getConfiguration(), "AVRO_KEY_INPUT_PROJECTION");
+    return new PydoopAvroKeyRecordReader(readerSchema);
   }
 }
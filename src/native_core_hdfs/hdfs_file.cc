@@ -469,3 +469,41 @@ PyObject* FileClass_flush(FileInfo *self){
         return NULL;
     }
 }
+
+
+PyObject* FileClass_hflush(FileInfo *self){
+    if (!hdfsFileIsOpenForWrite(self->file)) {
+      Py_RETURN_NONE;
+    }
+    int result;
+    Py_BEGIN_ALLOW_THREADS;
+    result = hdfsHFlush(self->fs, self->file);
+    Py_END_ALLOW_THREADS;
+
+    if (result >= 0) {
+        Py_RETURN_NONE;
+    }
+    else {
+        PyErr_SetFromErrno(PyExc_IOError);
+        return NULL;
+    }
+}
+
+
+PyObject* FileClass_hsync(FileInfo *self){
+    if (!hdfsFileIsOpenForWrite(self->file)) {
+      Py_RETURN_NONE;
+    }
+    int result;
+    Py_BEGIN_ALLOW_THREADS;
+    result = hdfsHSync(self->fs, self->file);
+    Py_END_ALLOW_THREADS;
+
+    if (result >= 0) {
+        Py_RETURN_NONE;
+    }
+    else {
+        PyErr_SetFromErrno(PyExc_IOError);
+        return NULL;
+    }
+}
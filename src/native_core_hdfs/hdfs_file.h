@@ -95,4 +95,8 @@ PyObject* FileClass_tell(FileInfo *self, PyObject *args, PyObject *kwds);
 
 PyObject* FileClass_flush(FileInfo *self);
 
+PyObject* FileClass_hflush(FileInfo *self);
+
+PyObject* FileClass_hsync(FileInfo *self);
+
 #endif
@@ -486,6 +486,54 @@ PyObject *FsClass_create_directory(FsInfo *self, PyObject *args, PyObject *kwds)
     Py_RETURN_NONE;
 }
 
+static const char* const PATH_INFO_KEYS[N_PATH_INFO_FIELDS] = {
+    "name",
+    "kind",
+    "group",
+    "last_mod",
+    "last_access",
+    "replication",
+    "owner",
+    "permissions",
+    "block_size",
+    "path",
+    "size"
+};
+
+/*
+ * Get the value of field number `field` (see PATH_INFO_KEYS).
+ *
+ * \return a new reference, or NULL if there was a problem.
+ */
+static PyObject* getPathInfoField(hdfsFileInfo* fileInfo, int field) {
+    switch (field) {
+    case 0:
+    case 9:
+        return PyUnicode_FromString(fileInfo->mName);
+    case 1:
+        return PyUnicode_FromString(
+            fileInfo->mKind == kObjectKindDirectory ? "directory" : "file");
+    case 2:
+        return PyUnicode_FromString(fileInfo->mGroup);
+    case 3:
+        return PyLong_FromLong(fileInfo->mLastMod);
+    case 4:
+        return PyLong_FromLong(fileInfo->mLastAccess);
+    case 5:
+        return PyLong_FromSize_t(fileInfo->mReplication);
+    case 6:
+        return PyUnicode_FromString(fileInfo->mOwner);
+    case 7:
+        return PyLong_FromSize_t(fileInfo->mPermissions);
+    case 8:
+        return PyLong_FromLong(fileInfo->mBlockSize);
+    case 10:
+        return PyLong_FromLongLong(fileInfo->mSize);
+    }
+    PyErr_SetString(PyExc_IndexError, "path info field out of range");
+    return NULL;
+}
+
 /*
  * Works on borrowed reference `dict`.
  *
@@ -496,54 +544,16 @@ PyObject *FsClass_create_directory(FsInfo *self, PyObject *args, PyObject *kwds)
 static int setPathInfo(PyObject* dict, hdfsFileInfo* fileInfo) {
 
     if (dict == NULL || fileInfo == NULL) return -1;
-    int error_code = 0;
-
-    const char*const keys[] = {
-        "name",
-        "kind",
-        "group",
-        "last_mod",
-        "last_access",
-        "replication",
-        "owner",
-        "permissions",
-        "block_size",
-        "path",
-        "size"
-    };
-
-    const int n_fields = sizeof(keys) / sizeof(keys[0]);
-
-    PyObject* values[n_fields];
-    int i = 0;
-    // Prepare the values.  We'll check for all errors in the "set" loop below
-    // The order of these values MUST match the order of the keys above
-    values[i++] = PyUnicode_FromString(fileInfo->mName);
-    values[i++] = PyUnicode_FromString(fileInfo->mKind == kObjectKindDirectory ? "directory" : "file");
-    values[i++] = PyUnicode_FromString(fileInfo->mGroup);
-    values[i++] = PyLong_FromLong(fileInfo->mLastMod);
-    values[i++] = PyLong_FromLong(fileInfo->mLastAccess);
-    values[i++] = PyLong_FromSize_t(fileInfo->mReplication);
-    values[i++] = PyUnicode_FromString(fileInfo->mOwner);
-    values[i++] = PyLong_FromSize_t(fileInfo->mPermissions);
-    values[i++] = PyLong_FromLong(fileInfo->mBlockSize);
-    values[i++] = PyUnicode_FromString(fileInfo->mName);
-    values[i++] = PyLong_FromLongLong(fileInfo->mSize);
-
-    for (i = 0; i < n_fields; ++i) {
-        if (values[i] == NULL || PyDict_SetItemString(dict, keys[i], values[i]) < 0) {
-            error_code = -1;
-            break;
-            // Don't DECREF here.  The error handling code goes through the entire array
-            // and thus we'd end up DECREFing some objects twice.
-        }
-    }
 
-    for (i = 0; i < n_fields; ++i) {
-        Py_XDECREF(values[i]); // some values may be null (if there was an error
+    for (int i = 0; i < N_PATH_INFO_FIELDS; ++i) {
+        PyObject* value = getPathInfoField(fileInfo, i);
+        int error = (value == NULL ||
+                     PyDict_SetItemString(dict, PATH_INFO_KEYS[i], value) < 0);
+        Py_XDECREF(value);
+        if (error) return -1;
     }
 
-    return error_code;
+    return 0;
 }
 
 PyObject *FsClass_list_directory(FsInfo *self, PyObject *args, PyObject *kwds) {
@@ -625,6 +635,182 @@ done:
     return retval;
 }
 
+/*
+ * Set self->fields from a sequence of field names (all fields if `fields`
+ * is NULL or None).
+ *
+ * \return 0 if successful, -1 (with an exception set) otherwise.
+ */
+static int setIterFields(DirIterInfo* self, PyObject* fields) {
+
+    if (fields == NULL || fields == Py_None) {
+        self->n_fields = N_PATH_INFO_FIELDS;
+        for (int i = 0; i < N_PATH_INFO_FIELDS; ++i) {
+            self->fields[i] = i;
+        }
+        return 0;
+    }
+
+    PyObject* seq = PySequence_Fast(fields, "fields must be a sequence");
+    if (!seq) return -1;
+    Py_ssize_t n = PySequence_Fast_GET_SIZE(seq);
+    if (n > N_PATH_INFO_FIELDS) {
+        Py_DECREF(seq);
+        PyErr_SetString(PyExc_ValueError, "too many fields");
+        return -1;
+    }
+    for (Py_ssize_t i = 0; i < n; ++i) {
+        PyObject* item = PySequence_Fast_GET_ITEM(seq, i);  // borrowed
+        int field = -1;
+        for (int j = 0; j < N_PATH_INFO_FIELDS; ++j) {
+            PyObject* key = PyUnicode_FromString(PATH_INFO_KEYS[j]);
+            if (!key) {
+                Py_DECREF(seq);
+                return -1;
+            }
+            int cmp = PyObject_RichCompareBool(item, key, Py_EQ);
+            Py_DECREF(key);
+            if (cmp < 0) {
+                Py_DECREF(seq);
+                return -1;
+            }
+            if (cmp) {
+                field = j;
+                break;
+            }
+        }
+        if (field < 0) {
+            PyErr_Format(PyExc_ValueError, "unknown path info field: %R",
+                         item);
+            Py_DECREF(seq);
+            return -1;
+        }
+        self->fields[i] = field;
+    }
+    self->n_fields = (int) n;
+    Py_DECREF(seq);
+    return 0;
+}
+
+
+// Not a streaming listing: libhdfs has no paged listing call, so the whole
+// directory is fetched with hdfsListDirectory. The returned iterator owns the
+// native array and converts one entry at a time to a tuple of the requested
+// fields, freeing the array once exhausted.
+PyObject *FsClass_iter_directory(FsInfo *self, PyObject *args, PyObject *kwds) {
+    DirIterInfo* retval = NULL;
+    char* path = NULL;
+    PyObject* fields = NULL;
+    hdfsFileInfo* pathList = NULL;
+    int numEntries = 0;
+    hdfsFileInfo* pathInfo = NULL;
+
+    if (!PyArg_ParseTuple(args, "es|O", "utf-8", &path, &fields))
+        return NULL;
+
+    if (str_empty(path)) {
+        PyMem_Free(path);
+        PyErr_SetString(PyExc_ValueError, "Empty path");
+        return NULL;
+    }
+
+    retval = PyObject_New(DirIterInfo, &DirIterType);
+    if (!retval) {
+        PyMem_Free(path);
+        return PyErr_NoMemory();
+    }
+    retval->fs = NULL;
+    retval->infos = NULL;
+    retval->n_entries = 0;
+    retval->pos = 0;
+    if (setIterFields(retval, fields) < 0) {
+        PyMem_Free(path);
+        Py_DECREF(retval);
+        return NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+        pathInfo = hdfsGetPathInfo(self->_fs, path);
+        PyMem_Free(path);
+        if (!pathInfo) {
+            Py_BLOCK_THREADS; // later we 'goto' skipping over END_ALLOW_THREADS
+            PyErr_SetFromErrno(PyExc_IOError);
+            goto error;
+        }
+
+        if (pathInfo->mKind == kObjectKindDirectory) {
+
+            pathList = hdfsListDirectory(self->_fs, pathInfo->mName, &numEntries);
+
+            // hdfsListDirectory returns NULL when a directory is empty, so to determine
+            // whether there's been an error we also need to check errno
+            if (!pathList && errno) {
+                Py_BLOCK_THREADS; // later we 'goto' skipping over END_ALLOW_THREADS
+                PyErr_SetFromErrno(PyExc_IOError);
+                goto error;
+            }
+        }
+        else {
+            numEntries = 1;
+            pathList = pathInfo;
+            pathInfo = NULL;
+        }
+    Py_END_ALLOW_THREADS;
+
+    // entries are converted to Python objects only when requested
+    retval->infos = pathList;
+    retval->n_entries = pathList ? numEntries : 0;
+    Py_INCREF(self);
+    retval->fs = self;
+    goto done;
+
+error:
+    Py_XDECREF(retval);
+    retval = NULL;
+
+done:
+    if (pathInfo != NULL)
+        hdfsFreeFileInfo(pathInfo, 1);
+
+    return (PyObject*) retval;
+}
+
+
+void DirIterClass_dealloc(DirIterInfo* self)
+{
+    if (self->infos != NULL)
+        hdfsFreeFileInfo(self->infos, self->n_entries);
+    Py_XDECREF(self->fs);
+    PyObject_Del(self);
+}
+
+
+PyObject* DirIterClass_next(DirIterInfo* self)
+{
+    if (self->pos >= self->n_entries) {
+        if (self->infos != NULL) {  // release memory as soon as possible
+            hdfsFreeFileInfo(self->infos, self->n_entries);
+            self->infos = NULL;
+            self->n_entries = 0;
+            self->pos = 0;
+        }
+        return NULL;  // StopIteration
+    }
+    hdfsFileInfo* info = &self->infos[self->pos++];
+    PyObject* retval = PyTuple_New(self->n_fields);
+    if (!retval) return NULL;
+    for (int i = 0; i < self->n_fields; ++i) {
+        PyObject* value = getPathInfoField(info, self->fields[i]);
+        if (!value) {
+            Py_DECREF(retval);
+            return NULL;
+        }
+        PyTuple_SET_ITEM(retval, i, value);  // steals the reference
+    }
+    return retval;
+}
+
+
 PyObject *FsClass_move(FsInfo *self, PyObject *args, PyObject *kwds) {
 
     FsInfo* to_hdfs = NULL;
@@ -819,3 +1005,31 @@ PyObject *FsClass_utime(FsInfo *self, PyObject *args, PyObject *kwds) {
     }
     Py_RETURN_NONE;
 }
+
+
+PyObject *FsClass_truncate(FsInfo *self, PyObject *args, PyObject *kwds) {
+
+    char* path = NULL;
+    PY_LONG_LONG length = 0;
+    int result = 0;
+
+    if (! PyArg_ParseTuple(args, "esL", "utf-8", &path, &length)) {
+        return NULL;
+    }
+
+    if (str_empty(path)) {
+        PyMem_Free(path);
+        PyErr_SetString(PyExc_ValueError, "Empty path");
+        return NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+        result = hdfsTruncateFile(self->_fs, path, (tOffset) length);
+    Py_END_ALLOW_THREADS;
+    PyMem_Free(path);
+
+    if (result < 0) {
+        return PyErr_SetFromErrno(PyExc_IOError);
+    }
+    return PyBool_FromLong(result);
+}
@@ -39,6 +39,9 @@
 #define MODE_APPEND "a"
 
 
+#define N_PATH_INFO_FIELDS 11
+
+
 typedef struct {
     PyObject_HEAD
     char *host;
@@ -49,6 +52,20 @@ typedef struct {
 } FsInfo;
 
 
+typedef struct {
+    PyObject_HEAD
+    FsInfo *fs;  // keeps the fs object alive while iterating
+    hdfsFileInfo *infos;
+    int n_entries;
+    int pos;
+    int n_fields;
+    int fields[N_PATH_INFO_FIELDS];
+} DirIterInfo;
+
+
+extern PyTypeObject DirIterType;
+
+
 PyObject* FsClass_new(PyTypeObject* type, PyObject *args, PyObject *kwds);
 
 void FsClass_dealloc(FsInfo* self);
@@ -81,6 +98,12 @@ PyObject* FsClass_exists(FsInfo* self, PyObject *args, PyObject *kwds);
 
 PyObject*FsClass_list_directory(FsInfo *self, PyObject *args, PyObject *kwds);
 
+PyObject* FsClass_iter_directory(FsInfo *self, PyObject *args, PyObject *kwds);
+
+void DirIterClass_dealloc(DirIterInfo* self);
+
+PyObject* DirIterClass_next(DirIterInfo* self);
+
 PyObject* FsClass_create_directory(FsInfo* self, PyObject *args, PyObject *kwds);
 
 PyObject* FsClass_rename(FsInfo* self, PyObject *args, PyObject *kwds);
@@ -95,4 +118,6 @@ PyObject* FsClass_chown(FsInfo* self, PyObject *args, PyObject *kwds);
 
 PyObject* FsClass_utime(FsInfo* self, PyObject *args, PyObject *kwds);
 
+PyObject* FsClass_truncate(FsInfo* self, PyObject *args, PyObject *kwds);
+
 #endif
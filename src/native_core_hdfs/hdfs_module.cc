@@ -60,6 +60,9 @@ static PyMethodDef FsClass_methods[] = {
    "Create a directory with the given name"},
   {"list_directory", (PyCFunction) FsClass_list_directory, METH_VARARGS,
    "Get the contents of a directory"},
+  {"iter_directory", (PyCFunction) FsClass_iter_directory, METH_VARARGS,
+   "Iterate over the contents of a directory (listed in full), "
+   "yielding tuples of fields"},
   {"move", (PyCFunction) FsClass_move, METH_VARARGS, "Move the given file"},
   {"rename", (PyCFunction) FsClass_rename, METH_VARARGS,
    "Rename the given file"},
@@ -72,6 +75,8 @@ static PyMethodDef FsClass_methods[] = {
    "Change file owner and group"},
   {"utime", (PyCFunction) FsClass_utime, METH_VARARGS,
    "Change file last access and modification time"},
+  {"truncate", (PyCFunction) FsClass_truncate, METH_VARARGS,
+   "Truncate a file to the given length"},
   {NULL}  /* Sentinel */
 };
 
@@ -117,6 +122,38 @@ static PyTypeObject FsType = {
 };
 
 
+/* DirIterType */
+PyTypeObject DirIterType = {
+  PyVarObject_HEAD_INIT(NULL, 0)
+  "native_core_hdfs.CoreHdfsDirIterator",   /* tp_name */
+  sizeof(DirIterInfo),                      /* tp_basicsize */
+  0,                                        /* tp_itemsize */
+  (destructor) DirIterClass_dealloc,        /* tp_dealloc */
+  0,                                        /* tp_print */
+  0,                                        /* tp_getattr */
+  0,                                        /* tp_setattr */
+  0,                                        /* tp_compare */
+  0,                                        /* tp_repr */
+  0,                                        /* tp_as_number */
+  0,                                        /* tp_as_sequence */
+  0,                                        /* tp_as_mapping */
+  0,                                        /* tp_hash */
+  0,                                        /* tp_call */
+  0,                                        /* tp_str */
+  0,                                        /* tp_getattro */
+  0,                                        /* tp_setattro */
+  0,                                        /* tp_as_buffer */
+  Py_TPFLAGS_DEFAULT,                       /* tp_flags */
+  "Hdfs directory iterators",               /* tp_doc */
+  0,                                        /* tp_traverse */
+  0,                                        /* tp_clear */
+  0,                                        /* tp_richcompare */
+  0,                                        /* tp_weaklistoffset */
+  PyObject_SelfIter,                        /* tp_iter */
+  (iternextfunc) DirIterClass_next,         /* tp_iternext */
+};
+
+
 /* FileType */
 static PyMemberDef FileClass_members[] = {
   {NULL}  /* Sentinel */
@@ -143,6 +180,10 @@ static PyMethodDef FileClass_methods[] = {
   {"write", (PyCFunction)FileClass_write, METH_VARARGS, "Write to the file"},
   {"flush", (PyCFunction) FileClass_flush, METH_NOARGS,
    "Force any buffered output to be written"},
+  {"hflush", (PyCFunction) FileClass_hflush, METH_NOARGS,
+   "Make written data visible to new readers"},
+  {"hsync", (PyCFunction) FileClass_hsync, METH_NOARGS,
+   "Like hflush, but also sync data to disk on the datanodes"},
   {"read", (PyCFunction) FileClass_read, METH_VARARGS, "Read from the file"},
   {"read_chunk", (PyCFunction) FileClass_read_chunk, METH_VARARGS,
    "Like read, but store data to the given buffer"},
@@ -238,14 +279,18 @@ PyInit_native_core_hdfs(void)
     return NULL;
   if (PyType_Ready(&FileType) < 0)
     return NULL;
+  if (PyType_Ready(&DirIterType) < 0)
+    return NULL;
   m = PyModule_Create(&module_def);
   if (m == NULL)
     return NULL;
 
   Py_INCREF(&FsType);
   Py_INCREF(&FileType);
+  Py_INCREF(&DirIterType);
   PyModule_AddObject(m, "CoreHdfsFs", (PyObject *)&FsType);
   PyModule_AddObject(m, "CoreHdfsFile", (PyObject *)&FileType);
+  PyModule_AddObject(m, "CoreHdfsDirIterator", (PyObject *)&DirIterType);
 
   return m;
 }
@@ -261,6 +306,8 @@ initnative_core_hdfs(void)
     return;
   if (PyType_Ready(&FileType) < 0)
     return;
+  if (PyType_Ready(&DirIterType) < 0)
+    return;
   m = Py_InitModule3(module__name__, module_methods,
                      module__doc__);
   if (m == NULL)
@@ -268,8 +315,10 @@ initnative_core_hdfs(void)
 
   Py_INCREF(&FsType);
   Py_INCREF(&FileType);
+  Py_INCREF(&DirIterType);
   PyModule_AddObject(m, "CoreHdfsFs", (PyObject *)&FsType);
   PyModule_AddObject(m, "CoreHdfsFile", (PyObject *)&FileType);
+  PyModule_AddObject(m, "CoreHdfsDirIterator", (PyObject *)&DirIterType);
 
   PyModule_AddStringConstant(m, "MODE_READ", MODE_READ);
   PyModule_AddStringConstant(m, "MODE_WRITE", MODE_WRITE);
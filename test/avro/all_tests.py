@@ -21,6 +21,7 @@ from pydoop.test_utils import get_module
 
 
 TEST_MODULE_NAMES = [
+    'test_codec',
     'test_context',
     'test_io',
 ]
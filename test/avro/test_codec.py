@@ -0,0 +1,414 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+import io
+import json
+import sys
+import unittest
+
+import avro.datafile as avdf
+from avro.io import (
+    DatumReader, BinaryDecoder, SchemaResolutionException, AvroTypeException
+)
+from avro.schema import AvroException
+
+from pydoop.avrolib import (
+    SchemaCodec, CompiledDatumReader, CompiledDatumWriter, get_codec,
+    schema_fingerprint, parse
+)
+
+from common import AvroSerializer
+
+
+SCHEMA = {
+    "type": "record",
+    "name": "Node",
+    "namespace": "pydoop.test",
+    "fields": [
+        {"name": "i", "type": "int"},
+        {"name": "l", "type": "long"},
+        {"name": "f", "type": "float"},
+        {"name": "d", "type": "double"},
+        {"name": "b", "type": "boolean"},
+        {"name": "s", "type": "string"},
+        {"name": "raw", "type": "bytes"},
+        {"name": "nothing", "type": "null"},
+        {"name": "e", "type": {
+            "type": "enum", "name": "E", "symbols": ["A", "B", "C"]
+        }},
+        {"name": "fx", "type": {"type": "fixed", "name": "F", "size": 3}},
+        {"name": "a", "type": {"type": "array", "items": "long"}},
+        {"name": "m", "type": {"type": "map", "values": ["null", "string"]}},
+        {"name": "child", "type": ["null", "int", "string", "Node"]},
+    ]
+}
+
+
+def make_record(i, depth=0):
+    return {
+        "i": (-1) ** i * i * 1000003 % (1 << 31),
+        "l": (-1) ** i * i * (1 << 40),
+        "f": 0.5 * i,
+        "d": i / 3.0,
+        "b": i % 2 == 0,
+        "s": u"récord-%d" % i,
+        "raw": b"\x00\xff" * i,
+        "nothing": None,
+        "e": "ABC"[i % 3],
+        "fx": b"abc",
+        "a": list(range(-i, i)),
+        "m": dict(("k%d" % j, None if j % 2 else "v%d" % j)
+                  for j in range(i % 4)),
+        "child": (
+            make_record(i + 1, depth + 1) if depth < 2 and i % 3 == 0
+            else [None, i, "c-%d" % i][i % 3]
+        ),
+    }
+
+
+class TestSchemaCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.schema_str = json.dumps(SCHEMA)
+        self.schema = parse(self.schema_str)
+        self.records = [make_record(i) for i in range(50)]
+
+    def test_encode(self):
+        codec = SchemaCodec(self.schema_str)
+        serializer = AvroSerializer(self.schema)
+        for r in self.records:
+            self.assertEqual(codec.encode(r), serializer.serialize(r))
+        out = bytearray()
+        for r in self.records:
+            codec.encode_into(out, r)
+        self.assertEqual(
+            bytes(out), b"".join(serializer.serialize(r) for r in self.records)
+        )
+        self.assertEqual(
+            codec.encode_many(self.records),
+            [serializer.serialize(r) for r in self.records]
+        )
+        self.assertEqual(codec.encode_many([]), [])
+        encoded = codec.encode_many(self.records)
+        data = b"".join(encoded)
+        self.assertEqual(codec.split(data), encoded)
+        self.assertEqual(codec.split(data, 2), encoded[:2])
+        buf = bytearray(data)
+        self.assertEqual(codec.skip_at(buf, 0), len(encoded[0]))
+
+    def test_decode(self):
+        codec = SchemaCodec(self.schema_str)
+        serializer = AvroSerializer(self.schema)
+        reader = DatumReader(self.schema)
+        datums = [serializer.serialize(r) for r in self.records]
+        for d, r in zip(datums, self.records):
+            self.assertEqual(codec.decode(d), r)
+            self.assertEqual(
+                codec.decode(d), reader.read(BinaryDecoder(io.BytesIO(d)))
+            )
+        data = b"".join(datums)
+        self.assertEqual(codec.decode_many(data), self.records)
+        self.assertEqual(codec.decode_many(data, 3), self.records[:3])
+        buf = bytearray(data)
+        r, pos = codec.decode_at(buf, 0)
+        self.assertEqual(r, self.records[0])
+        self.assertEqual(pos, len(datums[0]))
+        # blocks with a negative count, followed by their size in bytes
+        codec = SchemaCodec('{"type": "array", "items": "int"}')
+        self.assertEqual(codec.decode(b"\x05\x06\x02\x04\x06\x00"), [1, 2, 3])
+
+    def test_union(self):
+        codec = SchemaCodec('["null", "boolean", "long", "double"]')
+        for datum in None, True, 3, 3.5:
+            self.assertEqual(codec.decode(codec.encode(datum)), datum)
+        self.assertEqual(codec.encode(None), b"\x00")
+        self.assertEqual(codec.encode(True), b"\x02\x01")
+        with self.assertRaises(Exception):
+            codec.encode("foo")
+        with self.assertRaises(Exception):
+            codec.decode(b"\x08")
+        codec = SchemaCodec(json.dumps([
+            {"type": "map", "values": "string"},
+            {"type": "record", "name": "R", "fields": [
+                {"name": "z", "type": "int"}
+            ]},
+        ]))
+        self.assertEqual(codec.encode({"z": 1}), b"\x02\x02")
+        self.assertEqual(codec.decode(codec.encode({"z": "1"})), {"z": "1"})
+
+    def test_empty_bodies(self):
+        # no-op item encoders/decoders must still generate valid code
+        empty = {"type": "record", "name": "Empty", "fields": []}
+        schema = {"type": "record", "name": "R", "fields": [
+            {"name": "a", "type": {"type": "array", "items": "null"}},
+            {"name": "m", "type": {"type": "map", "values": "null"}},
+            {"name": "e", "type": empty},
+            {"name": "me", "type": {"type": "map", "values": "Empty"}},
+        ]}
+        for s, datum in [
+                ({"type": "array", "items": "null"}, [None, None]),
+                ({"type": "map", "values": "null"}, {"x": None}),
+                (empty, {}),
+                (schema, {"a": [None], "m": {"x": None}, "e": {},
+                          "me": {"y": {}}}),
+        ]:
+            schema_str = json.dumps(s)
+            for codec in (SchemaCodec(schema_str),
+                          SchemaCodec(schema_str, schema_str)):
+                data = codec.encode(datum)
+                self.assertEqual(data, AvroSerializer(
+                    parse(schema_str)
+                ).serialize(datum))
+                self.assertEqual(codec.decode(data), datum)
+                self.assertEqual(codec.split(data * 2, 2), [data, data])
+
+    def test_validation(self):
+        enum = json.dumps({"type": "enum", "name": "E", "symbols": ["A"]})
+        for schema_str, datum in [
+                ('"int"', 1 << 40),
+                ('"long"', 1 << 64),
+                ('"int"', "1"),
+                ('"boolean"', "false"),
+                (enum, "B"),
+                (enum, []),
+                ('{"type": "array", "items": "int"}', [1, None]),
+                ('"double"', "1"),
+                ('"float"', None),
+                ('"null"', 0),
+                ('{"type": "fixed", "name": "F", "size": 2}', b"abc"),
+                ('{"type": "fixed", "name": "F", "size": 2}', u"ab"),
+                ('"bytes"', u"ab"),
+                ('"string"', 1),
+                ('{"type": "map", "values": "int"}', {1: 1}),
+                ('{"type": "map", "values": "int"}', [("a", 1)]),
+                ('{"type": "array", "items": "int"}', {"a": 1}),
+                (self.schema_str, {"office": "A"}),
+                (self.schema_str, "record"),
+        ]:
+            codec = SchemaCodec(schema_str)
+            self.assertRaises(AvroTypeException, codec.encode, datum)
+        codec = SchemaCodec('"string"')
+        if sys.version_info[0] >= 3:
+            self.assertRaises(AvroTypeException, codec.encode, b"ab")
+        else:  # byte strings must be valid UTF-8
+            self.assertRaises(AvroTypeException, codec.encode, b"\xff")
+            self.assertEqual(codec.encode(b"\xc3\xa0"), b"\x04\xc3\xa0")
+            self.assertEqual(codec.encode(u"\xe0"), b"\x04\xc3\xa0")
+        self.assertEqual(SchemaCodec('"int"').encode(-1), b"\x01")
+
+    def test_cache(self):
+        codec = get_codec(self.schema_str)
+        self.assertEqual(codec.fingerprint, schema_fingerprint(self.schema))
+        self.assertTrue(get_codec(self.schema_str) is codec)
+        self.assertTrue(get_codec(self.schema) is codec)
+        reformatted = json.dumps(SCHEMA, indent=4)
+        self.assertTrue(get_codec(reformatted) is codec)
+        self.assertFalse(get_codec('"string"') is codec)
+
+    def test_datum_io(self):
+        for codec in "null", "deflate":
+            f = io.BytesIO()
+            writer = avdf.DataFileWriter(
+                f, CompiledDatumWriter(), self.schema, codec
+            )
+            for r in self.records:
+                writer.append(r)
+            writer.flush()
+            data = f.getvalue()
+            writer.close()
+            with avdf.DataFileReader(io.BytesIO(data), DatumReader()) as r:
+                self.assertEqual(list(r), self.records)
+            with avdf.DataFileReader(
+                    io.BytesIO(data), CompiledDatumReader()
+            ) as r:
+                self.assertEqual(list(r), self.records)
+            # file streams are read through a window that grows as needed
+            datum_reader = CompiledDatumReader()
+            datum_reader.WINDOW_SIZE = 16
+            f, ref_f = io.BufferedReader(io.BytesIO(data)), io.BytesIO(data)
+            ref = avdf.DataFileReader(ref_f, DatumReader())
+            with avdf.DataFileReader(f, datum_reader) as r:
+                for rec in self.records:
+                    self.assertEqual(next(r), rec)
+                    next(ref)
+                    self.assertEqual(f.tell(), ref_f.tell())
+            ref.close()
+
+    def test_projection(self):
+        projection = {
+            "type": "record",
+            "name": "Node",
+            "namespace": "pydoop.test",
+            "fields": [
+                {"name": "s", "type": "string"},
+                {"name": "i", "type": "int"},
+                {"name": "child", "type": ["null", "int", "string", "Node"]},
+            ]
+        }
+
+        def project(r):
+            c = r["child"]
+            if isinstance(c, dict):
+                c = project(c)
+            return {"s": r["s"], "i": r["i"], "child": c}
+
+        codec = SchemaCodec(self.schema_str, json.dumps(projection))
+        serializer = AvroSerializer(self.schema)
+        datums = [serializer.serialize(r) for r in self.records]
+        expected = [project(r) for r in self.records]
+        self.assertEqual([codec.decode(d) for d in datums], expected)
+        self.assertEqual(codec.decode_many(b"".join(datums)), expected)
+        self.assertTrue(get_codec(self.schema_str, self.schema_str)
+                        is get_codec(self.schema_str))
+        # skipped arrays with a negative block count
+        codec = SchemaCodec(
+            json.dumps({"type": "record", "name": "R", "fields": [
+                {"name": "a", "type": {"type": "array", "items": "int"}},
+                {"name": "x", "type": "int"},
+            ]}),
+            json.dumps({"type": "record", "name": "R", "fields": [
+                {"name": "x", "type": "int"},
+            ]})
+        )
+        self.assertEqual(codec.decode(b"\x05\x06\x02\x04\x06\x00\x08"),
+                         {"x": 4})
+        missing = {"type": "record", "name": "Node",
+                   "namespace": "pydoop.test",
+                   "fields": [{"name": "z", "type": "int"}]}
+        with self.assertRaises(Exception):
+            SchemaCodec(self.schema_str, json.dumps(missing))
+        f = io.BytesIO()
+        writer = avdf.DataFileWriter(f, CompiledDatumWriter(), self.schema)
+        for r in self.records:
+            writer.append(r)
+        writer.flush()
+        data = f.getvalue()
+        writer.close()
+        with avdf.DataFileReader(
+                io.BytesIO(data), CompiledDatumReader(None, parse(
+                    json.dumps(projection)
+                ))
+        ) as r:
+            self.assertEqual(list(r), expected)
+
+    def test_resolution(self):
+        writer = json.dumps({
+            "type": "record", "name": "User", "fields": [
+                {"name": "name", "type": "string"},
+                {"name": "age", "type": "int"},
+                {"name": "score", "type": "float"},
+                {"name": "kind", "type": {
+                    "type": "enum", "name": "Kind", "symbols": ["A", "B", "Z"]
+                }},
+                {"name": "opt", "type": ["null", "int", "string"]},
+                {"name": "dropped", "type": {"type": "map", "values": "int"}},
+            ]
+        })
+        reader = json.dumps({
+            "type": "record", "name": "User", "fields": [
+                {"name": "nick", "type": "bytes", "aliases": ["name"]},
+                {"name": "age", "type": "double"},
+                {"name": "score", "type": "double"},
+                {"name": "kind", "type": {
+                    "type": "enum", "name": "Kind", "symbols": ["C", "B", "A"]
+                }},
+                {"name": "opt", "type": ["null", "long"]},
+                {"name": "email", "type": "string", "default": "none"},
+                {"name": "tags", "type": {"type": "array", "items": "int"},
+                 "default": [1, 2]},
+            ]
+        })
+        enc = SchemaCodec(writer)
+        codec = SchemaCodec(writer, reader)
+        datum = enc.encode({
+            "name": u"\xe0", "age": 3, "score": 0.5, "kind": "B",
+            "opt": 7, "dropped": {"x": 1},
+        })
+        r = codec.decode(datum)
+        self.assertEqual(r, {
+            "nick": u"\xe0".encode("utf-8"), "age": 3.0, "score": 0.5,
+            "kind": "B", "opt": 7, "email": "none", "tags": [1, 2],
+        })
+        self.assertTrue(isinstance(r["age"], float))
+        r["tags"].append(3)
+        self.assertEqual(codec.decode(datum)["tags"], [1, 2])
+        # only raise if the writer actually used the missing symbol/branch
+        for k, v in ("kind", "Z"), ("opt", "foo"):
+            rec = {"name": "n", "age": 0, "score": 0.0, "kind": "A",
+                   "opt": None, "dropped": {}}
+            rec[k] = v
+            with self.assertRaises(AvroException):
+                codec.decode(enc.encode(rec))
+        missing = json.dumps({"type": "record", "name": "User", "fields": [
+            {"name": "email", "type": "string"},
+        ]})
+        with self.assertRaises(SchemaResolutionException):
+            SchemaCodec(writer, missing)
+        other = json.dumps({"type": "record", "name": "Other", "fields": []})
+        with self.assertRaises(SchemaResolutionException):
+            SchemaCodec(writer, other)
+        self.assertTrue(get_codec(writer, reader) is get_codec(
+            json.dumps(json.loads(writer), indent=2), reader
+        ))
+        # files written with different schema versions, same reader
+        v1 = json.dumps({"type": "record", "name": "User", "fields": [
+            {"name": "age", "type": "int"},
+        ]})
+        v2 = json.dumps({"type": "record", "name": "User", "fields": [
+            {"name": "email", "type": "string"},
+            {"name": "age", "type": "long"},
+        ]})
+        reader = parse(json.dumps({
+            "type": "record", "name": "User", "fields": [
+                {"name": "age", "type": "long"},
+                {"name": "email", "type": "string", "default": ""},
+            ]
+        }))
+        datum_reader = CompiledDatumReader(None, reader)
+        for schema, rec, expected in (
+                (v1, {"age": 1}, {"age": 1, "email": ""}),
+                (v2, {"age": 2, "email": "x"}, {"age": 2, "email": "x"}),
+        ):
+            f = io.BytesIO()
+            writer = avdf.DataFileWriter(f, CompiledDatumWriter(),
+                                         parse(schema))
+            writer.append(rec)
+            writer.flush()
+            data = f.getvalue()
+            writer.close()
+            with avdf.DataFileReader(io.BytesIO(data), datum_reader) as r:
+                self.assertEqual(list(r), [expected])
+
+
+def suite():
+    suite_ = unittest.TestSuite()
+    suite_.addTest(TestSchemaCodec('test_encode'))
+    suite_.addTest(TestSchemaCodec('test_decode'))
+    suite_.addTest(TestSchemaCodec('test_union'))
+    suite_.addTest(TestSchemaCodec('test_empty_bodies'))
+    suite_.addTest(TestSchemaCodec('test_validation'))
+    suite_.addTest(TestSchemaCodec('test_cache'))
+    suite_.addTest(TestSchemaCodec('test_datum_io'))
+    suite_.addTest(TestSchemaCodec('test_projection'))
+    suite_.addTest(TestSchemaCodec('test_resolution'))
+    return suite_
+
+
+if __name__ == '__main__':
+    _RUNNER = unittest.TextTestRunner(verbosity=2)
+    _RUNNER.run((suite()))
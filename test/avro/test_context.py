@@ -16,12 +16,17 @@
 #
 # END_COPYRIGHT
 
+import json
 import os
 import unittest
 
+import avro.datafile as avdf
+from avro.io import DatumWriter
+
 import pydoop.mapreduce.api as api
 import pydoop.mapreduce.pipes as pp
 import pydoop.avrolib as avrolib
+from pydoop.mapreduce.simulator import HadoopSimulatorLocal
 from pydoop.test_utils import WDTestCase
 from pydoop.mapreduce.binary_streams import (
     BinaryWriter, BinaryDownStreamAdapter
@@ -30,7 +35,8 @@ from pydoop.utils.py3compat import iteritems
 
 from common import AvroSerializer, avro_user_record
 from pydoop.config import (
-    AVRO_INPUT, AVRO_KEY_INPUT_SCHEMA, AVRO_VALUE_INPUT_SCHEMA
+    AVRO_INPUT, AVRO_KEY_INPUT_SCHEMA, AVRO_VALUE_INPUT_SCHEMA,
+    AVRO_BATCH_SIZE, AVRO_OUTPUT, AVRO_VALUE_OUTPUT_SCHEMA,
 )
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -93,6 +99,44 @@ class ValueWrapperMapper(BaseMapper):
         return ctx.value.name, ctx.value.favorite_color
 
 
+class ValueBatchMapper(avrolib.AvroBatchMapper):
+
+    def map_batch(self, ctx, keys, values):
+        for v in values:
+            ctx.emit(v['name'], v['favorite_color'])
+
+
+class ColumnarValueBatchMapper(avrolib.AvroBatchMapper):
+
+    columnar = True
+
+    def map_batch(self, ctx, keys, values):
+        for name, color in zip(values['name'], values['favorite_color']):
+            ctx.emit(name, color)
+
+
+class KeyBatchMapper(avrolib.AvroBatchMapper):
+
+    def map_batch(self, ctx, keys, values):
+        assert len(keys) == len(values) <= self.batch_size
+        for k in keys:
+            ctx.emit(k['name'], k['favorite_color'])
+
+
+class KeyValueMapper(BaseMapper):
+
+    def get_kv(self, ctx):
+        return ctx.key, ctx.value['favorite_color']
+
+
+class UserReducer(api.Reducer):
+
+    def reduce(self, ctx):
+        values = [avro_user_record(int(_)) for _ in ctx.values]
+        ctx.emit(ctx.key, values[0])
+        ctx.emit_many([ctx.key] * (len(values) - 1), values[1:])
+
+
 class TestContext(WDTestCase):
 
     def setUp(self):
@@ -110,6 +154,7 @@ class TestContext(WDTestCase):
         job_conf = {
             AVRO_INPUT: mode,
             schema_prop: str(self.schema),
+            AVRO_BATCH_SIZE: '2',
             'mapreduce.pipes.isjavarecordreader': 'true',
             'mapreduce.pipes.isjavarecordwriter': 'true'
         }
@@ -163,6 +208,117 @@ class TestContext(WDTestCase):
     def test_wrapper_value(self):
         self.__run_test('V', ValueWrapperMapper, WrapperAvroContext)
 
+    def test_batch_key(self):
+        self.__run_test('K', KeyBatchMapper, avrolib.AvroContext)
+
+        class IncompleteBatchMapper(avrolib.AvroBatchMapper):
+            pass
+
+        self.assertRaises(TypeError, IncompleteBatchMapper, None)
+
+    def test_batch_value(self):
+        self.__run_test('V', ValueBatchMapper, avrolib.AvroContext)
+        self.__run_test('V', ColumnarValueBatchMapper, avrolib.AvroContext)
+
+    def test_serialization(self):
+        job_conf = {
+            AVRO_OUTPUT: 'V',
+            AVRO_VALUE_OUTPUT_SCHEMA: str(self.schema),
+            'mapreduce.pipes.isjavarecordreader': 'true',
+            'mapreduce.pipes.isjavarecordwriter': 'true'
+        }
+        cmd_file = self._mkfn('reduce_in')
+        with open(cmd_file, 'wb') as f:
+            bw = BinaryWriter(f)
+            bw.send(bw.START_MESSAGE, 0)
+            bw.send(bw.SET_JOB_CONF, job_conf)
+            bw.send(bw.RUN_REDUCE, 0, True)
+            bw.send(bw.REDUCE_KEY, 'k')
+            for i in range(len(self.records)):
+                bw.send(bw.REDUCE_VALUE, str(i))
+            bw.send(bw.CLOSE)
+            bw.close()
+        pp.run_task(
+            pp.Factory(mapper_class=BaseMapper, reducer_class=UserReducer),
+            private_encoding=False, context_class=avrolib.AvroContext,
+            cmd_file=cmd_file
+        )
+        deserializer = avrolib.Deserializer(str(self.schema))
+        out_records = []
+        with open(cmd_file + '.out', 'rb') as f:
+            bf = BinaryDownStreamAdapter(f)
+            for cmd, args in bf:
+                if cmd == bf.OUTPUT:
+                    self.assertEqual(args[0], b'k')
+                    out_records.append(deserializer.deserialize(args[1]))
+        self.assertEqual(out_records, self.records)
+
+    def test_simulator(self):
+        kv_schema = avrolib.parse(json.dumps({
+            "type": "record",
+            "name": "KeyValuePair",
+            "fields": [
+                {"name": "key", "type": "string"},
+                {"name": "value", "type": json.loads(str(self.schema))},
+            ]
+        }))
+        records = [avro_user_record(_) for _ in range(100)]
+        for mode, mapper_class in [
+                ('K', KeyMapper), ('V', ValueMapper), ('KV', KeyValueMapper)
+        ]:
+            avdf.SYNC_INTERVAL = 256  # several blocks
+            fn = self._mkfn('%s.avro' % mode)
+            schema = kv_schema if mode == 'KV' else self.schema
+            with avdf.DataFileWriter(
+                    open(fn, 'wb'), DatumWriter(), schema, 'deflate'
+            ) as writer:
+                for r in records:
+                    writer.append({'key': r['name'], 'value': r}
+                                  if mode == 'KV' else r)
+            hs = HadoopSimulatorLocal(
+                pp.Factory(mapper_class=mapper_class), avro_input=mode
+            )
+            out_fn = self._mkfn('%s.out' % mode)
+            with open(fn, 'rb') as fin, open(out_fn, 'wb') as fout:
+                hs.run(fin, fout, {
+                    'mapreduce.pipes.isjavarecordwriter': 'true'
+                }, num_reducers=0)
+            with open(out_fn, 'rb') as f:
+                out = [_.decode('utf-8').rstrip('\n').split('\t')
+                       for _ in f]
+            self.assertEqual(out, [
+                [r['name'], r['favorite_color']] for r in records
+            ])
+
+    def test_batch_deserializer(self):
+        schema_str = str(self.schema)
+        d = avrolib.get_batch_deserializer(schema_str)
+        self.assertTrue(avrolib.get_batch_deserializer(schema_str) is d)
+        serializer = AvroSerializer(self.schema)
+        datums = [serializer.serialize(_) for _ in self.records]
+        self.assertEqual(d.deserialize_many(datums), self.records)
+        self.assertEqual(d.deserialize_many(iter(datums)), self.records)
+        self.assertEqual(d.deserialize_many([]), [])
+        self.assertEqual(d.deserialize(datums[1]), self.records[1])
+        cols = d.deserialize_columns(datums)
+        self.assertEqual(sorted(cols), sorted(self.records[0]))
+        for name, col in iteritems(cols):
+            self.assertEqual(col, [_[name] for _ in self.records])
+        self.assertEqual(
+            d.deserialize_columns(datums, fields=['name']),
+            {'name': [_['name'] for _ in self.records]}
+        )
+        # fields that are not requested are not decoded
+        bad_office = b"\x02\xff\x06bob\x02\x02"
+        self.assertRaises(UnicodeDecodeError, d.deserialize_columns,
+                          [bad_office])
+        self.assertEqual(
+            d.deserialize_columns([bad_office], fields=['name']),
+            {'name': [u'bob']}
+        )
+        d = avrolib.BatchDeserializer('"long"')
+        self.assertRaises(ValueError, d.deserialize_columns, [])
+
 
 def suite():
     suite_ = unittest.TestSuite()
@@ -170,6 +326,11 @@ def suite():
     suite_.addTest(TestContext('test_value'))
     suite_.addTest(TestContext('test_wrapper_key'))
     suite_.addTest(TestContext('test_wrapper_value'))
+    suite_.addTest(TestContext('test_batch_key'))
+    suite_.addTest(TestContext('test_batch_value'))
+    suite_.addTest(TestContext('test_serialization'))
+    suite_.addTest(TestContext('test_simulator'))
+    suite_.addTest(TestContext('test_batch_deserializer'))
     return suite_
 
 
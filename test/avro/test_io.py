@@ -16,6 +16,7 @@
 #
 # END_COPYRIGHT
 
+import json
 import os
 import unittest
 import itertools as it
@@ -25,16 +26,46 @@ from avro.io import DatumReader, DatumWriter
 
 from pydoop.mapreduce.pipes import InputSplit
 from pydoop.avrolib import (
-    SeekableDataFileReader, AvroReader, AvroWriter, parse
+    SeekableDataFileReader, AvroReader, ParallelAvroReader, AvroBatchReader,
+    AvroWriter, CompressingDataFileWriter, parse
 )
+from pydoop.mapreduce.api import JobConf
 from pydoop.test_utils import WDTestCase
 from pydoop.utils.py3compat import czip, cmap
 import pydoop.hdfs as hdfs
 
 from common import avro_user_record
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+POINT_SCHEMA = parse(json.dumps({
+    "type": "record",
+    "name": "Point",
+    "fields": [
+        {"name": "id", "type": "long"},
+        {"name": "x", "type": "double"},
+        {"name": "w", "type": "float"},
+        {"name": "valid", "type": "boolean"},
+        {"name": "label", "type": "string"},
+        {"name": "tags", "type": {"type": "array", "items": "string"}},
+    ]
+}))
+
+
+def point_record(i):
+    return {
+        "id": i,
+        "x": i / 4.0,
+        "w": 0.5 * i,
+        "valid": i % 3 == 0,
+        "label": u"p\xe8-%d" % i,
+        "tags": ["t%d" % j for j in range(i % 3)],
+    }
 
 
 class TestAvroIO(WDTestCase):
@@ -44,11 +75,14 @@ class TestAvroIO(WDTestCase):
         with open(os.path.join(THIS_DIR, "user.avsc")) as f:
             self.schema = parse(f.read())
 
-    def write_avro_file(self, rec_creator, n_samples, sync_interval):
+    def write_avro_file(self, rec_creator, n_samples, sync_interval,
+                        codec="null"):
         avdf.SYNC_INTERVAL = sync_interval
         self.assertEqual(avdf.SYNC_INTERVAL, sync_interval)
         fo = self._mkf('data.avro', mode='wb')
-        with avdf.DataFileWriter(fo, DatumWriter(), self.schema) as writer:
+        with avdf.DataFileWriter(
+                fo, DatumWriter(), self.schema, codec
+        ) as writer:
             for i in range(n_samples):
                 writer.append(rec_creator(i))
         return fo.name
@@ -87,6 +121,22 @@ class TestAvroIO(WDTestCase):
                         break
                     i += 1
 
+    def test_sync_search(self):
+        fn = self.write_avro_file(avro_user_record, 200, 256)
+        with open(fn, 'rb') as f:
+            data = f.read()
+        with open(fn, 'rb') as f:
+            sreader = SeekableDataFileReader(f, DatumReader())
+            sm = sreader.sync_marker
+            for window_size in 17, 20, 33, 1024:
+                sreader.FORWARD_WINDOW_SIZE = window_size
+                for offset in range(1, len(data), 7):
+                    sreader.align_after(offset)
+                    expected = data.find(sm, offset)
+                    if expected < 0:
+                        expected = len(data)
+                    self.assertEqual(f.tell(), expected)
+
     def test_avro_reader(self):
 
         N = 500
@@ -115,12 +165,140 @@ class TestAvroIO(WDTestCase):
         highs = [x for x in get_areader(mid_len, file_length)]
         self.assertEqual(N, len(lows) + len(highs))
 
+    def test_parallel_avro_reader(self):
+        N = 500
+        records = [avro_user_record(i) for i in range(N)]
+
+        class FunkyCtx(object):
+            def __init__(self, isplit):
+                self.input_split = isplit
+
+        def get_preader(url, offset, length, max_workers):
+            isplit = InputSplit(InputSplit.to_string(url, offset, length))
+
+            class Reader(ParallelAvroReader):
+                pass
+            Reader.max_workers = max_workers
+            return Reader(FunkyCtx(isplit))
+
+        for codec in "null", "deflate":
+            fn = self.write_avro_file(avro_user_record, N, 1024, codec)
+            url = hdfs.path.abspath(fn, local=True)
+            file_length = os.stat(fn).st_size
+            for max_workers in 1, 4:
+                preader = get_preader(url, 0, file_length, max_workers)
+                self.assertEqual([r for _, r in preader], records)
+                preader.close()
+                mid_len = int(file_length / 2)
+                lows = list(get_preader(url, 0, mid_len, max_workers))
+                highs = list(get_preader(
+                    url, mid_len, file_length, max_workers
+                ))
+                self.assertTrue(lows and highs)
+                self.assertEqual([r for _, r in lows + highs], records)
+
+    @unittest.skipIf(np is None, "NumPy not available")
+    def test_avro_batch_reader(self):
+        N = 500
+        schema = self.schema
+        self.schema = POINT_SCHEMA
+        try:
+            fn = self.write_avro_file(point_record, N, 1024)
+        finally:
+            self.schema = schema
+        url = hdfs.path.abspath(fn, local=True)
+
+        class FunkyCtx(object):
+            def __init__(self, isplit):
+                self.input_split = isplit
+
+        def get_breader(offset, length, projection=None):
+            isplit = InputSplit(InputSplit.to_string(url, offset, length))
+
+            class Reader(AvroBatchReader):
+                pass
+            Reader.reader_schema = projection
+            return Reader(FunkyCtx(isplit))
+
+        file_length = os.stat(fn).st_size
+        blocks = [cols for _, cols in get_breader(0, file_length)]
+        self.assertTrue(len(blocks) > 1)
+        records = [point_record(i) for i in range(N)]
+        i = 0
+        for cols in blocks:
+            n = len(cols["id"])
+            self.assertEqual(cols["id"].dtype, np.int64)
+            self.assertEqual(cols["x"].dtype, np.float64)
+            self.assertEqual(cols["w"].dtype, np.float32)
+            self.assertEqual(cols["valid"].dtype, np.bool_)
+            expected = records[i: i + n]
+            for name in "id", "x", "w", "valid":
+                self.assertEqual(list(cols[name]), [_[name] for _ in expected])
+            self.assertEqual(
+                list(cols["label"]), [_["label"] for _ in expected]
+            )
+            self.assertEqual(len(cols["label"].offsets), n + 1)
+            self.assertEqual(cols["tags"], [_["tags"] for _ in expected])
+            i += n
+        self.assertEqual(i, N)
+        mid_len = int(file_length / 2)
+        n_low = sum(len(c["id"]) for _, c in get_breader(0, mid_len))
+        n_high = sum(
+            len(c["id"]) for _, c in get_breader(mid_len, file_length)
+        )
+        self.assertEqual(n_low + n_high, N)
+        projection = parse(json.dumps({
+            "type": "record", "name": "Point",
+            "fields": [{"name": "x", "type": "double"}]
+        }))
+        for _, cols in get_breader(0, file_length, projection):
+            self.assertEqual(list(cols), ["x"])
+
+    def test_compressing_writer(self):
+        N = 500
+        records = [avro_user_record(i) for i in range(N)]
+        for codec, level in ("null", None), ("deflate", None), ("deflate", 9):
+            for background in False, True:
+                fn = os.path.join(self.wd, "%s_%s.avro" % (codec, background))
+                with CompressingDataFileWriter(
+                        open(fn, "wb"), self.schema, codec, level,
+                        sync_interval=1024, background=background
+                ) as writer:
+                    for r in records:
+                        writer.append(r)
+                with open(fn, "rb") as f:
+                    with avdf.DataFileReader(f, DatumReader()) as reader:
+                        self.assertEqual(
+                            reader.GetMeta("avro.codec")
+                            if hasattr(reader, "GetMeta")
+                            else reader.get_meta("avro.codec"),
+                            codec.encode("utf-8")
+                        )
+                        self.assertEqual(list(reader), records)
+                with open(fn, "rb") as f:
+                    sreader = SeekableDataFileReader(f, DatumReader())
+                    blocks = list(sreader.iter_blocks())
+                    self.assertTrue(len(blocks) > 1)
+                    self.assertEqual(sum(_[1] for _ in blocks), N)
+        with self.assertRaises(ValueError):
+            CompressingDataFileWriter(
+                open(os.path.join(self.wd, "x.avro"), "wb"), self.schema,
+                "foo"
+            )
+
     def test_avro_writer(self):
 
         class FunkyCtx(object):
 
             def __init__(self_, job_conf):
-                self_.job_conf = job_conf
+                self_.job_conf = JobConf(job_conf)
+
+            def get_default_work_file(self_, extension=""):
+                return "%s/part-r-%05d%s" % (
+                    self_.job_conf['mapreduce.task.output.dir'],
+                    int(self_.job_conf['mapreduce.task.partition']),
+                    extension
+                )
 
         class AWriter(AvroWriter):
 
@@ -129,21 +307,41 @@ class TestAvroIO(WDTestCase):
             def emit(self_, key, value):
                 self_.writer.append(key)
 
-        ctx = FunkyCtx({
-            'mapreduce.task.partition': 1,
-            'mapreduce.task.output.dir': hdfs.path.abspath(self.wd, local=True)
-        })
-        awriter = AWriter(ctx)
         N = 10
-        for i in range(N):
-            awriter.emit(avro_user_record(i), '')
-        awriter.close()
+        for codec in None, "deflate":
+            job_conf = {
+                'mapreduce.task.partition': 1,
+                'mapreduce.task.output.dir': hdfs.path.abspath(
+                    self.wd, local=True
+                ),
+            }
+            if codec:
+                job_conf['avro.output.codec'] = codec
+                job_conf['avro.mapred.deflate.level'] = '1'
+                job_conf['avro.mapred.sync.interval'] = '100'
+            ctx = FunkyCtx(job_conf)
+            awriter = AWriter(ctx)
+            self.assertEqual(awriter.writer.codec, codec or "null")
+            for i in range(N):
+                awriter.emit(avro_user_record(i), '')
+            fs = awriter.file.fs
+            awriter.close()
+            self.assertFalse(fs.closed)
+            fn = os.path.join(self.wd, "part-r-00001.avro")
+            with avdf.DataFileReader(open(fn, "rb"), DatumReader()) as r:
+                self.assertEqual(
+                    list(r), [avro_user_record(i) for i in range(N)]
+                )
 
 
 def suite():
     suite_ = unittest.TestSuite()
     suite_.addTest(TestAvroIO('test_seekable'))
+    suite_.addTest(TestAvroIO('test_sync_search'))
     suite_.addTest(TestAvroIO('test_avro_reader'))
+    suite_.addTest(TestAvroIO('test_parallel_avro_reader'))
+    suite_.addTest(TestAvroIO('test_avro_batch_reader'))
+    suite_.addTest(TestAvroIO('test_compressing_writer'))
     suite_.addTest(TestAvroIO('test_avro_writer'))
     return suite_
 
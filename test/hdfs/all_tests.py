@@ -16,6 +16,7 @@
 #
 # END_COPYRIGHT
 
+import sys
 import unittest
 from pydoop.test_utils import get_module
 
@@ -26,7 +27,13 @@ TEST_MODULE_NAMES = [
     'test_hdfs_fs',
     'test_path',
     'test_hdfs',
+    'test_pool',
+    'test_planning',
+    'test_pack',
+    'test_lineindex',
 ]
+if sys.version_info >= (3, 5):
+    TEST_MODULE_NAMES.append('test_aio')
 
 
 def suite(path=None):
@@ -37,6 +44,5 @@ def suite(path=None):
 
 
 if __name__ == '__main__':
-    import sys
     _RESULT = unittest.TextTestRunner(verbosity=2).run(suite())
     sys.exit(not _RESULT.wasSuccessful())
@@ -23,6 +23,7 @@ import uuid
 import shutil
 import operator
 import array
+import hashlib
 from ctypes import create_string_buffer
 
 import pydoop.hdfs as hdfs
@@ -213,6 +214,39 @@ class TestCommon(unittest.TestCase):
             f.write(utils.make_random_data())
             f.flush()
 
+    def hflush(self):
+        content = utils.make_random_data()
+        path = self._make_random_path()
+        for mode in "w", "wt":
+            data = content if mode == "w" else content.decode("ascii")
+            with self.fs.open_file(path, mode) as f:
+                f.write(data)
+                f.hflush()
+                with self.fs.open_file(path) as fi:
+                    self.assertEqual(fi.read(), content)
+                f.write(data)
+                f.hsync()
+                with self.fs.open_file(path) as fi:
+                    self.assertEqual(fi.read(), 2 * content)
+
+    def read_chunk_digest(self):
+        content = utils.make_random_data()
+        path = self._make_random_file(content=content)
+        size = len(content)
+        digest, pieces = hashlib.md5(), []
+        digester = hdfs.common.Digester(["md5"])
+        for d in digest, lambda _: pieces.append(bytes(_)), digester:
+            with self.fs.open_file(path) as f:
+                chunk = bytearray(size // 2 + 1)
+                self.assertEqual(f.read_chunk(chunk, digest=d), len(chunk))
+                self.assertEqual(f.read_chunk(chunk, digest=d),
+                                 size - len(chunk))
+                self.assertEqual(f.read_chunk(chunk, digest=d), 0)
+        self.assertEqual(digest.hexdigest(), hashlib.md5(content).hexdigest())
+        self.assertEqual(b"".join(pieces), content)
+        self.assertEqual(len(pieces), 2)
+        self.assertEqual(digester.hexdigests()["md5"], digest.hexdigest())
+
     def available(self):
         content = utils.make_random_data()
         path = self._make_random_file(content=content)
@@ -581,6 +615,8 @@ def common_tests():
         'chmod_w_string',
         'file_attrs',
         'flush',
+        'hflush',
+        'read_chunk_digest',
         'read',
         'read_chunk',
         'write',
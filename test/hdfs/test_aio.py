@@ -0,0 +1,165 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+import asyncio
+import tempfile
+import threading
+import unittest
+
+import pydoop.hdfs as hdfs
+from pydoop.hdfs import aio
+from pydoop.test_utils import make_random_data
+
+
+class TestAio(unittest.TestCase):
+
+    def setUp(self):
+        self.wd = "file:%s" % tempfile.mkdtemp(prefix="pydoop_test_")
+        self.data = make_random_data(3 * 1024 + 17, printable=True)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        hdfs.rmr(self.wd)
+
+    def run_coro(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def write_read(self):
+        path = "%s/foo" % self.wd
+
+        async def run():
+            f = await aio.open(path, "w")
+            await f.write(self.data)
+            await f.close()
+            self.assertTrue(f.closed)
+            async with await aio.open(path) as f:
+                data = await f.read()
+                chunk = await f.pread(10, 20)
+            return data, chunk
+        data, chunk = self.run_coro(run())
+        self.assertEqual(data, self.data)
+        self.assertEqual(chunk, self.data[10:30])
+
+    def iterate(self):
+        path = "%s/foo" % self.wd
+        lines = ["line %d\n" % i for i in range(aio.LINE_BATCH_SIZE + 3)]
+        hdfs.dump("".join(lines), path)
+
+        async def run():
+            read_lines, chunks = [], []
+            async with await aio.open(path, "rt") as f:
+                async for line in f:
+                    read_lines.append(line)
+            async with await aio.open(path) as f:
+                async for chunk in f.chunks(100):
+                    chunks.append(chunk)
+            return read_lines, chunks
+        read_lines, chunks = self.run_coro(run())
+        self.assertEqual(read_lines, lines)
+        self.assertTrue(all(len(_) <= 100 for _ in chunks))
+        self.assertEqual(b"".join(chunks), "".join(lines).encode("ascii"))
+
+    def path_info(self):
+        d = "%s/d" % self.wd
+        paths = ["%s/%s" % (d, _) for _ in ("a", "b")]
+        for p in paths:
+            hdfs.dump(self.data, p)
+
+        async def run():
+            info = await aio.get_path_info(d)
+            ls = await aio.list_directory(d)
+            walked = []
+            async for item in aio.walk(self.wd):
+                walked.append(item)
+            return info, ls, walked
+        info, ls, walked = self.run_coro(run())
+        self.assertEqual(info["kind"], "directory")
+        self.assertEqual(
+            sorted(_["name"] for _ in ls),
+            sorted(hdfs.path.abspath(_) for _ in paths)
+        )
+        fs = hdfs.hdfs("", 0)
+        try:
+            expected = [_["name"] for _ in fs.walk(self.wd)]
+        finally:
+            fs.close()
+        self.assertEqual([_["name"] for _ in walked], expected)
+
+    def cp(self):
+        src, dest = "%s/src" % self.wd, "%s/dest" % self.wd
+        hdfs.dump(self.data, src)
+
+        async def run():
+            await asyncio.gather(*[
+                aio.cp(src, "%s_%d" % (dest, i)) for i in range(4)
+            ])
+        self.run_coro(run())
+        for i in range(4):
+            self.assertEqual(hdfs.load("%s_%d" % (dest, i)), self.data)
+        with self.assertRaises(IOError):
+            self.run_coro(aio.cp("%s/missing" % self.wd, dest))
+
+    def executor(self):
+        ex = aio.get_executor("", 0)
+        self.assertTrue(aio.get_executor("", 0) is ex)
+        # once connected, spellings of the same address share an executor
+        with hdfs.hdfs("default", 0) as fs:
+            ex = aio.get_executor(fs.host, fs.port)
+            self.assertTrue(aio.get_executor("default", 0) is ex)
+        aio.shutdown()
+        self.assertFalse(aio.get_executor("", 0) is ex)
+
+    def off_loop_split(self):
+        # path resolution is blocking: it must not run on the loop thread
+        path = "%s/foo" % self.wd
+        hdfs.dump(self.data, path)
+        threads, split = [], hdfs.path.split
+
+        def recording_split(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return split(*args, **kwargs)
+
+        async def run():
+            await aio.get_path_info(path)
+            async with await aio.open(path) as f:
+                await f.read()
+            await aio.cp(path, "%s_copy" % path)
+        hdfs.path.split = recording_split
+        try:
+            self.run_coro(run())
+        finally:
+            hdfs.path.split = split
+        self.assertTrue(len(threads) >= 3)
+        self.assertFalse(threading.current_thread() in threads)
+
+
+def suite():
+    suite_ = unittest.TestSuite()
+    suite_.addTest(TestAio("write_read"))
+    suite_.addTest(TestAio("iterate"))
+    suite_.addTest(TestAio("path_info"))
+    suite_.addTest(TestAio("cp"))
+    suite_.addTest(TestAio("executor"))
+    suite_.addTest(TestAio("off_loop_split"))
+    return suite_
+
+
+if __name__ == '__main__':
+    _RUNNER = unittest.TextTestRunner(verbosity=2)
+    _RUNNER.run((suite()))
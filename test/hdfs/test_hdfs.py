@@ -18,6 +18,7 @@
 
 from __future__ import division
 
+import hashlib
 import unittest
 import tempfile
 import os
@@ -101,6 +102,25 @@ class TestHDFS(unittest.TestCase):
     def ls(self):
         self.__ls(hdfs.ls, lambda x: x)
 
+    def ilsl(self):
+        self.__ls(lambda *a, **kw: list(hdfs.ilsl(*a, **kw)),
+                  lambda x: x.name)
+        for wd in self.local_wd, self.hdfs_wd:
+            infos = dict((_["name"], _) for _ in hdfs.lsl(wd, recursive=True))
+            fields = ("size", "kind")
+            for r in hdfs.ilsl(wd, recursive=True, fields=fields):
+                self.assertEqual(r._fields, fields)
+            records = list(hdfs.ilsl(wd, fields=["name", "size", "kind"]))
+            self.assertTrue(len(records) > 0)
+            for r in records:
+                self.assertEqual(r.size, infos[r.name]["size"])
+                self.assertEqual(r.kind, infos[r.name]["kind"])
+            with self.assertRaises(ValueError):
+                list(hdfs.ilsl(wd, fields=["foo"]))
+
+    def ils(self):
+        self.__ls(lambda *a, **kw: list(hdfs.ils(*a, **kw)), lambda x: x)
+
     def mkdir(self):
         for wd in self.local_wd, self.hdfs_wd:
             d1 = "%s/d1" % wd
@@ -190,6 +210,33 @@ class TestHDFS(unittest.TestCase):
             self.__cp_dir(wd)
             self.__cp_recursive(wd)
 
+    def cp_digests(self):
+        md5 = hashlib.md5(self.data).hexdigest()
+        sha256 = hashlib.sha256(self.data).hexdigest()
+        for wd in self.local_wd, self.hdfs_wd:
+            src = "%s/src" % wd
+            hdfs.dump(self.data, "%s/a" % src)
+            hdfs.dump(self.data, "%s/b" % src)
+            for threaded in False, True:
+                dest = "%s/dest_%s" % (wd, threaded)
+                res = hdfs.cp(src, dest, digests=["md5", "sha256"],
+                              hash_in_thread=threaded)
+                self.assertEqual(sorted(res), sorted(hdfs.ls(dest)))
+                for d in res.values():
+                    self.assertEqual(d, {"md5": md5, "sha256": sha256})
+                chunks = []
+                res = hdfs.cp("%s/a" % src, "%s/c" % dest,
+                              digests=chunks.append, hash_in_thread=threaded)
+                self.assertTrue(res is None)
+                self.assertEqual(b"".join(chunks), self.data)
+            self.assertRaises(ValueError, hdfs.cp, "%s/a" % src,
+                              "%s/d" % wd, digests=["foo"])
+        dest = hdfs.path.split(self.local_paths[0])[-1]
+        res = hdfs.get("%s/src/a" % self.hdfs_wd, dest, digests=["md5"])
+        self.assertEqual(list(res.values()), [{"md5": md5}])
+        res = hdfs.put(dest, self.hdfs_paths[0], digests=["md5"])
+        self.assertEqual(res, {self.hdfs_paths[0]: {"md5": md5}})
+
     def put(self):
         src = hdfs.path.split(self.local_paths[0])[-1]
         dest = self.hdfs_paths[0]
@@ -215,6 +262,178 @@ class TestHDFS(unittest.TestCase):
             hdfs.rmr(t1.name)
             self.assertEqual(len(hdfs.ls(wd)), 0)
 
+    def du(self):
+        for wd in self.local_wd, self.hdfs_wd:
+            t1 = self.__make_tree(wd)
+            d2 = [_ for _ in t1.children if _.kind == 1][0]
+            size = len(self.data)
+            s, = hdfs.du(t1.name)
+            self.assertTrue(s["name"].endswith(t1.name.split(":", 1)[-1]))
+            self.assertEqual(s["size"], 2 * size)
+            self.assertEqual(s["file_count"], 2)
+            self.assertEqual(s["directory_count"], 2)
+            s1, s2 = hdfs.du(t1.name, depth=1, max_workers=2)
+            self.assertEqual(s1, s)
+            self.assertTrue(s2["name"].endswith(d2.name.split(":", 1)[-1]))
+            self.assertEqual(s2["size"], size)
+            self.assertEqual(s2["file_count"], 1)
+            self.assertEqual(s2["directory_count"], 1)
+            self.assertEqual(len(hdfs.du(t1.name, depth=5)), 2)
+            f1 = [_ for _ in t1.children if _.kind == 0][0]
+            s, = hdfs.du(f1.name, depth=1)
+            self.assertEqual(s["size"], size)
+            self.assertEqual(s["file_count"], 1)
+            self.assertEqual(s["directory_count"], 0)
+            self.assertRaises(IOError, hdfs.du, "%s/missing" % wd)
+
+    def follow(self):
+        for wd in self.local_wd, self.hdfs_wd:
+            p = "%s/log" % wd
+            hdfs.dump("a\nb", p)
+            with hdfs.open(p, "rt", follow=True) as f:
+                f.timeout, f.min_delay = 0.2, 0.01
+                self.assertEqual(next(f), "a\n")
+                with hdfs.open(p, "at") as fo:
+                    fo.write(u"c\nd\n")
+                self.assertEqual(list(f), ["bc\n", "d\n"])
+                self.assertEqual(f.offset, 7)
+                with hdfs.open(p, "at") as fo:
+                    fo.write(u"e")
+                self.assertEqual(list(f), ["e"])
+            with hdfs.open(p, follow=True) as f:
+                f.timeout, f.chunk_size = 0, 3
+                self.assertEqual(b"".join(f), b"a\nbc\nd\ne")
+            self.assertRaises(ValueError, hdfs.open, p, "w", follow=True)
+            # idle period: no reopening, at most one per append
+            with hdfs.open(p, follow=True) as f:
+                f.timeout, f.min_delay, f.max_delay = 0.3, 0.01, 0.02
+                self.assertEqual(b"".join(f), b"a\nbc\nd\ne")
+                self.assertEqual(list(f), [])
+                self.assertEqual(f.reopens, 0)
+                with hdfs.open(p, "a") as fo:
+                    fo.write(b"f")
+                self.assertEqual(list(f), [b"f"])
+                self.assertEqual(list(f), [])
+                local = wd == self.local_wd or hdfs.default_is_local()
+                self.assertEqual(f.reopens, 0 if local else 1)
+
+    def sync(self):
+        for wd in self.local_wd, self.hdfs_wd:
+            src, dest = "%s/src" % wd, "%s/dest" % wd
+            for p in "a", "b", "d/c":
+                hdfs.dump(self.data, "%s/%s" % (src, p))
+            names = ["%s/%s" % (dest, _) for _ in ("a", "b", "d/c")]
+            res = hdfs.sync(src, dest)
+            self.assertEqual(res["copied"], names)
+            for n in names:
+                self.assertEqual(hdfs.load(n), self.data)
+                self.assertEqual(
+                    int(hdfs.path.getmtime(n)),
+                    int(hdfs.path.getmtime(n.replace(dest, src)))
+                )
+            res = hdfs.sync(src, dest)
+            self.assertEqual(res["copied"], [])
+            self.assertEqual(res["skipped"], names)
+            # same size and mtime, different content
+            hdfs.dump(self.data[::-1], names[0])
+            hdfs.path.utime(names[0], (hdfs.path.getmtime(names[0]),
+                                       hdfs.path.getmtime("%s/a" % src)))
+            self.assertEqual(hdfs.sync(src, dest)["copied"], [])
+            self.assertEqual(hdfs.sync(src, dest, checksum="md5")["copied"],
+                             names[:1])
+            self.assertEqual(hdfs.load(names[0]), self.data)
+            # changed source, extraneous dest paths, kind mismatch
+            hdfs.dump(self.data[:10], "%s/b" % src)
+            hdfs.dump(self.data, "%s/x/y" % dest)
+            hdfs.rmr("%s/d" % src)
+            hdfs.dump(self.data, "%s/d" % src)
+            self.assertRaises(IOError, hdfs.sync, src, dest)
+            self.assertEqual(hdfs.load(names[2]), self.data)
+            res = hdfs.sync(src, dest, replace=True)
+            self.assertEqual(res["copied"], names[1:2] + ["%s/d" % dest])
+            self.assertEqual(res["deleted"], ["%s/d" % dest])
+            self.assertTrue(hdfs.path.exists("%s/x/y" % dest))
+            res = hdfs.sync(src, dest, delete=True)
+            self.assertEqual(res["deleted"], ["%s/x" % dest])
+            self.assertEqual(sorted(hdfs.ls(dest)), sorted(
+                _.replace(src, dest) for _ in hdfs.ls(src)
+            ))
+            # single file
+            res = hdfs.sync("%s/a" % src, "%s/single" % wd)
+            self.assertEqual(res["copied"], ["%s/single" % wd])
+            self.assertRaises(IOError, hdfs.sync, "%s/z" % src, dest)
+            # file into an existing directory, as in cp
+            hdfs.mkdir("%s/x" % dest)
+            res = hdfs.sync("%s/a" % src, "%s/x" % dest)
+            self.assertEqual(res["copied"], ["%s/x/a" % dest])
+            self.assertEqual(res["deleted"], [])
+            self.assertEqual(hdfs.load("%s/x/a" % dest), self.data)
+            self.assertRaises(IOError, hdfs.sync, src, names[0])
+            self.assertEqual(hdfs.load(names[0]), self.data)
+            # partial dest that is not a prefix of the source, empty dest
+            partial = "%s/partial" % wd
+            hdfs.dump(self.data[::-1][:7], partial)
+            res = hdfs.sync("%s/a" % src, partial)
+            self.assertEqual(res["copied"], [partial])
+            self.assertEqual(hdfs.load(partial), self.data)
+            hdfs.dump(b"", partial)
+            res = hdfs.sync("%s/a" % src, partial)
+            self.assertEqual(res["copied"], [partial])
+            self.assertEqual(hdfs.load(partial), self.data)
+        if hdfs.default_is_local():
+            return
+        # interrupted transfer: resume from the last complete block
+        bs = 1048576
+        data = make_random_data(2 * bs + bs // 2, printable=False)
+        src, dest = "%s/big" % self.hdfs_wd, "%s/big_copy" % self.hdfs_wd
+        for p, d in (src, data), (dest, data[:bs + bs // 2]):
+            with hdfs.open(p, "wb", blocksize=bs) as f:
+                f.write(d)
+        res = hdfs.sync(src, dest)
+        self.assertEqual(res["resumed"], [dest])
+        self.assertEqual(hdfs.load(dest), data)
+        # rewritten source: copied again
+        with hdfs.open(dest, "wb", blocksize=bs) as f:
+            f.write(data[::-1][:bs + bs // 2])
+        res = hdfs.sync(src, dest)
+        self.assertEqual(res["copied"], [dest])
+        self.assertEqual(hdfs.load(dest), data)
+        # dest older than the source: copied again
+        with hdfs.open(dest, "wb", blocksize=bs) as f:
+            f.write(data[:bs + bs // 2])
+        hdfs.path.utime(dest, (0, 0))
+        res = hdfs.sync(src, dest)
+        self.assertEqual(res["copied"], [dest])
+        self.assertEqual(hdfs.load(dest), data)
+
+    def glob(self):
+        rel_paths = [
+            "2020-01/part-0", "2020-01/part-1", "2020-02/part-0",
+            "2021-01/part-0", "x",
+        ]
+        for wd in self.local_wd, self.hdfs_wd:
+            for p in rel_paths:
+                hdfs.dump(self.data, "%s/%s" % (wd, p))
+            for pattern, exp in [
+                ("202?-01/part-*",
+                 ["2020-01/part-0", "2020-01/part-1", "2021-01/part-0"]),
+                ("{2020-02,2021-01}/part-0",
+                 ["2020-02/part-0", "2021-01/part-0"]),
+                ("2020-0[2-9]/*", ["2020-02/part-0"]),
+                ("2020-0[^1]/*", ["2020-02/part-0"]),
+                ("{2020-01/part-1,x}", ["2020-01/part-1", "x"]),
+                ("2020-01/part-0", ["2020-01/part-0"]),
+                ("2020-01/part-9", []),
+                ("*/part-0/*", []),
+                ("*", ["2020-01", "2020-02", "2021-01", "x"]),
+            ]:
+                pattern = "%s/%s" % (wd, pattern)
+                exp = ["%s/%s" % (wd, _) for _ in exp]
+                self.assertEqual(hdfs.glob(pattern), exp)
+                self.assertEqual(hdfs.glob(pattern, max_workers=1), exp)
+                self.assertEqual(sorted(hdfs.iglob(pattern)), exp)
+            self.assertRaises(ValueError, hdfs.glob, "%s/[a" % wd)
+
     def chmod(self):
         with tempfile.NamedTemporaryFile(suffix='_%s' % UNI_CHR) as f:
             hdfs.chmod("file://" + f.name, 444)
@@ -266,6 +485,65 @@ class TestHDFS(unittest.TestCase):
         self.assertFalse(hdfs.path.exists(test_path))
         self.assertTrue(hdfs.path.exists(new_path))
 
+    def delete_many(self):
+        for wd in self.local_wd, self.hdfs_wd:
+            paths = ["%s/%d" % (wd, i) for i in range(10)]
+            for p in paths:
+                hdfs.dump(self.data, p, mode="wb")
+            t1 = self.__make_tree(wd)
+            paths.append(t1.name)
+            missing = "%s/missing" % wd
+            results = hdfs.delete_many(paths + [missing], max_workers=4)
+            self.assertEqual([p for p, _ in results], paths + [missing])
+            for p, error in results[:-1]:
+                self.assertTrue(error is None)
+                self.assertFalse(hdfs.path.exists(p))
+            self.assertTrue(isinstance(results[-1][1], IOError))
+
+    def chmod_many(self):
+        for wd in self.local_wd, self.hdfs_wd:
+            paths = ["%s/%d" % (wd, i) for i in range(5)]
+            for p in paths:
+                hdfs.dump(self.data, p, mode="wb")
+            for mode, exp_mode in (0o600, 0o600), ("go+r", 0o644):
+                results = hdfs.chmod_many(paths, mode)
+                self.assertEqual([p for p, _ in results], paths)
+                for p, error in results:
+                    self.assertTrue(error is None)
+                    self.assertEqual(
+                        stat.S_IMODE(hdfs.path.stat(p).st_mode), exp_mode
+                    )
+            missing = "%s/missing" % wd
+            (p, error), = hdfs.chmod_many([missing], 0o600)
+            self.assertEqual(p, missing)
+            self.assertTrue(error is not None)
+
+    def chown_many(self):
+        new_user = 'nobody'
+        paths = ["%s/%d" % (self.hdfs_wd, i) for i in range(5)]
+        for p in paths:
+            hdfs.dump(self.data, p, mode="wb")
+        results = hdfs.chown_many(paths, user=new_user)
+        self.assertEqual([p for p, _ in results], paths)
+        for p, error in results:
+            self.assertTrue(error is None)
+            self.assertEqual(hdfs.lsl(p)[0]['owner'], new_user)
+
+    def rename_many(self):
+        for wd in self.local_wd, self.hdfs_wd:
+            pairs = [("%s/%d" % (wd, i), "%s/%d.new" % (wd, i))
+                     for i in range(10)]
+            for p, _ in pairs:
+                hdfs.dump(self.data, p, mode="wb")
+            missing = ("%s/missing" % wd, "%s/missing.new" % wd)
+            results = hdfs.rename_many(pairs + [missing])
+            self.assertEqual([p for p, _ in results], pairs + [missing])
+            for (old, new), error in results[:-1]:
+                self.assertTrue(error is None)
+                self.assertFalse(hdfs.path.exists(old))
+                self.assertEqual(hdfs.load(new), self.data)
+            self.assertTrue(results[-1][1] is not None)
+
     def capacity(self):
         fs = hdfs.hdfs("", 0)
         self.assertRaises(RuntimeError, fs.capacity)
@@ -373,17 +651,28 @@ def suite():
     suite_.addTest(TestHDFS("dump"))
     suite_.addTest(TestHDFS("lsl"))
     suite_.addTest(TestHDFS("ls"))
+    suite_.addTest(TestHDFS("ilsl"))
+    suite_.addTest(TestHDFS("ils"))
     suite_.addTest(TestHDFS("mkdir"))
     suite_.addTest(TestHDFS("load"))
     suite_.addTest(TestHDFS("cp"))
+    suite_.addTest(TestHDFS("cp_digests"))
     suite_.addTest(TestHDFS("put"))
     suite_.addTest(TestHDFS("get"))
     suite_.addTest(TestHDFS("rmr"))
+    suite_.addTest(TestHDFS("du"))
+    suite_.addTest(TestHDFS("follow"))
+    suite_.addTest(TestHDFS("sync"))
+    suite_.addTest(TestHDFS("glob"))
     suite_.addTest(TestHDFS("chmod"))
     suite_.addTest(TestHDFS("move"))
     suite_.addTest(TestHDFS("chown"))
     suite_.addTest(TestHDFS("rename"))
     suite_.addTest(TestHDFS("renames"))
+    suite_.addTest(TestHDFS("delete_many"))
+    suite_.addTest(TestHDFS("chmod_many"))
+    suite_.addTest(TestHDFS("chown_many"))
+    suite_.addTest(TestHDFS("rename_many"))
     suite_.addTest(TestHDFS("capacity"))
     suite_.addTest(TestHDFS("get_hosts"))
     # randomly fails on Travis
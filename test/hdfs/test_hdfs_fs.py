@@ -200,6 +200,25 @@ class TestHDFS(TestCommon):
             hosts_per_block = self.fs.get_hosts(path, start, length)
             self.assertEqual(len(hosts_per_block), i + 1)
 
+    def write_behind(self):
+        chunk = u.make_random_data(1000)
+        n_chunks = 3 * hdfs.common.WRITE_BEHIND_BUFSIZE // len(chunk) + 1
+        path = self._make_random_path()
+        with self.fs.open_file(path, "w", write_behind=True) as f:
+            for i in range(n_chunks):
+                self.assertEqual(f.write(chunk), len(chunk))
+                self.assertEqual(f.tell(), (i + 1) * len(chunk))
+            f.hflush()
+            with self.fs.open_file(path) as fi:
+                self.assertEqual(fi.read(), n_chunks * chunk)
+            f.write(chunk)
+        with self.fs.open_file(path) as fi:
+            self.assertEqual(fi.read(), (n_chunks + 1) * chunk)
+        with self.fs.open_file(path, "wt", write_behind=True) as f:
+            f.write(chunk.decode("ascii"))
+        with self.fs.open_file(path) as fi:
+            self.assertEqual(fi.read(), chunk)
+
 
 def suite():
     suite_ = unittest.TestSuite()
@@ -218,6 +237,7 @@ def suite():
             'set_replication',
             'readline_block_boundary',
             'get_hosts',
+            'write_behind',
         ])
     for t in tests:
         suite_.addTest(TestHDFS(t))
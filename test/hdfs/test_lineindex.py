@@ -0,0 +1,94 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+import unittest
+
+import pydoop.hdfs as hdfs
+from pydoop.hdfs.lineindex import build_index, default_index_path, LineIndex
+import pydoop.test_utils as utils
+
+
+class TestLineIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = hdfs.hdfs("default", 0)
+        self.wd = utils.make_wd(self.fs)
+        self.path = hdfs.path.join(self.wd, "lines.txt")
+        self.lines = [
+            ("%d %s\n" % (i, "x" * (i % 17))).encode("utf-8")
+            for i in range(1000)
+        ]
+
+    def tearDown(self):
+        self.fs.delete(self.wd)
+        self.fs.close()
+
+    def __check(self, lines, **kwargs):
+        hdfs.dump(b"".join(lines), self.path)
+        index_path = build_index(self.path, **kwargs)
+        self.assertEqual(index_path, default_index_path(self.path))
+        self.assertTrue(hdfs.path.basename(index_path).startswith("."))
+        with LineIndex(self.path) as idx:
+            self.assertEqual(len(idx), len(lines))
+            for i in range(len(lines)):
+                self.assertEqual(idx[i], lines[i])
+            if lines:
+                self.assertEqual(idx[-1], lines[-1])
+            for start, stop in (0, 10), (95, 357), (990, 2000), (5, 5):
+                self.assertEqual(idx[start:stop], lines[start:stop])
+            self.assertEqual(idx[:], lines)
+            self.assertRaises(IndexError, idx.__getitem__, len(lines))
+            self.assertRaises(ValueError, idx.__getitem__, slice(0, 10, 2))
+
+    def build_read(self):
+        for stride in 1, 7, 5000:
+            for range_size in None, 1000, 1024:
+                self.__check(self.lines, stride=stride, range_size=range_size,
+                             chunk_size=100)
+
+    def no_final_newline(self):
+        self.lines[-1] = self.lines[-1].rstrip()
+        self.__check(self.lines, stride=10, range_size=500)
+        self.__check([b"foo"])
+        self.__check([b"\n", b"\n", b"x"], stride=1, range_size=1)
+
+    def empty(self):
+        self.__check([])
+
+    def errors(self):
+        hdfs.dump(b"".join(self.lines), self.path)
+        self.assertRaises(ValueError, build_index, self.path, stride=0)
+        self.assertRaises(IOError, build_index, self.wd)
+        index_path = build_index(self.path)
+        self.assertRaises(IOError, LineIndex, self.path, self.path)
+        hdfs.dump(b"foo\n", self.path)
+        self.assertRaises(IOError, LineIndex, self.path, index_path)
+
+
+def suite():
+    suite_ = unittest.TestSuite()
+    suite_.addTest(TestLineIndex("build_read"))
+    suite_.addTest(TestLineIndex("no_final_newline"))
+    suite_.addTest(TestLineIndex("empty"))
+    suite_.addTest(TestLineIndex("errors"))
+    return suite_
+
+
+if __name__ == '__main__':
+    _RUNNER = unittest.TextTestRunner(verbosity=2)
+    _RUNNER.run((suite()))
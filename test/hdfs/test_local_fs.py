@@ -20,8 +20,11 @@ import unittest
 import getpass
 import tempfile
 import os
+import sys
 
 import pydoop.hdfs as hdfs
+import pydoop.test_utils as utils
+from pydoop.hdfs.file import local_mmap_file
 from common_hdfs_tests import TestCommon, common_tests
 
 
@@ -44,6 +47,57 @@ class TestLocalFS(TestCommon):
     def __init__(self, target):
         TestCommon.__init__(self, target, '', 0)
 
+    def mmap_read(self):
+        content = b"foo\nbar\nbaz"
+        path = self._make_random_file(content=content)
+        self.assertRaises(
+            ValueError, self.fs.open_file, path, "w", use_mmap=True
+        )
+        with self.fs.open_file(path, use_mmap=True) as f:
+            self.assertTrue(isinstance(f, local_mmap_file))
+            self.assertEqual(f.size, len(content))
+            view = f.view(4, 3)
+            if sys.version_info[0] >= 3:
+                self.assertTrue(isinstance(view, memoryview))
+                self.assertEqual(view.tobytes(), b"bar")
+                view.release()
+            else:  # a copy
+                self.assertEqual(view, b"bar")
+            self.assertEqual(f.readline(), b"foo\n")
+            self.assertEqual(f.tell(), 4)
+            self.assertEqual(f.pread(8, -1), b"baz")
+            self.assertEqual(f.tell(), 4)
+            chunk = bytearray(5)
+            self.assertEqual(f.read_chunk(chunk), 5)
+            self.assertEqual(bytes(chunk), b"bar\nb")
+            self.assertEqual(f.pread_chunk(0, chunk), 5)
+            self.assertEqual(bytes(chunk), content[:5])
+            self.assertEqual(list(f), [b"az"])
+            f.seek(-3, os.SEEK_END)
+            self.assertEqual(f.read(), b"baz")
+            self.assertRaises(IOError, f.seek, len(content) + 1)
+            self.assertRaises(IOError, f.pread, -1, 1)
+        self.assertTrue(f.closed)
+        self.assertRaises(ValueError, f.read)
+        if sys.version_info[0] >= 3:
+            # a view still in use: the file is closed anyway
+            f = self.fs.open_file(path, use_mmap=True)
+            fd, view = f.fileno(), f.view()
+            self.assertRaises(BufferError, f.close)
+            self.assertTrue(f.closed)
+            self.assertRaises(OSError, os.fstat, fd)
+            view.release()
+        path = self._make_random_path()
+        self.fs.open_file(path, "w").close()
+        with self.fs.open_file(path, use_mmap=True) as f:
+            self.assertEqual(f.read(), b"")
+        with self.fs.open_file(path, "rt", use_mmap=True) as f:
+            self.assertEqual(f.read(), u"")
+        content = utils.make_random_data(printable=True)
+        path = self._make_random_file(content=content)
+        with hdfs.open("file:%s" % path, use_mmap=True) as f:
+            self.assertEqual(f.read(), content)
+
 
 def suite():
     suite_ = unittest.TestSuite()
@@ -51,6 +105,7 @@ def suite():
     tests = common_tests()
     for t in tests:
         suite_.addTest(TestLocalFS(t))
+    suite_.addTest(TestLocalFS('mmap_read'))
     return suite_
 
 
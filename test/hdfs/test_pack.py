@@ -0,0 +1,102 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+import unittest
+
+import pydoop.hdfs as hdfs
+from pydoop.hdfs.pack import PackWriter, PackReader, INDEX_NAME
+import pydoop.test_utils as utils
+
+
+class TestPack(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = hdfs.hdfs("default", 0)
+        self.wd = utils.make_wd(self.fs)
+        self.path = hdfs.path.join(self.wd, "pack")
+        self.blobs = dict(
+            ("key_%03d_%s" % (i, utils.UNI_CHR), utils.make_random_data(i))
+            for i in range(100)
+        )
+
+    def tearDown(self):
+        self.fs.delete(self.wd)
+        self.fs.close()
+
+    def __write(self, part_size):
+        with PackWriter(self.path, part_size=part_size) as writer:
+            for k, v in self.blobs.items():
+                writer.add(k, v)
+            self.assertEqual(len(writer), len(self.blobs))
+            self.assertRaises(KeyError, writer.add, k, v)
+
+    def write_read(self):
+        part_size = 1000
+        self.__write(part_size)
+        parts = [_ for _ in self.fs.list_directory(self.path)
+                 if hdfs.path.basename(_["name"]) != INDEX_NAME]
+        self.assertTrue(len(parts) > 1)
+        for info in parts:
+            self.assertTrue(info["size"] <= part_size)
+        with PackReader(self.path) as reader:
+            self.assertEqual(len(reader), len(self.blobs))
+            self.assertEqual(
+                list(reader.keys()),
+                sorted(_.encode("utf-8") for _ in self.blobs)
+            )
+            for k, v in self.blobs.items():
+                self.assertTrue(k in reader)
+                self.assertEqual(reader[k], v)
+                self.assertEqual(reader[k.encode("utf-8")], v)
+                self.assertEqual(reader.locate(k)[2], len(v))
+            self.assertFalse("foo" in reader)
+            self.assertRaises(KeyError, reader.__getitem__, "foo")
+            self.assertTrue(reader.get("foo") is None)
+        self.assertRaises(ValueError, reader.__getitem__, k)
+
+    def big_blob(self):
+        self.blobs["big"] = utils.make_random_data(3000)
+        self.__write(1000)
+        with PackReader(self.path) as reader:
+            self.assertEqual(reader["big"], self.blobs["big"])
+
+    def empty(self):
+        PackWriter(self.path).close()
+        with PackReader(self.path) as reader:
+            self.assertEqual(len(reader), 0)
+            self.assertEqual(list(reader.keys()), [])
+            self.assertFalse("foo" in reader)
+
+    def errors(self):
+        self.__write(1000)
+        self.assertRaises(IOError, PackWriter, self.path)
+        self.assertRaises(IOError, PackReader, self.wd)
+
+
+def suite():
+    suite_ = unittest.TestSuite()
+    suite_.addTest(TestPack("write_read"))
+    suite_.addTest(TestPack("big_blob"))
+    suite_.addTest(TestPack("empty"))
+    suite_.addTest(TestPack("errors"))
+    return suite_
+
+
+if __name__ == '__main__':
+    _RUNNER = unittest.TextTestRunner(verbosity=2)
+    _RUNNER.run((suite()))
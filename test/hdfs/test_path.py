@@ -97,6 +97,27 @@ class TestSplit(unittest.TestCase):
         for p in cases:
             self.assertRaises(ValueError, hdfs.path.split, p)
 
+    def cache(self):
+        p = 'hdfs://localhost:9000/a/%s' % UNI_CHR
+        r = hdfs.path.split(p)
+        self.assertTrue(hdfs.path.split(p) is r)
+        self.assertFalse(hdfs.path.split(p, 'foo') is r)
+        hdfs.path.clear_cache()
+        r2 = hdfs.path.split(p)
+        self.assertFalse(r2 is r)
+        self.assertEqual(r2, r)
+        self.assertRaises(ValueError, hdfs.path.split, 'hdfs:')
+        calls = []
+
+        @hdfs.path._lru_cache(2)
+        def upper(s):
+            calls.append(s)
+            return s.upper()
+
+        for k in 'a', 'b', 'a', 'c', 'b':  # 'c' evicts 'b'
+            self.assertEqual(upper(k), k.upper())
+        self.assertEqual(calls, ['a', 'b', 'c', 'b'])
+
     def splitext(self):
         for pre in '', 'file:', 'hdfs://host:1':
             name, ext = '%sfoo' % pre, '.txt'
@@ -542,6 +563,7 @@ def suite():
     suite_.addTest(TestSplit('good'))
     suite_.addTest(TestSplit('good_with_user'))
     suite_.addTest(TestSplit('bad'))
+    suite_.addTest(TestSplit('cache'))
     suite_.addTest(TestSplit('splitext'))
     suite_.addTest(TestUnparse('good'))
     suite_.addTest(TestUnparse('bad'))
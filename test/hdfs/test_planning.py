@@ -0,0 +1,101 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+import unittest
+
+import pydoop.hdfs as hdfs
+from pydoop.hdfs.planning import (
+    BlockRange, NO_HOST, get_block_ranges, assign_ranges, plan_by_host,
+    interleave,
+)
+import pydoop.test_utils as utils
+
+
+class TestPlanning(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = hdfs.hdfs("default", 0)
+        self.wd = utils.make_wd(self.fs)
+
+    def tearDown(self):
+        self.fs.delete(self.wd)
+        self.fs.close()
+
+    def __make_file(self, name, size, blocksize):
+        p = "%s/%s" % (self.wd, name)
+        with self.fs.open_file(p, "w", blocksize=blocksize) as f:
+            f.write(b"x" * size)
+        return self.fs.get_path_info(p)
+
+    def block_ranges(self):
+        blocksize = 1048576  # dfs.namenode.fs-limits.min-block-size
+        info = self.__make_file("a", 2 * blocksize + 10, blocksize)
+        self.__make_file("_SUCCESS", 1, blocksize)
+        self.__make_file("empty", 0, blocksize)
+        ranges = get_block_ranges([self.wd, info["name"]])
+        self.assertEqual(len(ranges), 6)
+        for r in ranges:
+            self.assertEqual(r.path, info["name"])
+            self.assertTrue(r.hosts)
+        self.assertEqual([r.offset for r in ranges[::2]],
+                         [0, blocksize, 2 * blocksize])
+        self.assertEqual([r.length for r in ranges[::2]],
+                         [blocksize, blocksize, 10])
+        self.assertEqual(sum(r.length for r in ranges), 2 * info["size"])
+
+    def assign(self):
+        ranges = [
+            BlockRange("a", 0, 10, ("h1", "h2")),
+            BlockRange("a", 10, 10, ("h1", "h2")),
+            BlockRange("a", 20, 5, ("h1", "h2")),
+            BlockRange("b", 0, 10, ("h2", "h3")),
+            BlockRange("b", 10, 10, ()),
+        ]
+        plan = assign_ranges(ranges)
+        self.assertEqual(set(plan), set(["h1", "h2", "h3", NO_HOST]))
+        self.assertEqual(plan["h1"], [ranges[0], ranges[2]])
+        self.assertEqual(plan["h2"], [ranges[1]])
+        self.assertEqual(plan["h3"], [ranges[3]])
+        self.assertEqual(plan[NO_HOST], [ranges[4]])
+        for h, q in plan.items():
+            for r in q:
+                self.assertTrue(h in r.hosts or not r.hosts)
+        flat = interleave(plan)
+        self.assertEqual(sorted(flat), sorted(ranges))
+        self.assertEqual(flat[:4], [plan[h][0] for h in sorted(plan)])
+        self.assertEqual(interleave({}), [])
+
+    def plan(self):
+        blocksize = 1048576
+        info = self.__make_file("a", 3 * blocksize, blocksize)
+        plan = plan_by_host([info["name"]])
+        flat = [r for q in plan.values() for r in q]
+        self.assertEqual(sorted(flat), get_block_ranges([info["name"]]))
+
+
+def suite():
+    suite_ = unittest.TestSuite()
+    suite_.addTest(TestPlanning("block_ranges"))
+    suite_.addTest(TestPlanning("assign"))
+    suite_.addTest(TestPlanning("plan"))
+    return suite_
+
+
+if __name__ == '__main__':
+    _RUNNER = unittest.TextTestRunner(verbosity=2)
+    _RUNNER.run((suite()))
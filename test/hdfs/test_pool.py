@@ -0,0 +1,180 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+import getpass
+import os
+import unittest
+import threading
+import time
+
+import pydoop.hdfs as hdfs
+from pydoop.hdfs.pool import FSPool
+
+
+class TestPool(unittest.TestCase):
+
+    def setUp(self):
+        self.connected, self.closed = [], []
+        self.pool = FSPool(
+            max_concurrency=2,
+            on_connect=self.connected.append,
+            on_close=self.closed.append,
+        )
+
+    def tearDown(self):
+        self.pool.close()
+
+    def get(self):
+        fs = self.pool.get("", 0)
+        self.assertTrue(self.pool.get("", 0) is fs)
+        self.assertEqual(self.connected, [fs])
+        self.assertFalse(fs.closed)
+        refcount = fs.refcount
+        with self.pool.connect("", 0) as fs2:
+            self.assertTrue(fs2.fs is fs.fs)
+            self.assertEqual(fs.refcount, refcount + 1)
+        self.assertEqual(fs.refcount, refcount)
+        self.assertFalse(fs.closed)
+
+    def close(self):
+        fs = self.pool.get("", 0)
+        refcount = fs.refcount
+        self.pool.close()
+        self.assertEqual(self.closed, [fs])
+        self.assertEqual(fs.refcount, refcount - 1)
+        self.assertRaises(ValueError, self.pool.get, "", 0)
+        self.pool.close()  # no-op
+        self.assertEqual(self.closed, [fs])
+
+    def closed_connection(self):
+        self.pool.get("", 0)
+        self.pool.close()
+
+        def enter():
+            with self.pool.connection("", 0):
+                pass
+        self.assertRaises(ValueError, enter)
+
+    def aliases(self):
+        fs = self.pool.get("", 0)
+        self.assertTrue(self.pool.get("", 0, getpass.getuser()) is fs)
+        self.assertTrue(self.pool.get(" ", 0, None) is fs)
+        self.assertEqual(self.connected, [fs])
+        # the duplicate connection is dropped, the cached one still works
+        with hdfs.hdfs("", 0, "%s_alias" % getpass.getuser()) as fs2:
+            self.assertTrue(fs2.fs is fs.fs)
+        self.assertTrue(len(fs.list_directory(os.getcwd())) > 0)
+
+    def bounded_concurrency(self):
+        lock = threading.Lock()
+        counts = {"current": 0, "max": 0}
+
+        def run():
+            with self.pool.connection("", 0):
+                with lock:
+                    counts["current"] += 1
+                    counts["max"] = max(counts["max"], counts["current"])
+                time.sleep(0.05)
+                with lock:
+                    counts["current"] -= 1
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(counts["current"], 0)
+        self.assertEqual(counts["max"], 2)
+        self.assertEqual(len(self.connected), 1)
+
+    def slow_connect(self):
+        # a connection in progress must not block other ones
+        started, proceed = threading.Event(), threading.Event()
+        connected = []
+
+        def on_connect(fs):
+            connected.append(fs)
+            if len(connected) == 1:  # the "slow" connection
+                started.set()
+                proceed.wait(10)
+
+        pool = FSPool(on_connect=on_connect)
+        threads = [threading.Thread(target=pool.get, args=("", 0, "slow"))
+                   for _ in range(4)]
+        try:
+            for t in threads:
+                t.start()
+            self.assertTrue(started.wait(10))
+            fast = []
+            t = threading.Thread(
+                target=lambda: fast.append(pool.get("", 0, "fast"))
+            )
+            t.start()
+            t.join(5)
+            self.assertEqual(len(fast), 1)
+            self.assertTrue(pool.get("", 0, "fast") is fast[0])
+            self.assertEqual(len(connected), 2)
+        finally:
+            proceed.set()
+            for t in threads:
+                t.join()
+            pool.close()
+        self.assertEqual(len(connected), 2)
+
+    def thread_safe_refcount(self):
+        fs = self.pool.get("", 0)
+        refcount = fs.refcount
+
+        def run():
+            for _ in range(200):
+                hdfs.hdfs("", 0).close()
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(fs.refcount, refcount)
+        self.assertFalse(fs.closed)
+
+    def default_pool(self):
+        pool = FSPool()
+        old = hdfs.set_default_pool(pool)
+        try:
+            self.assertTrue(hdfs.get_default_pool() is pool)
+        finally:
+            self.assertTrue(hdfs.set_default_pool(old) is pool)
+            pool.close()
+
+
+def suite():
+    suite_ = unittest.TestSuite()
+    suite_.addTest(TestPool("get"))
+    suite_.addTest(TestPool("close"))
+    suite_.addTest(TestPool("closed_connection"))
+    suite_.addTest(TestPool("aliases"))
+    suite_.addTest(TestPool("bounded_concurrency"))
+    suite_.addTest(TestPool("slow_connect"))
+    suite_.addTest(TestPool("thread_safe_refcount"))
+    suite_.addTest(TestPool("default_pool"))
+    return suite_
+
+
+if __name__ == '__main__':
+    _RUNNER = unittest.TextTestRunner(verbosity=2)
+    _RUNNER.run((suite()))
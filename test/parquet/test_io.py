@@ -0,0 +1,144 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+import os
+import unittest
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pydoop.mapreduce.api import JobConf
+from pydoop.mapreduce.pipes import InputSplit
+from pydoop.parquetlib import ParquetReader, ParquetWriter, split_row_groups
+from pydoop.test_utils import WDTestCase
+import pydoop.hdfs as hdfs
+
+
+SCHEMA = pa.schema([
+    pa.field("id", pa.int64()),
+    pa.field("name", pa.string()),
+    pa.field("score", pa.float64()),
+])
+
+
+def make_row(i):
+    return {"id": i, "name": "name-%d" % i, "score": i / 4.0}
+
+
+class FunkyCtx(object):
+
+    def __init__(self, job_conf=None, isplit=None):
+        self.job_conf = JobConf(job_conf or {})
+        self.input_split = isplit
+
+    def get_default_work_file(self, extension=""):
+        return "%s/part-r-%05d%s" % (
+            self.job_conf["mapreduce.task.output.dir"],
+            int(self.job_conf["mapreduce.task.partition"]), extension
+        )
+
+
+class TestParquetIO(WDTestCase):
+
+    def write_parquet_file(self, n_rows, row_group_size, **job_conf):
+
+        class Writer(ParquetWriter):
+            schema = SCHEMA
+
+        Writer.row_group_size = row_group_size
+        job_conf.update({
+            "mapreduce.task.partition": "1",
+            "mapreduce.task.output.dir": hdfs.path.abspath(
+                self.wd, local=True
+            ),
+        })
+        writer = Writer(FunkyCtx(job_conf))
+        for i in range(n_rows):
+            writer.emit(None, make_row(i))
+        writer.close()
+        return os.path.join(self.wd, "part-r-00001.parquet")
+
+    def get_reader(self, fn, offset, length, columns=None, batch_size=None):
+        url = hdfs.path.abspath(fn, local=True)
+        isplit = InputSplit(InputSplit.to_string(url, offset, length))
+
+        class Reader(ParquetReader):
+            pass
+
+        Reader.columns = columns
+        if batch_size:
+            Reader.batch_size = batch_size
+        return Reader(FunkyCtx(isplit=isplit))
+
+    def test_writer(self):
+        N = 1000
+        fn = self.write_parquet_file(N, 100, **{"parquet.compression": "gzip"})
+        pf = pq.ParquetFile(fn)
+        self.assertEqual(pf.metadata.num_row_groups, 10)
+        self.assertEqual(pf.metadata.row_group(0).column(0).compression,
+                         "GZIP")
+        table = pf.read()
+        self.assertTrue(table.schema.equals(SCHEMA))
+        self.assertEqual(table.to_pydict(), dict(
+            (k, [make_row(i)[k] for i in range(N)]) for k in SCHEMA.names
+        ))
+
+    def test_reader(self):
+        N = 1000
+        fn = self.write_parquet_file(N, 100)
+        size = os.stat(fn).st_size
+        reader = self.get_reader(fn, 0, size, batch_size=30)
+        ids, rows = [], []
+        for row, batch in reader:
+            self.assertTrue(batch.num_rows <= 30)
+            rows.append(row)
+            ids.extend(batch.column(0).to_pylist())
+        reader.close()
+        self.assertEqual(ids, list(range(N)))
+        self.assertEqual(rows[0], 0)
+        # every row group is read exactly once, whatever the splits
+        md = pq.ParquetFile(fn).metadata
+        for n_splits in 2, 3, 7:
+            length = size // n_splits + 1
+            ids, groups = [], []
+            for offset in range(0, size, length):
+                groups.extend(split_row_groups(md, offset, length))
+                reader = self.get_reader(fn, offset, length)
+                for row, batch in reader:
+                    self.assertEqual(batch.column(0)[0].as_py(), row)
+                    ids.extend(batch.column(0).to_pylist())
+                reader.close()
+            self.assertEqual(groups, list(range(md.num_row_groups)))
+            self.assertEqual(ids, list(range(N)))
+        reader = self.get_reader(fn, 0, size, columns=["score"])
+        for _, batch in reader:
+            self.assertEqual(batch.schema.names, ["score"])
+        self.assertEqual(reader.get_progress(), 1.0)
+        reader.close()
+
+
+def suite():
+    suite_ = unittest.TestSuite()
+    suite_.addTest(TestParquetIO('test_writer'))
+    suite_.addTest(TestParquetIO('test_reader'))
+    return suite_
+
+
+if __name__ == '__main__':
+    _RUNNER = unittest.TextTestRunner(verbosity=2)
+    _RUNNER.run((suite()))
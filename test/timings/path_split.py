@@ -0,0 +1,78 @@
+# BEGIN_COPYRIGHT
+#
+# Copyright 2009-2018 CRS4.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# END_COPYRIGHT
+
+"""
+Time hdfs.path.split with and without the path resolution cache.
+
+Paths are drawn from a pool of N_DISTINCT names, as in scripts that
+repeatedly operate on the same set of files.
+"""
+
+from __future__ import print_function
+import argparse
+import sys
+
+import pydoop.hdfs.path as hpath
+from pydoop.hdfs.common import DEFAULT_USER
+
+from timer import Timer
+
+
+def make_paths(n, n_distinct):
+    names = [
+        "hdfs://localhost:9000/user/%s/dir_%d/part-%05d" % (
+            DEFAULT_USER, i % 100, i
+        ) for i in range(n_distinct)
+    ]
+    names.extend("data/part-%05d" % i for i in range(n_distinct))
+    return [names[i % len(names)] for i in range(n)]
+
+
+def uncached_split(p, user=None):
+    return hpath._HdfsPathSplitter.split(p, user or DEFAULT_USER)
+
+
+def time_split(split, paths):
+    with Timer() as t:
+        for p in paths:
+            split(p)
+    return t.secs
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=500000,
+                        help="number of calls")
+    parser.add_argument("--n-distinct", type=int, default=10000,
+                        help="number of distinct paths")
+    return parser
+
+
+def main(argv):
+    args = make_parser().parse_args(argv)
+    paths = make_paths(args.n, args.n_distinct)
+    hpath.clear_cache()
+    uncached = time_split(uncached_split, paths)
+    cached = time_split(hpath.split, paths)
+    print(" => split (uncached): %f s" % uncached)
+    print(" => split (cached): %f s" % cached)
+    print(" => speedup: %.1fx" % (uncached / cached))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])